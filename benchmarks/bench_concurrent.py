@@ -0,0 +1,125 @@
+"""
+Measures the throughput of N annotation jobs running at the same time on one node, each a
+separate command line process against the same synthetic GTEx database, with and without
+--mmap. Prints one JSON line per setting with the wall time until all jobs finished, the total
+rows per second and the mean peak and private memory of a job.
+
+The page cache is warmed with "db warm" first, so the results show the steady state of a node
+that runs many jobs, not the first read from disk.
+
+Usage: python benchmarks/bench_concurrent.py [--variants N] [--rows N] [--jobs 1 4 16]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import make_gtex_db, make_sumstats
+
+from RSIDBuildTranslator.provision import warm_gtex_db
+
+# Runs the command line tool, then reports the memory of the process on stdout.
+JOB = """
+import json
+import resource
+import sys
+from RSIDBuildTranslator.main import main
+sys.argv = ["RSIDBuildTranslator", *sys.argv[1:]]
+main()
+memory = {"peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10}
+try:
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line and "-" not in line[:12])
+    private = sum(int(fields[key].split()[0]) for key in ("Private_Clean", "Private_Dirty"))
+    memory["private_mb"] = private / 2**10
+except OSError:
+    pass
+print(json.dumps(memory))
+"""
+
+MODE_ARGS = {
+    "rsid": ["rsid", "-rs", "ID"],
+    "chrpos38": ["chrpos38", "-chr38", "CHR38", "-pos38", "POS38"],
+}
+
+
+def run_jobs(jobs, db_path, input_path, tmp_dir, mode, extra_args):
+    """
+    Starts all jobs at once and waits for them.
+
+    Returns:
+    seconds (float): Wall time until the last job finished.
+    memory (list): Memory dict reported by each job.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(__file__), "../src"))
+    start = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", JOB, *MODE_ARGS[mode], "--db", db_path, *extra_args]
+            + ["-i", input_path, "-o", os.path.join(tmp_dir, f"output_{i}.tsv")],
+            env=env,
+            cwd=tmp_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        for i in range(jobs)
+    ]
+    outputs = [process.communicate()[0] for process in processes]
+    seconds = time.perf_counter() - start
+    if any(process.returncode for process in processes):
+        raise RuntimeError("An annotation job failed.")
+    return seconds, [json.loads(output.strip().splitlines()[-1]) for output in outputs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=1_000_000)
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows of the input of each job")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--mode", default="chrpos38", choices=MODE_ARGS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--data-dir",
+        help="Directory to keep the synthetic database in, so it is only generated once",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        db_path = os.path.join(data_dir, f"GTEx_synthetic_{args.variants}_{args.seed}.db")
+        if not os.path.exists(db_path):
+            make_gtex_db(db_path, args.variants, seed=args.seed)
+        input_path = make_sumstats(
+            db_path, os.path.join(tmp_dir, "sumstats.tsv"), args.rows, 0.9, args.seed
+        )
+        warm_gtex_db(db_path)
+
+        for jobs in args.jobs:
+            for name, extra_args in (("default", []), ("mmap", ["--mmap"])):
+                seconds, memory = run_jobs(
+                    jobs, db_path, input_path, tmp_dir, args.mode, extra_args
+                )
+                result = {
+                    "setting": name,
+                    "jobs": jobs,
+                    "cpus": os.cpu_count(),
+                    "db_mb": round(os.path.getsize(db_path) / 2**20, 1),
+                    "seconds": round(seconds, 3),
+                    "rows_per_second": round(jobs * args.rows / seconds),
+                }
+                for key in memory[0]:
+                    result[f"mean_{key}"] = round(statistics.mean(m[key] for m in memory), 1)
+                print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Compares the "in-list" and "temp-table" lookup strategies of query_to_df() across input sizes.
+
+Usage: python benchmarks/bench_lookup_strategy.py [--variants N] [--sizes 1000 10000 ...]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from synthetic import make_gtex_db, make_lookup_ids
+
+from RSIDBuildTranslator.utils import query_to_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=1_000_000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--column", default="rsid_dbSNP155")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = make_gtex_db(os.path.join(tmp_dir, "GTEx_v10.db"), args.variants)
+        con = sqlite3.connect(db_path)
+        cur = con.cursor()
+
+        results = []
+        for size in args.sizes:
+            ids = make_lookup_ids(db_path, args.column, size)
+            for strategy in ("in-list", "temp-table"):
+                start = time.perf_counter()
+                df = query_to_df("GTEx_lookup", ids, args.column, cur, 500, strategy)
+                seconds = time.perf_counter() - start
+                results.append(
+                    {
+                        "ids": size,
+                        "strategy": strategy,
+                        "seconds": round(seconds, 4),
+                        "ids_per_second": round(size / seconds),
+                        "rows": len(df),
+                    }
+                )
+                print(json.dumps(results[-1]))
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
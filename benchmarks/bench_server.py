@@ -0,0 +1,94 @@
+"""
+Compares the latency of small lookups answered by a warm "RSIDBuildTranslator serve" server with
+cold command line calls, which start a new interpreter and open the database every time.
+
+Usage: python benchmarks/bench_server.py [--variants N] [--ids 10] [--calls 20]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import make_gtex_db, make_lookup_ids
+
+from RSIDBuildTranslator.server import LookupClient, create_server
+
+# Runs the command line tool against the synthetic database instead of the downloaded one.
+COLD_CLI = """
+import sys
+from RSIDBuildTranslator import utils
+from RSIDBuildTranslator.main import main
+utils.get_local_db_path = lambda: sys.argv[1]
+sys.argv = ["RSIDBuildTranslator", *sys.argv[2:]]
+main()
+"""
+
+
+def summarize(name, seconds):
+    """Prints latency statistics in milliseconds as a JSON line."""
+    seconds = sorted(seconds)
+    print(
+        json.dumps(
+            {
+                "method": name,
+                "calls": len(seconds),
+                "median_ms": round(statistics.median(seconds) * 1000, 2),
+                "p95_ms": round(seconds[int(0.95 * (len(seconds) - 1))] * 1000, 2),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=1_000_000)
+    parser.add_argument("--ids", type=int, default=10, help="Ids per call")
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = make_gtex_db(os.path.join(tmp_dir, "GTEx_v10.db"), args.variants)
+        batches = [
+            make_lookup_ids(db_path, "rsid_dbSNP155", args.ids, seed=seed)
+            for seed in range(args.calls)
+        ]
+
+        env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(__file__), "../src"))
+        cold = []
+        for i, ids in enumerate(batches):
+            input_path = os.path.join(tmp_dir, f"input_{i}.txt")
+            with open(input_path, "w") as f:
+                f.write("ID\n" + "".join(f"{id}\n" for id in ids))
+            command = [sys.executable, "-c", COLD_CLI, db_path, "rsid", "-rs", "ID"]
+            command += ["-i", input_path, "-o", os.path.join(tmp_dir, f"output_{i}.txt")]
+            start = time.perf_counter()
+            subprocess.run(command, env=env, cwd=tmp_dir, check=True, capture_output=True)
+            cold.append(time.perf_counter() - start)
+        summarize("cold cli", cold)
+
+        server = create_server(db_path, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        with LookupClient(f"http://{host}:{port}") as client:
+            for name in ("server, uncached", "server, cached"):
+                warm = []
+                for ids in batches:
+                    start = time.perf_counter()
+                    client.lookup("rsid", ids)
+                    warm.append(time.perf_counter() - start)
+                summarize(name, warm)
+        server.shutdown()
+        server.server_close()
+        server.service.close()
+
+
+if __name__ == "__main__":
+    main()
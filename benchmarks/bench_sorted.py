@@ -0,0 +1,71 @@
+"""
+Compares the default chrpos38 annotation with the merge join used for sorted input (--sorted),
+for the SQLite and binary backends and inputs covering different fractions of the database.
+
+Usage: python benchmarks/bench_sorted.py [--variants N] [--fractions 0.05 0.25 0.75]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+from synthetic import make_gtex_db, make_lookup_ids
+
+from RSIDBuildTranslator import Translator
+from RSIDBuildTranslator.binary_store import build_binary_store
+
+
+def make_sorted_input(db_path, fraction, n_variants):
+    """Returns sumstats-like input with chromosome and position columns, sorted by both."""
+    ids = make_lookup_ids(db_path, "chrpos38", int(fraction * n_variants), hit_rate=0.95)
+    parts = pd.Series(ids).str.split("_", expand=True)
+    df = pd.DataFrame({"CHROM": parts[0].astype(int), "POS": parts[1].astype(int)})
+    df["P"] = 0.5
+    return df.sort_values(["CHROM", "POS"], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=1_000_000)
+    parser.add_argument("--fractions", type=float, nargs="+", default=[0.05, 0.25, 0.75])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = make_gtex_db(os.path.join(tmp_dir, "GTEx_v10.db"), args.variants)
+        store_path = os.path.join(tmp_dir, "GTEx_v10_store")
+        with sqlite3.connect(db_path) as con:
+            build_binary_store(con, store_path)
+
+        for fraction in args.fractions:
+            df = make_sorted_input(db_path, fraction, args.variants)
+            for backend, path in (("sqlite", db_path), ("binary", store_path)):
+                with Translator(path, backend=backend) as translator:
+                    for sorted_input in (False, True):
+                        start = time.perf_counter()
+                        result = translator.annotate(
+                            df, "chrpos38", ["CHROM", "POS"], sorted_input=sorted_input
+                        )
+                        seconds = time.perf_counter() - start
+                        print(
+                            json.dumps(
+                                {
+                                    "fraction": fraction,
+                                    "rows": len(df),
+                                    "backend": backend,
+                                    "sorted": sorted_input,
+                                    "seconds": round(seconds, 3),
+                                    "rows_per_second": round(len(df) / seconds),
+                                    "output_rows": len(result),
+                                }
+                            )
+                        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Times every stage of an annotation run for all three modes against a synthetic GTEx database:
+reading the input, validating it, building the lookup keys, query_to_df(), cleanup_query_df()
+and writing the output. Prints one JSON document with the time and peak traced memory of each
+stage, which can be saved and compared across releases with --baseline.
+
+Usage: python benchmarks/bench_stages.py [--variants N] [--rows N] [--output results.json]
+       [--baseline previous.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+import pandas as pd
+from synthetic import make_gtex_db, make_sumstats
+
+from RSIDBuildTranslator.api import LOOKUP_COLUMNS, Translator, check_input, get_ids, merge_results
+from RSIDBuildTranslator.binary_store import build_binary_store
+from RSIDBuildTranslator.utils import OutputWriter, read_input_file
+
+MODE_COLUMNS = {
+    "rsid": ["ID"],
+    "chrpos37": ["CHR37", "POS37"],
+    "chrpos38": ["CHR38", "POS38"],
+}
+STAGES = ["read", "validate", "key_build", "query_to_df", "cleanup_query_df", "write"]
+
+
+def run_stages(translator, input_path, output_path, mode):
+    """
+    Splits one annotation of an input file into stages, which share their data.
+
+    Returns:
+    stages (list): (stage name, function) pairs, to be called in order.
+    """
+    columns = MODE_COLUMNS[mode]
+    lookup_column = LOOKUP_COLUMNS[mode]
+    state = {}
+
+    def read():
+        state["input_data"] = read_input_file(input_path)
+
+    def validate():
+        if not check_input(state["input_data"], mode, columns):
+            raise RuntimeError(f"Synthetic input did not pass the checks of mode '{mode}'.")
+
+    def key_build():
+        state["input_data"], state["ids"], state["input_data_column"] = get_ids(
+            state["input_data"], mode, columns
+        )
+
+    def lookup():
+        state["results_df"] = translator.lookup(state["ids"], lookup_column)
+
+    def cleanup():
+        state["final_df"] = merge_results(
+            state["results_df"],
+            state["input_data"],
+            state["input_data_column"],
+            lookup_column,
+            exclude_ref_alt=False,
+        )
+
+    def write():
+        with OutputWriter(output_path) as writer:
+            writer.write(state["final_df"])
+
+    return list(zip(STAGES, [read, validate, key_build, lookup, cleanup, write], strict=True))
+
+
+def measure(translator, input_path, output_path, mode, repeat):
+    """
+    Times each stage, keeping the fastest of several runs, then runs all stages once more under
+    tracemalloc for their peak memory, since tracing slows them down.
+
+    Returns:
+    results (list): One dict per stage.
+    """
+    seconds = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        for stage, function in run_stages(translator, input_path, output_path, mode):
+            start = time.perf_counter()
+            function()
+            seconds[stage].append(time.perf_counter() - start)
+
+    peak_bytes = {}
+    for stage, function in run_stages(translator, input_path, output_path, mode):
+        tracemalloc.start()
+        function()
+        peak_bytes[stage] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return [
+        {
+            "mode": mode,
+            "stage": stage,
+            "seconds": round(min(seconds[stage]), 4),
+            "peak_mb": round(peak_bytes[stage] / 2**20, 1),
+        }
+        for stage in STAGES
+    ]
+
+
+def get_environment():
+    """Returns the versions the benchmark ran with."""
+    try:
+        package_version = version("RSIDBuildTranslator")
+    except PackageNotFoundError:
+        package_version = "unknown"
+    return {
+        "RSIDBuildTranslator": package_version,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path):
+    """Prints the change of each stage relative to a previous JSON document, to stderr."""
+    with open(baseline_path) as f:
+        baseline = {(row["mode"], row["stage"]): row for row in json.load(f)["results"]}
+    for row in results:
+        before = baseline.get((row["mode"], row["stage"]))
+        if before is None or not before["seconds"]:
+            continue
+        change = row["seconds"] / before["seconds"] - 1
+        print(
+            f"{row['mode']:>9} {row['stage']:<17} {before['seconds']:>8.4f}s -> "
+            f"{row['seconds']:>8.4f}s ({change:+.0%}), "
+            f"{before['peak_mb']:>7.1f} MB -> {row['peak_mb']:>7.1f} MB",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variants", type=int, default=1_000_000)
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows of the sumstats input")
+    parser.add_argument("--hit-rate", type=float, default=0.9)
+    parser.add_argument("--modes", nargs="+", default=list(MODE_COLUMNS), choices=MODE_COLUMNS)
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "binary"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--data-dir",
+        help="Directory to keep the synthetic database in, so it is only generated once",
+    )
+    parser.add_argument("--output", help="File to write the JSON results to, instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        db_path = os.path.join(data_dir, f"GTEx_synthetic_{args.variants}_{args.seed}.db")
+        if not os.path.exists(db_path):
+            make_gtex_db(db_path, args.variants, seed=args.seed)
+        db = db_path
+        if args.backend == "binary":
+            db = f"{db_path}.store"
+            if not os.path.exists(db):
+                with sqlite3.connect(db_path) as con:
+                    build_binary_store(con, db)
+
+        input_path = make_sumstats(
+            db_path, os.path.join(tmp_dir, "sumstats.tsv"), args.rows, args.hit_rate, args.seed
+        )
+        output_path = os.path.join(tmp_dir, "annotated.tsv")
+        results = []
+        with Translator(db, backend=args.backend) as translator:
+            for mode in args.modes:
+                results += measure(translator, input_path, output_path, mode, args.repeat)
+
+    for row in results:
+        row["rows_per_second"] = round(args.rows / row["seconds"]) if row["seconds"] else None
+    document = {
+        "benchmark": "stages",
+        "parameters": {
+            "variants": args.variants,
+            "rows": args.rows,
+            "hit_rate": args.hit_rate,
+            "backend": args.backend,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "environment": get_environment(),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
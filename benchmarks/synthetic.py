@@ -0,0 +1,148 @@
+"""Synthetic GTEx databases and inputs for benchmarks."""
+
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from RSIDBuildTranslator.db import prepare_gtex_db  # noqa: E402
+
+ALLELES = np.array(["A", "C", "G", "T"])
+
+
+def make_gtex_db(path, n_variants, seed=0):
+    """
+    Writes a prepared GTEx_lookup database with the same schema as GTEx_v10.db.
+
+    Parameters:
+    path (str): Path of the database file to create.
+    n_variants (int): Number of variants in the database.
+    seed (int): Random seed.
+
+    Returns:
+    path (str): Path of the database file.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.default_rng(seed)
+    chroms = rng.integers(1, 23, n_variants)
+    # Positions start above the largest shift, so the GRCh38 positions stay positive.
+    positions = rng.integers(50_001, 2**27, n_variants)
+    shift = rng.integers(-50_000, 50_000, n_variants)
+    ref = rng.integers(0, 4, n_variants)
+    alt = (ref + rng.integers(1, 4, n_variants)) % 4
+
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE GTEx_lookup "
+        "(rsid_dbSNP155 TEXT, chrpos37 TEXT, chrpos38 TEXT, ref TEXT, alt TEXT)"
+    )
+    con.executemany(
+        "INSERT INTO GTEx_lookup VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"rs{i + 1}", f"{c}_{p}", f"{c}_{p + s}", ALLELES[r], ALLELES[a])
+            for i, (c, p, s, r, a) in enumerate(
+                zip(
+                    chroms.tolist(),
+                    positions.tolist(),
+                    shift.tolist(),
+                    ref.tolist(),
+                    alt.tolist(),
+                    strict=True,
+                )
+            )
+        ),
+    )
+    con.commit()
+    prepare_gtex_db(con)
+    con.close()
+    return path
+
+
+def make_lookup_ids(db_path, lookup_column, n_ids, hit_rate=0.9, seed=1):
+    """
+    Samples ids to look up from a synthetic database, mixed with ids that are not in it.
+
+    Parameters:
+    db_path (str): Path of a database created by make_gtex_db().
+    lookup_column (str): Name of column from GTEx table to sample ids from.
+    n_ids (int): Number of ids.
+    hit_rate (float): Fraction of ids that are present in the database.
+    seed (int): Random seed.
+
+    Returns:
+    ids (list): Sampled ids.
+    """
+    rng = np.random.default_rng(seed)
+    con = sqlite3.connect(db_path)
+    n_variants = con.execute("SELECT MAX(rowid) FROM GTEx_lookup").fetchone()[0]
+    n_hits = int(n_ids * hit_rate)
+    rowids = rng.integers(1, n_variants + 1, n_hits).tolist()
+    hits = {}
+    for i in range(0, len(rowids), 10_000):
+        batch = rowids[i : i + 10_000]
+        query = f"SELECT rowid, {lookup_column} FROM GTEx_lookup WHERE rowid IN ({', '.join('?' * len(batch))})"
+        hits.update(con.execute(query, batch).fetchall())
+    con.close()
+    ids = [hits[rowid] for rowid in rowids]
+    if lookup_column == "rsid_dbSNP155":
+        ids += [f"rs{n_variants + i + 1}" for i in range(n_ids - n_hits)]
+    else:
+        ids += [f"23_{i + 1}" for i in range(n_ids - n_hits)]
+    rng.shuffle(ids)
+    return ids
+
+
+def make_sumstats(db_path, path, n_rows, hit_rate=0.9, seed=2):
+    """
+    Writes a tab-separated summary statistics file for a synthetic database, with columns for
+    all three modes. Rows missing from the database have rsIDs and positions that are not in it.
+
+    Parameters:
+    db_path (str): Path of a database created by make_gtex_db().
+    path (str): Path of the file to create.
+    n_rows (int): Number of rows.
+    hit_rate (float): Fraction of rows that are present in the database.
+    seed (int): Random seed.
+
+    Returns:
+    path (str): Path of the file.
+    """
+    rng = np.random.default_rng(seed)
+    con = sqlite3.connect(db_path)
+    n_variants = con.execute("SELECT MAX(rowid) FROM GTEx_lookup").fetchone()[0]
+    n_hits = int(n_rows * hit_rate)
+    rowids = rng.integers(1, n_variants + 1, n_hits).tolist()
+    records = {}
+    for i in range(0, len(rowids), 10_000):
+        batch = rowids[i : i + 10_000]
+        query = (
+            "SELECT rowid, rsid_dbSNP155, chrpos37, chrpos38, ref, alt FROM GTEx_lookup "
+            f"WHERE rowid IN ({', '.join('?' * len(batch))})"
+        )
+        records.update((row[0], row[1:]) for row in con.execute(query, batch))
+    con.close()
+
+    rows = [records[rowid] for rowid in rowids]
+    rows += [
+        (f"rs{n_variants + i + 1}", f"1_{2**28 + i}", f"1_{2**28 + i}", "A", "C")
+        for i in range(n_rows - n_hits)
+    ]
+    rng.shuffle(rows)
+    rsids, chrpos37, chrpos38, ref, alt = zip(*rows, strict=True)
+    parts37 = [value.split("_") for value in chrpos37]
+    parts38 = [value.split("_") for value in chrpos38]
+    beta = rng.normal(0, 0.05, n_rows)
+    se = rng.uniform(0.005, 0.05, n_rows)
+    p = rng.uniform(0, 1, n_rows)
+    with open(path, "w") as f:
+        f.write("ID\tCHR37\tPOS37\tCHR38\tPOS38\tA1\tA2\tBETA\tSE\tP\n")
+        for i in range(n_rows):
+            f.write(
+                f"{rsids[i]}\t{parts37[i][0]}\t{parts37[i][1]}\t{parts38[i][0]}\t{parts38[i][1]}"
+                f"\t{alt[i]}\t{ref[i]}\t{beta[i]:.6g}\t{se[i]:.6g}\t{p[i]:.6g}\n"
+            )
+    return path
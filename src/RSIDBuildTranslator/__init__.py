@@ -0,0 +1,10 @@
+__all__ = ["Translator"]
+
+
+def __getattr__(name):
+    # Imported on first use, so that the command line starts without loading pandas.
+    if name == "Translator":
+        from RSIDBuildTranslator.api import Translator
+
+        return Translator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,971 @@
+import itertools
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from RSIDBuildTranslator.binary_store import load_binary_store
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.lookup_cache import (
+    CACHE_FILENAME,
+    DEFAULT_MAX_KEYS,
+    LookupResultCache,
+    get_cache_namespace,
+)
+from RSIDBuildTranslator.merge_join import merge_join_chrpos
+from RSIDBuildTranslator.partitions import (
+    CHROMOSOMES,
+    check_partitions,
+    drop_row_column,
+    get_partition_output_path,
+    get_partition_path,
+    restore_input_order,
+    split_by_chromosome,
+)
+from RSIDBuildTranslator.profiling import ProgressReporter, profile_chunks, profile_stage
+from RSIDBuildTranslator.provision import get_data_dir, get_db_version
+from RSIDBuildTranslator.utils import (
+    OutputWriter,
+    ReadOnlyConnectionPool,
+    attach_annotations,
+    cleanup_query_df,
+    create_ids_to_search,
+    find_gtex_db,
+    get_left_join_rows,
+    get_local_partitions_path,
+    get_local_store_path,
+    get_output_columns,
+    import_pyarrow,
+    load_gtex_data,
+    make_checks_chrpos,
+    make_checks_rsid,
+    normalize_ids,
+    parse_chrpos,
+    parse_dtype_hints,
+    query_to_df,
+    read_input_chunks,
+    read_input_file,
+    split_and_drop_columns,
+    warn_missing_index,
+)
+from RSIDBuildTranslator.vcf import VCF_CHUNKSIZE, is_vcf_path
+
+# GTEx column looked up by each mode.
+LOOKUP_COLUMNS = {"rsid": "rsid_dbSNP155", "chrpos37": "chrpos37", "chrpos38": "chrpos38"}
+# Keys of mode "auto" in the order they are tried. rsIDs come first, since they need no parsing
+# and match fewer records than positions shared by several alleles.
+AUTO_KEYS = ["rsid", "chrpos38", "chrpos37"]
+
+
+def get_lookup_column(mode, columns):
+    """
+    Returns the GTEx lookup column of a mode, after checking the input columns given for it.
+
+    Parameters:
+    mode (str): One of "rsid", "chrpos37" or "chrpos38".
+    columns (list): Input column names, the rsID column or the chromosome and position columns.
+
+    Returns:
+    lookup_column (str): Name of column from GTEx table used for query.
+    """
+    if mode not in LOOKUP_COLUMNS:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {list(LOOKUP_COLUMNS)}.")
+    expected = 1 if mode == "rsid" else 2
+    if len(columns) != expected:
+        raise ValueError(
+            f"Mode '{mode}' needs {expected} input column(s), got {len(columns)}: {columns}"
+        )
+    return LOOKUP_COLUMNS[mode]
+
+
+def get_auto_keys(columns):
+    """
+    Checks the input columns given for mode "auto".
+
+    Parameters:
+    columns (dict): Input column names of one or more keys, e.g. {"rsid": "ID", "chrpos38":
+        ["CHROM", "POS"]}, see Translator.annotate().
+
+    Returns:
+    keys (dict): Input column lists of the keys, in the order of AUTO_KEYS.
+    """
+    if not isinstance(columns, dict) or not columns:
+        raise ValueError(
+            f"Mode 'auto' needs a dict mapping one or more of {AUTO_KEYS} to input column names."
+        )
+    unknown = [key for key in columns if key not in AUTO_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown keys {unknown} for mode 'auto', expected {AUTO_KEYS}.")
+    keys = {}
+    for key in AUTO_KEYS:
+        if key in columns:
+            key_columns = columns[key]
+            keys[key] = [key_columns] if isinstance(key_columns, str) else list(key_columns)
+            get_lookup_column(key, keys[key])
+    return keys
+
+
+def check_input(data, mode, columns):
+    """
+    Runs the input checks of a mode, logging any problems found. Mode "auto" passes if the
+    input has all key columns and at least one key passes its checks, since rows with an invalid
+    key can still be resolved with another one.
+
+    Parameters:
+    data (pd.DataFrame): Input data.
+    mode (str): One of "rsid", "chrpos37", "chrpos38" or "auto".
+    columns (str, list or dict): Input column names, see Translator.annotate().
+
+    Returns:
+    bool: True if checks pass, or False
+    """
+    if mode == "auto":
+        keys = get_auto_keys(columns)
+        missing = [col for cols in keys.values() for col in cols if col not in data.columns]
+        if missing:
+            logger.error(f"Columns {missing} do not exist in the input dataframe.")
+            return False
+        passed = False
+        for key, key_columns in keys.items():
+            passed = check_input(data, key, key_columns) | passed
+            if "new_ids" in data.columns:
+                # Kept apart, since every chrpos key parses its ids into "new_ids".
+                data[f"{key}_ids"] = data.pop("new_ids")
+        return passed
+
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    get_lookup_column(mode, columns)
+    with profile_stage("validate", len(data)):
+        if mode == "rsid":
+            return make_checks_rsid(data, columns[0])
+        return make_checks_chrpos(data, columns[0], columns[1])
+
+
+def check_allele_columns(data, alleles):
+    """
+    Checks that the allele columns given for matching exist in the input data.
+
+    Parameters:
+    data (pd.DataFrame): Input data.
+    alleles (list): Names of the ref and alt allele columns, or None.
+
+    Returns:
+    bool: True if checks pass, or False
+    """
+    if not alleles:
+        return True
+    if len(alleles) != 2:
+        logger.error(f"Allele matching needs a ref and an alt column, got {alleles}.")
+        return False
+    missing = [col for col in alleles if col not in data.columns]
+    if missing:
+        logger.error(f"Allele columns {missing} do not exist in the input dataframe.")
+        return False
+    return True
+
+
+def get_ids(input_data, mode, columns):
+    """
+    Returns the unique, valid ids to look up for a dataframe.
+
+    Parameters:
+    input_data (pd.DataFrame): Input data. For the chrpos modes a "new_ids" column is added.
+    mode (str): One of "rsid", "chrpos37" or "chrpos38".
+    columns (list): Input column names, see Translator.annotate().
+
+    Returns:
+    input_data (pd.DataFrame): Input data.
+    ids_to_search (list): Unique, valid ids to look up.
+    input_data_column (str): Column of input_data holding the ids, to merge results on.
+    """
+    with profile_stage("key_build", len(input_data)):
+        if mode == "rsid":
+            ids_to_search = create_ids_to_search(input_data, columns)
+            input_data_column = columns[0]
+        else:
+            input_data, ids_to_search = create_ids_to_search(input_data, columns)
+            input_data_column = "new_ids"
+        ids_to_search = normalize_ids(ids_to_search, LOOKUP_COLUMNS[mode])
+    return input_data, ids_to_search, input_data_column
+
+
+def merge_results(
+    results_df, input_data, input_data_column, lookup_column, exclude_ref_alt, alleles=None
+):
+    """Merges lookup results into the input data with cleanup_query_df(), raising on errors."""
+    with profile_stage("cleanup_query_df", len(input_data)):
+        final_df = cleanup_query_df(
+            results_df, input_data, input_data_column, lookup_column, exclude_ref_alt, alleles
+        )
+    if final_df is None:
+        raise RuntimeError("Merging the GTEx annotations into the input data failed.")
+    return final_df
+
+
+class Translator:
+    """
+    Annotates dataframes in memory, without reading or writing any files. The database is opened
+    once and reused by every call to annotate(), so one Translator can serve many dataframes,
+    e.g. all partitions handled by a Snakemake or Dask worker.
+
+    Example:
+        with Translator() as translator:
+            annotated = translator.annotate(df, mode="chrpos38", columns=["CHROM", "POS"])
+
+    Parameters:
+    db_path (str): Path to a GTEx SQLite database, or to a binary store with backend="binary".
+        Defaults to the copy in $RSIDBuildTranslator_DATA or the package, which is downloaded if
+        missing.
+    backend (str): Either "sqlite" or "binary".
+    lookup_strategy (str): Either "temp-table" or "in-list", see query_to_df().
+    batch_size (int): Number of ids per query for lookup_strategy="in-list".
+    threads (int): Number of worker processes for SQLite lookups.
+    mmap (bool): "True" opens the SQLite database read-only, immutable and memory-mapped, so
+        that concurrent jobs on one node share the OS page cache instead of each caching pages.
+    lookup_cache (bool or str): "True" keeps the results of SQLite lookups in an on-disk cache
+        in the data directory, or in the given file, and answers ids found there without
+        querying the database, see LookupResultCache.
+    lookup_cache_size (int): Maximum number of ids kept in the lookup cache.
+    """
+
+    def __init__(
+        self,
+        db_path=None,
+        backend="sqlite",
+        lookup_strategy="temp-table",
+        batch_size=500,
+        threads=1,
+        mmap=False,
+        lookup_cache=False,
+        lookup_cache_size=DEFAULT_MAX_KEYS,
+    ):
+        self.lookup_strategy = lookup_strategy
+        self.batch_size = batch_size
+        self.gtex_con = None
+        self.gtex_pool = None
+        self.gtex_store = None
+        self.lookup_cache = None
+        self.checked_columns = set()
+
+        if backend == "binary":
+            self.gtex_store = load_binary_store(db_path or get_local_store_path())
+            if self.gtex_store is None:
+                raise RuntimeError("Binary store could not be loaded.")
+            if lookup_cache:
+                logger.warning("The lookup cache is only used with the 'sqlite' backend.")
+            return
+        if backend != "sqlite":
+            raise ValueError(f"Unknown backend '{backend}', expected 'sqlite' or 'binary'.")
+
+        self.gtex_con = load_gtex_data(db_path, mmap)
+        if self.gtex_con is None:
+            raise RuntimeError("GTEx database could not be loaded.")
+        # Workers and the cache use the same file as the main connection, however it was found.
+        db_file = self.gtex_con.execute("PRAGMA database_list").fetchone()[2]
+        if threads > 1:
+            self.gtex_pool = ReadOnlyConnectionPool(db_file, threads, mmap)
+        if lookup_cache:
+            cache_path = lookup_cache
+            if cache_path is True:
+                cache_path = os.path.join(get_data_dir(), CACHE_FILENAME)
+            self.lookup_cache = LookupResultCache(cache_path, lookup_cache_size)
+            self.db_version = get_db_version(db_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the database connection and shuts down worker processes."""
+        if self.lookup_cache is not None:
+            self.lookup_cache.close()
+            self.lookup_cache = None
+        if self.gtex_pool is not None:
+            self.gtex_pool.close()
+            self.gtex_pool = None
+        if self.gtex_con is not None:
+            self.gtex_con.close()
+            self.gtex_con = None
+
+    def annotate(
+        self,
+        data,
+        mode,
+        columns,
+        exclude_ref_alt=False,
+        check=True,
+        sorted_input=False,
+        alleles=None,
+    ):
+        """
+        Annotates a dataframe with the matching variant ids from the GTEx database. The input is
+        not modified.
+
+        Parameters:
+        data (pd.DataFrame or pyarrow.Table): Input data.
+        mode (str): One of "rsid", "chrpos37", "chrpos38" or "auto".
+        columns (str, list or dict): Input column names, i.e. the rsID column for mode "rsid",
+            or the chromosome and position columns for the chrpos modes. For mode "auto", a dict
+            with the columns of one or more of these keys, e.g. {"rsid": "ID", "chrpos37":
+            ["CHR", "BP"]}, see resolve_keys().
+        exclude_ref_alt (bool): "True" excludes ref and alt alleles from the output.
+        check (bool): "True" runs the input checks first and raises ValueError if they fail.
+        sorted_input (bool): "True" annotates the chrpos modes with a merge join on
+            (chromosome, position), which is fastest for input sorted by chromosome and position.
+        alleles (list): Names of the ref and alt allele columns. If given, rows are only
+            annotated with the records matching their alleles, also swapped or on the opposite
+            strand, instead of with every record at their position. An "allele_match" column
+            tells how each row matched, see match_alleles().
+
+        Returns:
+        pd.DataFrame or pyarrow.Table: Annotated data, of the same type as the input.
+        """
+        if mode == "auto":
+            columns = get_auto_keys(columns)
+        else:
+            columns = [columns] if isinstance(columns, str) else list(columns)
+            lookup_column = get_lookup_column(mode, columns)
+
+        is_arrow = type(data).__module__.startswith("pyarrow")
+        # Columns added while parsing ids must not show up in the caller's dataframe.
+        input_data = data.to_pandas() if is_arrow else data.copy(deep=False)
+
+        if check and not check_input(input_data, mode, columns):
+            raise ValueError(f"Input data did not pass the checks of mode '{mode}'.")
+        if not check_allele_columns(input_data, alleles):
+            raise ValueError(f"Allele columns {alleles} are not valid.")
+
+        if mode == "auto":
+            final_df = self.resolve_keys(input_data, columns, exclude_ref_alt, alleles)
+        elif sorted_input and mode != "rsid":
+            gtex_cur = self.get_cursor(lookup_column, pooled=False)
+            with profile_stage("merge_join", len(input_data)):
+                final_df = merge_join_chrpos(
+                    input_data, *columns, lookup_column, gtex_cur, exclude_ref_alt, alleles
+                )
+        else:
+            input_data, ids_to_search, input_data_column = get_ids(input_data, mode, columns)
+            # Allele matching needs the alleles of the records, even if they are not written.
+            results_df = self.lookup(ids_to_search, lookup_column, exclude_ref_alt and not alleles)
+            final_df = merge_results(
+                results_df, input_data, input_data_column, lookup_column, exclude_ref_alt, alleles
+            )
+        if is_arrow:
+            return import_pyarrow().Table.from_pandas(final_df, preserve_index=False)
+        return final_df
+
+    def resolve_keys(self, input_data, keys, exclude_ref_alt=False, alleles=None):
+        """
+        Annotates a dataframe in one pass from several keys. Each key is looked up with one
+        batched query, in the order of AUTO_KEYS, and only for the rows that earlier keys left
+        unresolved. The records of all keys are then attached to the input rows in one merge,
+        with a "matched_by" column naming the key each row was resolved with.
+
+        Parameters:
+        input_data (pd.DataFrame): Input data, may be modified.
+        keys (dict): Input column lists of the keys, as returned by get_auto_keys().
+        exclude_ref_alt (bool): "True" excludes ref and alt alleles from the output.
+        alleles (list): Names of the input ref and alt allele columns to match, see
+            match_alleles(). Rows whose alleles match none of their records are not resolved
+            with later keys.
+
+        Returns:
+        final_df (pd.DataFrame): Input data with rsID, both builds' chromosome and position and
+            the alleles of the matching records.
+        """
+        annotation_columns = ["rsid_dbSNP155", "chr37", "pos37", "chr38", "pos38"]
+        if not exclude_ref_alt:
+            annotation_columns += ["ref", "alt"]
+        annotation_columns.append("matched_by")
+        # Allele matching needs the alleles of the records, even if they are not written.
+        result_columns = annotation_columns
+        if alleles and exclude_ref_alt:
+            result_columns = annotation_columns + ["ref", "alt"]
+
+        unresolved = np.ones(len(input_data), dtype=bool)
+        first_rows = np.zeros(len(input_data), dtype=np.int64)
+        counts = np.zeros(len(input_data), dtype=np.int64)
+        results = []
+        offset = 0
+        for key, key_columns in keys.items():
+            if not unresolved.any():
+                break
+            lookup_column = LOOKUP_COLUMNS[key]
+            with profile_stage("key_build", int(unresolved.sum())):
+                if key == "rsid":
+                    key_ids = input_data[key_columns[0]]
+                elif f"{key}_ids" in input_data.columns:
+                    key_ids = input_data[f"{key}_ids"]
+                else:
+                    key_ids = parse_chrpos(input_data, *key_columns)[0]
+                key_ids = key_ids.where(unresolved)
+                ids_to_search = normalize_ids(key_ids.tolist(), lookup_column)
+            if not ids_to_search:
+                continue
+            results_df = self.lookup(ids_to_search, lookup_column, exclude_ref_alt and not alleles)
+
+            with profile_stage("cleanup_query_df", len(results_df)):
+                codes, uniques = pd.factorize(results_df[lookup_column])
+                key_counts = np.bincount(codes, minlength=len(uniques))
+                # Records grouped by id, in their original order within each id.
+                results_df = results_df.take(np.argsort(codes, kind="stable"))
+                row_codes = pd.Index(uniques).get_indexer(key_ids)
+                matched = row_codes >= 0
+                first_rows[matched] = (
+                    offset + (np.cumsum(key_counts) - key_counts)[row_codes[matched]]
+                )
+                counts[matched] = key_counts[row_codes[matched]]
+                unresolved &= ~matched
+                for col in ("chrpos37", "chrpos38"):
+                    build = col[-2:]
+                    results_df = split_and_drop_columns(
+                        results_df, col, f"chr{build}", f"pos{build}"
+                    )
+                results_df["matched_by"] = key
+                results.append(results_df[result_columns].reset_index(drop=True))
+                offset += len(results_df)
+
+        with profile_stage("cleanup_query_df", len(input_data)):
+            if results:
+                results_df = pd.concat(results, ignore_index=True)
+            else:
+                results_df = pd.DataFrame(columns=result_columns, dtype=object)
+            input_rows, result_rows = get_left_join_rows(first_rows, counts)
+            final_df = attach_annotations(
+                input_data,
+                input_rows,
+                results_df,
+                result_rows,
+                annotation_columns,
+                [f"{key}_ids" for key in keys],
+                alleles,
+            )
+        logger.info(
+            f"Resolved {len(input_data) - int(unresolved.sum())} of {len(input_data)} rows with "
+            f"keys {list(keys)}."
+        )
+        return final_df
+
+    def lookup(self, ids_to_search, lookup_column, exclude_ref_alt=False):
+        """
+        Looks up ids in the GTEx database, or in the lookup cache first if it is enabled.
+
+        Parameters:
+        ids_to_search (list): Unique, valid ids as returned by normalize_ids().
+        lookup_column (str): Name of column from GTEx table used for query.
+        exclude_ref_alt (bool): "True" excludes ref and alt alleles from the results.
+
+        Returns:
+        results_df (pd.DataFrame): Query results, see query_to_df().
+        """
+        columns = get_output_columns(lookup_column, exclude_ref_alt)
+        if self.lookup_cache is None:
+            return self.query(ids_to_search, lookup_column, columns)
+        # The cache keeps all columns, so it can answer lookups with and without alleles.
+        all_columns = get_output_columns(lookup_column)
+        try:
+            results_df = self.lookup_cache.lookup(
+                get_cache_namespace(self.db_version, lookup_column),
+                ids_to_search,
+                all_columns,
+                partial(self.query, lookup_column=lookup_column, columns=all_columns),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Lookup cache could not be used, querying all ids: {e}")
+            results_df = self.query(ids_to_search, lookup_column, all_columns)
+        return results_df[columns]
+
+    def query(self, ids_to_search, lookup_column, columns):
+        """Queries ids in the GTEx database with query_to_df(), raising on errors."""
+        with profile_stage("query_to_df", len(ids_to_search)):
+            results_df = query_to_df(
+                "GTEx_lookup",
+                ids_to_search,
+                lookup_column,
+                self.get_cursor(lookup_column),
+                self.batch_size,
+                self.lookup_strategy,
+                columns,
+            )
+        if results_df is None:
+            raise RuntimeError("Looking up ids in the GTEx database failed.")
+        return results_df
+
+    def get_cursor(self, lookup_column, pooled=True):
+        """
+        Returns the database handle used by query_to_df(), checking once per lookup column that
+        the SQLite database has an index for it, see warn_missing_index(). With pooled=False a
+        cursor of the main connection is returned even if there are worker processes.
+        """
+        if self.gtex_store is not None:
+            return self.gtex_store
+        if self.gtex_con is None:
+            raise RuntimeError("Translator is closed.")
+        if lookup_column not in self.checked_columns:
+            warn_missing_index(self.gtex_con, lookup_column)
+            self.checked_columns.add(lookup_column)
+        if pooled and self.gtex_pool is not None:
+            return self.gtex_pool
+        return self.gtex_con.cursor()
+
+
+def get_cli_read_options(args):
+    """Returns the options for reading input files given on the command line."""
+    return {
+        # Allows "\t" to be typed on the command line for tabs.
+        "sep": args.sep.encode().decode("unicode_escape") if args.sep else None,
+        "dtype": parse_dtype_hints(args.dtype),
+        "passthrough": args.passthrough,
+    }
+
+
+def get_cli_alleles(args):
+    """Returns the allele columns given on the command line for matching, or None."""
+    if bool(args.ref_col) != bool(args.alt_col):
+        raise ValueError("Allele matching needs both --ref-col and --alt-col.")
+    return [args.ref_col, args.alt_col] if args.ref_col else None
+
+
+def get_chunksize(args, path):
+    """Returns the number of rows per chunk to read an input file in, or None to read it whole."""
+    # VCF files are always streamed, so that they are annotated with bounded memory.
+    return args.chunksize or (VCF_CHUNKSIZE if is_vcf_path(path) else None)
+
+
+def open_input(path, chunksize, read_options):
+    """
+    Reads the first chunk of an input file, or the whole file if chunksize is not set.
+
+    Parameters:
+    path (str): Input file path.
+    chunksize (int): Number of rows per chunk, or None.
+    read_options (dict): Options for read_input_file(), e.g. from get_cli_read_options().
+
+    Returns:
+    input_data (pd.DataFrame): First chunk, or None if the file could not be read or is empty.
+    chunks (iterator): Remaining chunks.
+    """
+    if not chunksize:
+        with profile_stage("read") as call:
+            input_data = read_input_file(path, **read_options)
+            call["rows"] = len(input_data) if input_data is not None else 0
+        return input_data, iter(())
+
+    chunks = read_input_chunks(path, chunksize, **read_options)
+    if chunks is None:
+        return None, iter(())
+    chunks = profile_chunks("read", chunks)
+    try:
+        input_data = next(chunks, None)
+    except Exception as e:
+        logger.error(f"An error has occured while reading the input file: {e}")
+        return None, iter(())
+    if input_data is None or input_data.empty:
+        logger.error(f"Input file '{path}' is empty.")
+        return None, iter(())
+    return input_data, chunks
+
+
+def create_translator(args):
+    """Returns a Translator with the settings given on the command line, or None on errors."""
+    db_path = args.db
+    if db_path is not None and args.backend == "binary":
+        db_path = get_local_store_path(db_path)
+    try:
+        return Translator(
+            db_path,
+            backend=args.backend,
+            lookup_strategy=args.lookup_strategy,
+            batch_size=args.batch_size,
+            threads=args.threads,
+            mmap=args.mmap,
+            lookup_cache=args.lookup_cache,
+            lookup_cache_size=args.lookup_cache_size,
+        )
+    except RuntimeError as e:
+        logger.error(e)
+        return None
+
+
+def annotate_file(args, mode, columns, sorted_input=False):
+    """
+    Reads the input file, runs checks, annotates it with a Translator and writes the output
+    file. If args.chunksize is set, the input is streamed in chunks of that many rows, so that
+    memory use depends on the chunk size rather than the file size. VCF files are always
+    streamed, and can be written back as VCF, see get_vcf_records().
+
+    Parameters:
+    args (argparse.Namespace): Parsed command line arguments.
+    mode (str): One of "rsid", "chrpos37", "chrpos38" or "auto".
+    columns (list or dict): Input column names given on the command line for the mode.
+    sorted_input (bool): "True" uses the merge join for input sorted by chromosome and position,
+        see Translator.annotate().
+
+    Returns:
+    None
+    """
+    try:
+        read_options = get_cli_read_options(args)
+        alleles = get_cli_alleles(args)
+    except ValueError as e:
+        logger.error(e)
+        return
+
+    chunksize = get_chunksize(args, args.input)
+    input_data, chunks = open_input(args.input, chunksize, read_options)
+    if input_data is None or not check_input(input_data, mode, columns):
+        return
+    if not check_allele_columns(input_data, alleles):
+        return
+    chunks = itertools.chain([input_data], chunks)
+
+    translator = create_translator(args)
+    if translator is None:
+        return
+
+    try:
+        progress = ProgressReporter("Annotated")
+        vcf_header = input_data.attrs.get("vcf_header")
+        with (
+            translator,
+            OutputWriter(
+                args.output, text_columns=bool(chunksize), vcf_header=vcf_header
+            ) as writer,
+        ):
+            for i, chunk in enumerate(chunks):
+                if i > 0:
+                    # Later chunks are only validated for logging; rows are always written out.
+                    check_input(chunk, mode, columns)
+                final_df = translator.annotate(
+                    chunk, mode, columns, args.exclude_ref_alt, False, sorted_input, alleles
+                )
+                if i == 0:
+                    print("Output file head:\n")
+                    print(final_df.head())
+                writer.write(final_df)
+                progress.update(len(chunk))
+        logger.info(f"Output file successfully written to '{args.output}' {writer.description}.")
+    except Exception as e:
+        logger.error(f"An error has occured while processing the input file: {e}")
+
+
+# Directory of the database partitions, Translator settings and the Translators of the
+# partitions opened so far, in the current process.
+partition_state = None
+
+
+def init_partition_worker(partitions_path, translator_options):
+    """Stores the partitions and Translator settings for annotate_partition()."""
+    global partition_state
+    partition_state = (partitions_path, translator_options, {})
+
+
+def close_partition_worker():
+    """Closes the Translators of the partitions opened by the current process."""
+    global partition_state
+    if partition_state is not None:
+        for translator in partition_state[2].values():
+            translator.close()
+        partition_state = None
+
+
+def annotate_partition(task):
+    """
+    Annotates the rows of one chromosome with the database partition of that chromosome, which
+    is opened the first time the current process annotates the chromosome.
+
+    Parameters:
+    task (tuple): Chromosome, its input rows and the arguments of Translator.annotate().
+
+    Returns:
+    final_df (pd.DataFrame): Annotated rows.
+    """
+    chrom, data, *annotate_args = task
+    partitions_path, translator_options, translators = partition_state
+    # Rows without a valid chromosome match no record, so any partition annotates them.
+    chrom = chrom or CHROMOSOMES[0]
+    if chrom not in translators:
+        translators[chrom] = Translator(
+            get_partition_path(partitions_path, chrom), **translator_options
+        )
+    return translators[chrom].annotate(data, *annotate_args)
+
+
+def annotate_partitioned(args, mode, columns, sorted_input=False):
+    """
+    Annotates the input file chromosome by chromosome, with the database partitions built by
+    "db build-partitions". The rows of every chunk are split by chromosome, and each chromosome
+    is looked up and merged by one of args.threads worker processes, which only open the
+    partitions of the chromosomes they annotate. The output is written in input order, or with
+    args.split_output to one file per chromosome, see get_partition_output_path().
+
+    Parameters:
+    args (argparse.Namespace): Parsed command line arguments.
+    mode (str): Either "chrpos37" or "chrpos38".
+    columns (list): Input chromosome and position column names.
+    sorted_input (bool): "True" uses the merge join within each chromosome, see
+        Translator.annotate().
+
+    Returns:
+    None
+    """
+    try:
+        read_options = get_cli_read_options(args)
+        alleles = get_cli_alleles(args)
+    except ValueError as e:
+        logger.error(e)
+        return
+    if args.backend != "sqlite" or args.lookup_cache:
+        logger.warning("--partitioned always uses the SQLite partitions, without a lookup cache.")
+
+    db_path = find_gtex_db(args.db)
+    if db_path is None:
+        return
+    partitions_path = get_local_partitions_path(db_path)
+    if not check_partitions(partitions_path, db_path):
+        return
+
+    chunksize = get_chunksize(args, args.input)
+    input_data, chunks = open_input(args.input, chunksize, read_options)
+    if input_data is None or not check_input(input_data, mode, columns):
+        return
+    if not check_allele_columns(input_data, alleles):
+        return
+    chunks = itertools.chain([input_data], chunks)
+    vcf_header = input_data.attrs.get("vcf_header")
+
+    translator_options = {
+        "lookup_strategy": args.lookup_strategy,
+        "batch_size": args.batch_size,
+        "mmap": args.mmap,
+    }
+    if args.threads > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=args.threads,
+            initializer=init_partition_worker,
+            initargs=(partitions_path, translator_options),
+        )
+        map_tasks = executor.map
+    else:
+        executor = None
+        init_partition_worker(partitions_path, translator_options)
+        map_tasks = map
+
+    writers = {}
+    try:
+        progress = ProgressReporter("Annotated")
+        for i, chunk in enumerate(chunks):
+            if i > 0:
+                # Later chunks are only validated for logging; rows are always written out.
+                check_input(chunk, mode, columns)
+            parts = split_by_chromosome(chunk, *columns)
+            tasks = [
+                (chrom, data, mode, columns, args.exclude_ref_alt, False, sorted_input, alleles)
+                for chrom, data in parts
+            ]
+            results = list(map_tasks(annotate_partition, tasks))
+            if args.split_output:
+                outputs = [
+                    (get_partition_output_path(args.output, chrom), drop_row_column(result))
+                    for (chrom, _), result in zip(parts, results, strict=True)
+                ]
+            else:
+                outputs = [(args.output, restore_input_order(results))]
+            for path, final_df in outputs:
+                if i == 0 and path == outputs[0][0]:
+                    print("Output file head:\n")
+                    print(final_df.head())
+                if path not in writers:
+                    writers[path] = OutputWriter(
+                        path, text_columns=bool(chunksize), vcf_header=vcf_header
+                    )
+                writers[path].write(final_df)
+            progress.update(len(chunk))
+        for path, writer in writers.items():
+            logger.info(f"Output file successfully written to '{path}' {writer.description}.")
+    except Exception as e:
+        logger.error(f"An error has occured while processing the input file: {e}")
+    finally:
+        for writer in writers.values():
+            writer.close()
+        if executor is not None:
+            executor.shutdown()
+        else:
+            close_partition_worker()
+
+
+# Lookup results and their index, shared by all files of a batch in the current process.
+batch_results = None
+
+
+def init_batch_worker(results_df, lookup_column):
+    """Stores the lookup results of a batch for write_annotated_file()."""
+    global batch_results
+    batch_results = (results_df, pd.Index(results_df[lookup_column]))
+
+
+def map_files(function, file_pairs, workers, initializer=None, initargs=()):
+    """
+    Runs function on each (input path, output path) pair, in up to workers processes.
+
+    Returns:
+    results (list): Return values of function, in the order of file_pairs.
+    """
+    if workers <= 1 or len(file_pairs) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [function(file_pair) for file_pair in file_pairs]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(file_pairs)), initializer=initializer, initargs=initargs
+    ) as executor:
+        return list(executor.map(function, file_pairs))
+
+
+def collect_file_ids(file_pair, mode, columns, args, read_options):
+    """
+    Reads an input file and returns the unique, valid ids to look up for it.
+
+    Returns:
+    ids (list): Unique ids, or None if the file could not be read or failed the checks.
+    """
+    path = file_pair[0]
+    try:
+        input_data, chunks = open_input(path, get_chunksize(args, path), read_options)
+        if (
+            input_data is None
+            or not check_input(input_data, mode, columns)
+            or not check_allele_columns(input_data, get_cli_alleles(args))
+        ):
+            logger.error(f"Skipping input file '{path}'.")
+            return None
+        ids = {}
+        for i, chunk in enumerate(itertools.chain([input_data], chunks)):
+            if i > 0:
+                check_input(chunk, mode, columns)
+            ids.update(dict.fromkeys(get_ids(chunk, mode, columns)[1]))
+        return list(ids)
+    except Exception as e:
+        logger.error(f"An error has occured while reading the input file '{path}': {e}")
+        return None
+
+
+def write_annotated_file(file_pair, mode, columns, args, read_options):
+    """
+    Annotates an input file with the matching rows of the results looked up for the whole batch,
+    and writes the output file.
+
+    Returns:
+    bool: True if the output file was written, or False
+    """
+    input_path, output_path = file_pair
+    lookup_column = LOOKUP_COLUMNS[mode]
+    results_df, results_index = batch_results
+    try:
+        chunksize = get_chunksize(args, input_path)
+        input_data, chunks = open_input(input_path, chunksize, read_options)
+        if input_data is None:
+            return False
+        vcf_header = input_data.attrs.get("vcf_header")
+        with OutputWriter(
+            output_path, text_columns=bool(chunksize), vcf_header=vcf_header
+        ) as writer:
+            for chunk in itertools.chain([input_data], chunks):
+                chunk, ids_to_search, input_data_column = get_ids(chunk, mode, columns)
+                positions = results_index.get_indexer_for(ids_to_search)
+                chunk_results = results_df.iloc[np.sort(positions[positions >= 0])]
+                writer.write(
+                    merge_results(
+                        chunk_results,
+                        chunk,
+                        input_data_column,
+                        lookup_column,
+                        args.exclude_ref_alt,
+                        get_cli_alleles(args),
+                    )
+                )
+        logger.info(f"Output file successfully written to '{output_path}' {writer.description}.")
+        return True
+    except Exception as e:
+        logger.error(f"An error has occured while processing the input file '{input_path}': {e}")
+        return False
+
+
+def annotate_files(args, mode, columns, file_pairs):
+    """
+    Annotates many input files with one database connection. The ids of all files are collected
+    first and looked up together, so ids shared by several files are looked up only once. Files
+    are read and written by up to args.threads worker processes at a time.
+
+    Parameters:
+    args (argparse.Namespace): Parsed command line arguments.
+    mode (str): One of "rsid", "chrpos37" or "chrpos38".
+    columns (list): Input column names given on the command line for the mode.
+    file_pairs (list): (input path, output path) tuples.
+
+    Returns:
+    written (int): Number of output files written.
+    """
+    try:
+        read_options = get_cli_read_options(args)
+        alleles = get_cli_alleles(args)
+        lookup_column = get_lookup_column(mode, columns)
+    except ValueError as e:
+        logger.error(e)
+        return 0
+
+    file_ids = map_files(
+        partial(collect_file_ids, mode=mode, columns=columns, args=args, read_options=read_options),
+        file_pairs,
+        args.threads,
+    )
+    total = len(file_pairs)
+    file_pairs = [pair for pair, ids in zip(file_pairs, file_ids, strict=True) if ids is not None]
+    if not file_pairs:
+        logger.error("None of the input files could be annotated.")
+        return 0
+    ids_to_search = list(dict.fromkeys(itertools.chain.from_iterable(filter(None, file_ids))))
+    logger.info(
+        f"Looking up {len(ids_to_search)} unique ids for {len(file_pairs)} files, instead of "
+        f"{sum(len(ids) for ids in file_ids if ids is not None)} ids looked up file by file."
+    )
+
+    translator = create_translator(args)
+    if translator is None:
+        return 0
+    try:
+        with translator:
+            results_df = translator.lookup(
+                ids_to_search, lookup_column, args.exclude_ref_alt and not alleles
+            )
+    except Exception as e:
+        logger.error(f"An error has occured while looking up ids: {e}")
+        return 0
+
+    # Splitting the chrpos columns once here saves every file from doing it again.
+    for col in ("chrpos37", "chrpos38"):
+        if col != lookup_column:
+            build = col[-2:]
+            results_df = split_and_drop_columns(results_df, col, f"chr{build}", f"pos{build}")
+
+    written = sum(
+        map_files(
+            partial(
+                write_annotated_file,
+                mode=mode,
+                columns=columns,
+                args=args,
+                read_options=read_options,
+            ),
+            file_pairs,
+            args.threads,
+            init_batch_worker,
+            (results_df, lookup_column),
+        )
+    )
+    logger.info(f"Annotated {written} of {total} files.")
+    return written
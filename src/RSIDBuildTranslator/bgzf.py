@@ -0,0 +1,98 @@
+import io
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Largest amount of uncompressed data per block, as used by bgzip.
+BLOCK_SIZE = 0xFF00
+# Empty block that marks the end of a BGZF file.
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def compress_block(data, level):
+    """
+    Compresses data into one BGZF block, which is a gzip member with the block size stored in an
+    extra field.
+
+    Parameters:
+    data (bytes): Uncompressed data, at most BLOCK_SIZE bytes.
+    level (int): zlib compression level.
+
+    Returns:
+    block (bytes): Compressed BGZF block.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = struct.pack(
+        "<BBBBIBBHBBHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(deflated) + 25
+    )
+    footer = struct.pack("<II", zlib.crc32(data), len(data))
+    return header + deflated + footer
+
+
+class BgzfWriter(io.RawIOBase):
+    """
+    Binary file writer producing BGZF (blocked gzip) output, readable by gzip, bgzip and tabix.
+    Blocks are independent, so they are compressed in parallel by a pool of threads (zlib
+    releases the GIL) and written in order.
+    """
+
+    def __init__(self, path, threads=None, level=6):
+        # The file stays open for the lifetime of the writer and is closed by close().
+        self.file = open(path, "wb")  # noqa: SIM115
+        self.level = level
+        self.threads = threads or min(4, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.buffer = bytearray()
+        self.pending = deque()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= BLOCK_SIZE:
+            self.submit(bytes(self.buffer[:BLOCK_SIZE]))
+            del self.buffer[:BLOCK_SIZE]
+        return len(data)
+
+    def submit(self, block):
+        """Queues a block for compression, writing out finished blocks to bound memory use."""
+        self.pending.append(self.executor.submit(compress_block, block, self.level))
+        while len(self.pending) > 4 * self.threads:
+            self.file.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.buffer:
+                self.submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+            self.file.write(EOF_BLOCK)
+        finally:
+            self.executor.shutdown()
+            self.file.close()
+            super().close()
+
+
+def open_bgzf_text(path, threads=None):
+    """
+    Opens a BGZF file for writing text.
+
+    Parameters:
+    path (str): File path.
+    threads (int): Number of compression threads.
+
+    Returns:
+    io.TextIOWrapper: Text file handle.
+    """
+    return io.TextIOWrapper(
+        io.BufferedWriter(BgzfWriter(path, threads), buffer_size=BLOCK_SIZE),
+        encoding="utf-8",
+        newline="",
+    )
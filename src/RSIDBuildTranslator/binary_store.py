@@ -0,0 +1,431 @@
+import json
+import mmap
+import os
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import GTEX_COLUMNS, TABLE_NAME
+
+STORE_VERSION = 3
+CHROMOSOMES = [str(i) for i in range(1, 23)] + ["X", "Y", "M"]
+# Codes of the usual chromosome labels, in genomic order. Other labels of the database, e.g. "MT",
+# get the codes after these when the store is built, see encode_store_chrpos().
+CHR_CODES = {chrom: code for code, chrom in enumerate(CHROMOSOMES, start=1)}
+CHR_NAMES = np.array([None, *CHROMOSOMES], dtype=object)
+BYTE_CHARS = np.array([chr(i) for i in range(256)], dtype=object)
+
+# Name of the sorted key array for each lookup column of the GTEx table.
+KEY_ARRAYS = {"rsid_dbSNP155": "rsid", "chrpos37": "key37", "chrpos38": "key38"}
+ROW_ARRAYS = {
+    "rsid": np.int64,
+    "chr37": np.int16,
+    "pos37": np.int32,
+    "chr38": np.int16,
+    "pos38": np.int32,
+}
+
+
+def is_canonical_number(text):
+    """Returns True if a string is a number without sign, spaces or leading zeros, e.g. "123"."""
+    return text.isascii() and text.isdigit() and (text[0] != "0" or text == "0")
+
+
+def encode_rsids(values):
+    """
+    Converts rsIDs to integers, e.g. "rs116944008" to 116944008. Only rsIDs that are written the
+    same way again are converted, so "rs012" is not, see build_binary_store().
+
+    Parameters:
+    values (array-like): rsIDs as strings.
+
+    Returns:
+    np.ndarray: rsID numbers as int64, with -1 for missing or invalid rsIDs.
+    """
+    try:
+        # Fast path for well-formed rsIDs, falls back to the regex below on anything else.
+        return np.fromiter(
+            (
+                int(value[2:])
+                if value[:2] == "rs" and len(value) <= 20 and is_canonical_number(value[2:])
+                else -1
+                for value in values
+            ),
+            dtype=np.int64,
+            count=len(values),
+        )
+    except TypeError:
+        numbers = pd.Series(values, dtype=object).str.extract(r"^rs(0|[1-9]\d{0,17})$")[0]
+        return numbers.fillna("-1").astype(np.int64).to_numpy()
+
+
+def encode_chrpos(values, chr_codes=CHR_CODES):
+    """
+    Splits "chr_pos" strings like "7_127741848" into chromosome codes and positions. Only values
+    that are written the same way again are converted, so "7_0123" is not.
+
+    Parameters:
+    values (array-like): "chr_pos" strings.
+    chr_codes (dict): Code of each chromosome label, e.g. the chr_codes of a BinaryStore.
+
+    Returns:
+    chr_codes (np.ndarray): Chromosome codes as int16, 0 for missing or invalid values.
+    positions (np.ndarray): Positions as int64, -1 for missing or invalid values.
+    """
+    try:
+        # Fast path for well-formed values, falls back to the regex below on anything else.
+        parts = [value.split("_", 1) for value in values]
+        codes = np.fromiter(
+            (chr_codes[chrom] for chrom, _ in parts), dtype=np.int16, count=len(parts)
+        )
+        positions = np.fromiter((int(pos) for _, pos in parts), dtype=np.int64, count=len(parts))
+        if all(is_canonical_number(pos) for _, pos in parts) and (positions < 2**32).all():
+            return codes, positions
+    except (AttributeError, KeyError, TypeError, ValueError):
+        pass
+    parts = pd.Series(values, dtype=object).str.extract(r"^([^_]*)_(0|[1-9]\d{0,9})$")
+    codes = parts[0].map(chr_codes)
+    positions = parts[1].fillna("-1").astype(np.int64)
+    is_valid = (codes.notna() & (positions >= 0) & (positions < 2**32)).to_numpy()
+    codes = codes.fillna(0).to_numpy(dtype=np.int16)
+    return np.where(is_valid, codes, 0), np.where(is_valid, positions.to_numpy(), -1)
+
+
+def encode_store_chrpos(values, chr_codes):
+    """
+    Splits the "chr_pos" values of the database for the store, like split_chrpos() splits
+    SQLite results, so that both backends return the same chromosomes and positions. Chromosome
+    labels missing from chr_codes, e.g. "MT", are added to it with the next free code.
+
+    Parameters:
+    values (array-like): "chr_pos" strings.
+    chr_codes (dict): Code of each chromosome label, extended in place.
+
+    Returns:
+    codes (np.ndarray): Chromosome codes as int16, 0 for missing values.
+    positions (np.ndarray): Positions as int64, -1 for missing, invalid or too large positions.
+    is_key (np.ndarray): True where code and position give the value back, see encode_chrpos().
+    """
+    parts = pd.Series(values, dtype=object).str.partition("_").reindex(columns=[0, 1, 2])
+    for chrom in parts[0].dropna().unique().tolist():
+        if chrom not in chr_codes:
+            chr_codes[chrom] = len(chr_codes) + 1
+    codes = parts[0].map(chr_codes).fillna(0).to_numpy(dtype=np.int16)
+    positions = pd.to_numeric(parts[2], errors="coerce")
+    positions = positions.where((positions % 1 == 0) & (positions >= 0) & (positions < 2**31))
+    positions = positions.fillna(-1).to_numpy(dtype=np.int64)
+    is_key = parts[1].eq("_") & parts[2].str.fullmatch(r"0|[1-9]\d{0,9}").fillna(False)
+    return codes, positions, is_key.to_numpy(dtype=bool) & (codes > 0) & (positions >= 0)
+
+
+def pack_chrpos(chr_codes, positions):
+    """
+    Packs chromosome codes and positions into one sortable int64 key.
+
+    Parameters:
+    chr_codes (np.ndarray): Chromosome codes as returned by encode_chrpos().
+    positions (np.ndarray): Positions as returned by encode_chrpos().
+
+    Returns:
+    np.ndarray: Packed keys as int64, -1 where chromosome or position is missing.
+    """
+    keys = (chr_codes.astype(np.int64) << 32) | positions.astype(np.int64)
+    return np.where((chr_codes > 0) & (positions >= 0), keys, -1)
+
+
+def build_binary_store(gtex_con, store_path, chunk_rows=1_000_000):
+    """
+    Builds the binary lookup store from the GTEx database. Each column is written as a
+    memory-mappable .npy array, alleles are written as one byte string per column with offsets,
+    and for each lookup column a sorted int64 key array and the matching row order are written.
+    Ids that the integer keys cannot give back exactly, e.g. "rs012" or "esv1", are written
+    as text with their rows instead, so lookups and results stay the same as with SQLite.
+
+    Parameters:
+    gtex_con: GTEx database file connection.
+    store_path (str): Directory to write the store to.
+    chunk_rows (int): Number of database rows converted at a time.
+
+    Returns:
+    bool: True if the store was built successfully, or False.
+    """
+    try:
+        os.makedirs(store_path, exist_ok=True)
+        meta_path = os.path.join(store_path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        n_rows = gtex_con.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+        logger.info(f"Building binary store for {n_rows} variants in '{store_path}'...")
+
+        arrays = {
+            name: np.lib.format.open_memmap(
+                os.path.join(store_path, f"{name}.npy"), mode="w+", dtype=dtype, shape=(n_rows,)
+            )
+            for name, dtype in ROW_ARRAYS.items()
+        }
+        allele_offsets = {
+            allele: np.lib.format.open_memmap(
+                os.path.join(store_path, f"{allele}_offsets.npy"),
+                mode="w+",
+                dtype=np.uint64,
+                shape=(n_rows + 1,),
+            )
+            for allele in ("ref", "alt")
+        }
+        # Rows are stored ordered by all GTEx columns, i.e. in the order of the rsid covering index.
+        # The stable key sorts below then keep the records of a key in the order of its covering
+        # index, so lookups return them in the same order as SQLite.
+        column_list = ", ".join(GTEX_COLUMNS)
+        cur = gtex_con.execute(f"SELECT {column_list} FROM {TABLE_NAME} ORDER BY {column_list}")
+        start = 0
+        allele_sizes = {"ref": 0, "alt": 0}
+        chr_codes = dict(CHR_CODES)
+        extra_ids = {name: ([], []) for name in KEY_ARRAYS.values()}
+        with ExitStack() as stack:
+            allele_files = {
+                allele: stack.enter_context(open(os.path.join(store_path, f"{allele}.bin"), "wb"))
+                for allele in ("ref", "alt")
+            }
+            while rows := cur.fetchmany(chunk_rows):
+                chunk = pd.DataFrame(rows, columns=GTEX_COLUMNS)
+                end = start + len(chunk)
+
+                rsids = encode_rsids(chunk["rsid_dbSNP155"])
+                arrays["rsid"][start:end] = rsids
+                is_key = {"rsid": rsids >= 0}
+                for build in ("37", "38"):
+                    codes, positions, is_key[f"key{build}"] = encode_store_chrpos(
+                        chunk[f"chrpos{build}"], chr_codes
+                    )
+                    arrays[f"chr{build}"][start:end] = codes
+                    arrays[f"pos{build}"][start:end] = positions
+
+                for lookup_column, name in KEY_ARRAYS.items():
+                    is_extra = chunk[lookup_column].notna().to_numpy() & ~is_key[name]
+                    extra_ids[name][0].extend((start + np.flatnonzero(is_extra)).tolist())
+                    extra_ids[name][1].extend(chunk[lookup_column][is_extra].tolist())
+
+                for allele in ("ref", "alt"):
+                    encoded = chunk[allele].fillna("").astype(str).str.encode("utf-8")
+                    lengths = encoded.str.len().to_numpy(dtype=np.uint64)
+                    allele_offsets[allele][start + 1 : end + 1] = allele_sizes[allele] + np.cumsum(
+                        lengths
+                    )
+                    allele_files[allele].write(b"".join(encoded))
+                    allele_sizes[allele] += int(lengths.sum())
+
+                start = end
+                logger.info(f"Converted {end}/{n_rows} variants...")
+
+        key_arrays = {
+            "rsid": arrays["rsid"],
+            "key37": pack_chrpos(arrays["chr37"], arrays["pos37"]),
+            "key38": pack_chrpos(arrays["chr38"], arrays["pos38"]),
+        }
+        for name, keys in key_arrays.items():
+            extra_rows = np.array(extra_ids[name][0], dtype=np.int64)
+            keys[extra_rows] = -1
+            np.save(os.path.join(store_path, f"{name}_extra_rows.npy"), extra_rows)
+            np.save(
+                os.path.join(store_path, f"{name}_extra_ids.npy"),
+                np.array(extra_ids[name][1], dtype=str),
+            )
+            order = np.argsort(keys, kind="stable")
+            np.save(os.path.join(store_path, f"{name}_sorted.npy"), keys[order])
+            np.save(os.path.join(store_path, f"{name}_order.npy"), order.astype(np.uint32))
+            logger.info(f"Sorted lookup keys for '{name}'.")
+
+        for array in [*arrays.values(), *allele_offsets.values()]:
+            array.flush()
+
+        # meta.json is written last, so an interrupted build is never mistaken for a complete one.
+        with open(meta_path, "w") as f:
+            json.dump(
+                {"version": STORE_VERSION, "n_rows": n_rows, "chromosomes": list(chr_codes)}, f
+            )
+        logger.info(f"Binary store built successfully in '{store_path}'.")
+        return True
+    except Exception as e:
+        logger.error(f"An error has occured while building the binary store: {e}")
+        return False
+
+
+class BinaryStore:
+    """
+    Read-only, memory-mapped GTEx lookup store built by build_binary_store(). Lookups are
+    batched binary searches over sorted integer keys, and results come back with chromosome
+    and position already split.
+    """
+
+    def __init__(self, store_path):
+        with open(os.path.join(store_path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != STORE_VERSION:
+            raise ValueError(
+                f"Binary store version {self.meta['version']} is not supported, please rebuild it."
+            )
+
+        def load(name):
+            return np.load(os.path.join(store_path, f"{name}.npy"), mmap_mode="r")
+
+        self.chr_names = np.array([None, *self.meta["chromosomes"]], dtype=object)
+        self.chr_codes = {chrom: code for code, chrom in enumerate(self.meta["chromosomes"], 1)}
+        self.arrays = {name: load(name) for name in ROW_ARRAYS}
+        self.sorted_keys = {name: load(f"{name}_sorted") for name in KEY_ARRAYS.values()}
+        self.key_orders = {name: load(f"{name}_order") for name in KEY_ARRAYS.values()}
+        # Rows of the ids that have no integer key, by id, see build_binary_store().
+        self.extra_ids = {}
+        for name in KEY_ARRAYS.values():
+            self.extra_ids[name] = {}
+            extra_rows = load(f"{name}_extra_rows").tolist()
+            for row, id_ in zip(extra_rows, load(f"{name}_extra_ids").tolist(), strict=True):
+                self.extra_ids[name].setdefault(id_, []).append(row)
+        self.extra_rsids = {
+            row: id_ for id_, rows in self.extra_ids["rsid"].items() for row in rows
+        }
+        self.allele_offsets = {allele: load(f"{allele}_offsets") for allele in ("ref", "alt")}
+        self.allele_data = {}
+        for allele in ("ref", "alt"):
+            with open(os.path.join(store_path, f"{allele}.bin"), "rb") as f:
+                self.allele_data[allele] = (
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    if os.fstat(f.fileno()).st_size
+                    else b""
+                )
+
+    def encode_keys(self, ids, lookup_column):
+        """Converts ids in the string format of a GTEx lookup column to integer keys."""
+        if lookup_column == "rsid_dbSNP155":
+            return encode_rsids(ids)
+        return pack_chrpos(*encode_chrpos(ids, self.chr_codes))
+
+    def decode_alleles(self, allele, rows):
+        """Returns the allele strings of the given rows."""
+        offsets = self.allele_offsets[allele]
+        data = self.allele_data[allele]
+        starts = offsets[rows].astype(np.int64)
+        lengths = offsets[rows + 1].astype(np.int64) - starts
+
+        # Most alleles are single bases, which are decoded with one vectorized lookup.
+        alleles = np.full(len(rows), "", dtype=object)
+        single = lengths == 1
+        if single.any():
+            alleles[single] = BYTE_CHARS[np.frombuffer(data, dtype=np.uint8)[starts[single]]]
+        for i in np.flatnonzero(lengths > 1).tolist():
+            alleles[i] = data[starts[i] : starts[i] + lengths[i]].decode("utf-8")
+        return alleles
+
+    def query_to_df(self, ids_to_search, lookup_column, columns=None):
+        """
+        Looks up ids in the store and returns a dataframe like query_to_df(), but with
+        chromosome and position columns (chr37, pos37, chr38, pos38) already split.
+
+        Parameters:
+        ids_to_search (list): Values to look up.
+        lookup_column (str): Name of column from GTEx table to use for the lookup.
+        columns (list): Names of GTEx columns to return. Alleles are only decoded if "ref" and
+            "alt" are included. All columns are returned if not provided.
+
+        Returns:
+        pd.DataFrame: Lookup results.
+        """
+        unique_ids = pd.unique(pd.Series(ids_to_search, dtype=object).dropna())
+        keys = self.encode_keys(unique_ids, lookup_column)
+
+        # Searching in key order keeps the binary searches cache friendly.
+        query_order = np.argsort(keys, kind="stable")
+        query_idx, rows = self.find_keys(keys[query_order], lookup_column)
+
+        ids = unique_ids[query_order[query_idx]]
+
+        extra_ids = self.extra_ids[KEY_ARRAYS[lookup_column]]
+        if extra_ids:
+            found = [(id_, row) for id_ in unique_ids.tolist() for row in extra_ids.get(id_, [])]
+            ids = np.concatenate([ids, np.array([id_ for id_, _ in found], dtype=object)])
+            rows = np.concatenate([rows, np.array([row for _, row in found], dtype=np.int64)])
+
+        results = {lookup_column: ids}
+        results.update(self.get_rows(rows, lookup_column, columns))
+        return pd.DataFrame(results)
+
+    def find_keys(self, keys, lookup_column):
+        """
+        Finds the rows matching sorted integer keys with batched binary searches.
+
+        Parameters:
+        keys (np.ndarray): Sorted keys as returned by encode_keys(), -1 for invalid ids.
+        lookup_column (str): Name of column from GTEx table to use for the lookup.
+
+        Returns:
+        query_idx (np.ndarray): Index into keys of each match, in key order.
+        rows (np.ndarray): Store row of each match.
+        """
+        key_name = KEY_ARRAYS[lookup_column]
+        sorted_keys = self.sorted_keys[key_name]
+        left = np.searchsorted(sorted_keys, keys, side="left")
+        right = np.searchsorted(sorted_keys, keys, side="right")
+        counts = np.where(keys >= 0, right - left, 0)
+
+        # Expand each [left, right) range into the positions of the matching keys.
+        query_idx = np.repeat(np.arange(len(keys)), counts)
+        range_starts = np.repeat(left - (np.cumsum(counts) - counts), counts)
+        rows = self.key_orders[key_name][range_starts + np.arange(len(query_idx))].astype(np.int64)
+        return query_idx, rows
+
+    def get_rows(self, rows, lookup_column, columns=None):
+        """
+        Reads the GTEx columns of store rows, except the lookup column.
+
+        Parameters:
+        rows (np.ndarray): Store rows, e.g. from find_keys().
+        lookup_column (str): Name of column from GTEx table used for the lookup.
+        columns (list): Names of GTEx columns to return, see query_to_df().
+
+        Returns:
+        results (dict): Column name to values, with chromosome and position columns split.
+        """
+        results = {}
+        if lookup_column != "rsid_dbSNP155":
+            rsids = self.arrays["rsid"][rows]
+            results["rsid_dbSNP155"] = [
+                f"rs{rsid}" if rsid >= 0 else self.extra_rsids.get(row)
+                for rsid, row in zip(rsids.tolist(), rows.tolist(), strict=True)
+            ]
+        for build in ("37", "38"):
+            positions = self.arrays[f"pos{build}"][rows]
+            results[f"chr{build}"] = self.chr_names[self.arrays[f"chr{build}"][rows]]
+            results[f"pos{build}"] = pd.arrays.IntegerArray(
+                positions.astype(np.int64), mask=positions < 0
+            )
+        for allele in ("ref", "alt"):
+            if columns is None or allele in columns:
+                results[allele] = self.decode_alleles(allele, rows)
+        return results
+
+
+def load_binary_store(store_path):
+    """
+    Opens the binary lookup store.
+
+    Parameters:
+    store_path (str): Directory of the store.
+
+    Returns:
+    gtex_store (BinaryStore): Opened store, or None.
+    """
+    if not os.path.exists(os.path.join(store_path, "meta.json")):
+        logger.error(
+            f"Binary store '{store_path}' is missing or incomplete. "
+            "Please run 'RSIDBuildTranslator db build-store' once to build it."
+        )
+        return None
+    try:
+        gtex_store = BinaryStore(store_path)
+        logger.info("GTEx binary store read successfully.")
+        return gtex_store
+    except Exception as e:
+        logger.error(f"An error has occured while reading the binary store: {e}")
+        return None
@@ -1,18 +1,25 @@
 import argparse
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("RSIDBuildTranslator.log"),
-        logging.StreamHandler(),
-    ],
-)
-
 logger = logging.getLogger(__name__)
 
 
+def configure_logging():
+    """
+    Logs to the console and to "RSIDBuildTranslator.log" in the working directory. Called by
+    the command line once the arguments are parsed, so that importing the package, "-h" and
+    invalid arguments do not create the log file.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler("RSIDBuildTranslator.log"),
+            logging.StreamHandler(),
+        ],
+    )
+
+
 def create_parser():
     """Create an argument parser object"""
     parser = argparse.ArgumentParser(
@@ -20,19 +27,120 @@ def create_parser():
         description="Add chromosome and position for GRCh37 and GRCh38 based on rsIDs, or add rsIDs based on chromosome and position from either build.",
     )
 
-    parent_parser = argparse.ArgumentParser(add_help=False)
-    parent_parser.add_argument(
-        "-i", "--input", help="Name of input file with path", required=True, type=str
-    )
-    parent_parser.add_argument(
-        "-o", "--output", help="Name of output file with path", required=True, type=str
+    # Database location, shared by all modes.
+    db_parser = argparse.ArgumentParser(add_help=False)
+    db_parser.add_argument(
+        "--db",
+        help="Path to the GTEx database. Default is GTEx_v10.db in $RSIDBuildTranslator_DATA if set, or else in the package's data folder",
+        type=str,
     )
-    parent_parser.add_argument(
+
+    # Options shared by the annotation modes and "batch".
+    options_parser = argparse.ArgumentParser(add_help=False, parents=[db_parser])
+    options_parser.add_argument(
         "--exclude-ref-alt",
         dest="exclude_ref_alt",
         help="Flag to exclude printing reference and alternate alleles in output",
         action="store_true",
     )
+    options_parser.add_argument(
+        "--ref-col",
+        dest="ref_col",
+        help="Name of column with one allele of a row, e.g. the reference or other allele. With --alt-col, rows are only annotated with the database records matching their alleles, also swapped or on the opposite strand. Which allele is in which column only changes whether a match is reported as exact or swap",
+        type=str,
+    )
+    options_parser.add_argument(
+        "--alt-col",
+        dest="alt_col",
+        help="Name of column with the other allele of a row, e.g. the alternate or effect allele, see --ref-col",
+        type=str,
+    )
+    options_parser.add_argument(
+        "--sep",
+        help="Delimiter of the input file, e.g. ',' or '\\t'. Detected automatically if not provided",
+        type=str,
+    )
+    options_parser.add_argument(
+        "--dtype",
+        help="Type of an input column as COLUMN=TYPE, e.g. 'P=float'. Columns without a type are read "
+        "as text. Can be given multiple times",
+        action="append",
+    )
+    options_parser.add_argument(
+        "--passthrough",
+        help="Flag to keep missing value markers like 'NA' in the input as they are in the output",
+        action="store_true",
+    )
+    options_parser.add_argument(
+        "--chunksize",
+        help="Number of rows to read, annotate and write at a time. By default the whole input file is read at once",
+        type=int,
+    )
+    options_parser.add_argument(
+        "--backend",
+        help="Lookup backend to use. 'binary' uses the memory-mapped store built with 'RSIDBuildTranslator db build-store'",
+        choices=["sqlite", "binary"],
+        default="sqlite",
+    )
+    options_parser.add_argument(
+        "--mmap",
+        help="Flag to open the SQLite database read-only, immutable and memory-mapped, so that concurrent jobs on one node share the OS page cache. Warm it first with 'RSIDBuildTranslator db warm'",
+        action="store_true",
+    )
+    options_parser.add_argument(
+        "--lookup-cache",
+        dest="lookup_cache",
+        help="Flag to keep the results of database lookups in a cache file in the data directory, so that ids looked up by earlier runs are answered without querying the database",
+        action="store_true",
+    )
+    options_parser.add_argument(
+        "--lookup-cache-size",
+        dest="lookup_cache_size",
+        help="Maximum number of ids kept in the --lookup-cache file, the least recently used are removed first. Default is 5000000",
+        type=int,
+        default=5_000_000,
+    )
+    options_parser.add_argument(
+        "--lookup-strategy",
+        dest="lookup_strategy",
+        help="How ids are looked up in the SQLite database. 'temp-table' inserts all unique ids into a temporary table and resolves them with one join, 'in-list' runs one query per batch of ids",
+        choices=["temp-table", "in-list"],
+        default="temp-table",
+    )
+    options_parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        help="Number of ids per query for '--lookup-strategy in-list'",
+        type=int,
+        default=500,
+    )
+    options_parser.add_argument(
+        "--threads",
+        "--workers",
+        dest="threads",
+        help="Number of worker processes used for lookups, each with its own read-only database connection. With 'batch', also the number of files processed at a time. Default is 1",
+        type=int,
+        default=1,
+    )
+    options_parser.add_argument(
+        "--profile",
+        help="Flag to print the time, rows per second, cache hit rate and peak memory of each stage after the run",
+        action="store_true",
+    )
+    options_parser.add_argument(
+        "--profile-json",
+        dest="profile_json",
+        help="File to write the --profile statistics to as JSON. Implies --profile",
+        type=str,
+    )
+
+    parent_parser = argparse.ArgumentParser(add_help=False, parents=[options_parser])
+    parent_parser.add_argument(
+        "-i", "--input", help="Name of input file with path", required=True, type=str
+    )
+    parent_parser.add_argument(
+        "-o", "--output", help="Name of output file with path", required=True, type=str
+    )
 
     subparsers = parser.add_subparsers(dest="mode", help="subcommand help")
 
@@ -66,6 +174,23 @@ def create_parser():
         required=True,
         type=str,
     )
+    parser_chrpos37.add_argument(
+        "--sorted",
+        dest="sorted_input",
+        help="Flag for input sorted by chromosome and position. Annotates with a merge join that reads the database in genomic order",
+        action="store_true",
+    )
+    parser_chrpos37.add_argument(
+        "--partitioned",
+        help="Flag to annotate chromosome by chromosome in --threads worker processes, each opening only the partitions of its chromosomes built with 'RSIDBuildTranslator db build-partitions'",
+        action="store_true",
+    )
+    parser_chrpos37.add_argument(
+        "--split-output",
+        dest="split_output",
+        help="Flag to write one output file per chromosome with --partitioned, named like the output file with '.chr<chromosome>' before the extension",
+        action="store_true",
+    )
 
     parser_chrpos38 = subparsers.add_parser(
         "chrpos38",
@@ -84,4 +209,168 @@ def create_parser():
         required=True,
         type=str,
     )
+    parser_chrpos38.add_argument(
+        "--sorted",
+        dest="sorted_input",
+        help="Flag for input sorted by chromosome and position. Annotates with a merge join that reads the database in genomic order",
+        action="store_true",
+    )
+    parser_chrpos38.add_argument(
+        "--partitioned",
+        help="Flag to annotate chromosome by chromosome in --threads worker processes, each opening only the partitions of its chromosomes built with 'RSIDBuildTranslator db build-partitions'",
+        action="store_true",
+    )
+    parser_chrpos38.add_argument(
+        "--split-output",
+        dest="split_output",
+        help="Flag to write one output file per chromosome with --partitioned, named like the output file with '.chr<chromosome>' before the extension",
+        action="store_true",
+    )
+
+    parser_auto = subparsers.add_parser(
+        "auto",
+        parents=[parent_parser],
+        help="Add rsIDs and chromosome and position for GRCh37 and GRCh38 based on any combination of rsIDs and chromosome and position in either build, in one pass",
+    )
+    parser_auto.add_argument(
+        "-rs",
+        "--rsid_col",
+        help="Name of column with rsids. Tried first",
+        type=str,
+    )
+    parser_auto.add_argument(
+        "-chr38",
+        help="Name of column with chromosome in build GRCh38. Tried for rows not resolved by rsID",
+        type=str,
+    )
+    parser_auto.add_argument(
+        "-pos38",
+        help="Name of column with position in build GRCh38",
+        type=str,
+    )
+    parser_auto.add_argument(
+        "-chr37",
+        help="Name of column with chromosome in build GRCh37. Tried for rows not resolved by rsID or GRCh38 position",
+        type=str,
+    )
+    parser_auto.add_argument(
+        "-pos37",
+        help="Name of column with position in build GRCh37",
+        type=str,
+    )
+
+    parser_batch = subparsers.add_parser(
+        "batch",
+        parents=[options_parser],
+        help="Annotate many input files at once, looking up the ids shared by several files only once",
+    )
+    parser_batch.add_argument(
+        "-m",
+        "--mode",
+        dest="batch_mode",
+        help="Annotation mode used for all files",
+        choices=["rsid", "chrpos37", "chrpos38"],
+        required=True,
+    )
+    parser_batch.add_argument(
+        "-c",
+        "--columns",
+        help="Name of column with rsids for mode 'rsid', or names of columns with chromosome and position for the chrpos modes",
+        nargs="+",
+        required=True,
+    )
+    batch_inputs = parser_batch.add_mutually_exclusive_group(required=True)
+    batch_inputs.add_argument(
+        "--inputs",
+        help="Glob pattern(s) of input files, e.g. 'sumstats/*.tsv.gz'. Requires --output-dir",
+        nargs="+",
+    )
+    batch_inputs.add_argument(
+        "--manifest",
+        help="Tab or comma delimited file with an 'input' and an 'output' column, one row per file",
+        type=str,
+    )
+    parser_batch.add_argument(
+        "--output-dir",
+        dest="output_dir",
+        help="Directory for output files of --inputs, named like the input files",
+        type=str,
+    )
+
+    parser_serve = subparsers.add_parser(
+        "serve",
+        parents=[db_parser],
+        help="Run a local lookup server that keeps the GTEx database open and caches recent lookups",
+    )
+    parser_serve.add_argument(
+        "--host",
+        help="Address to listen on. Default is 127.0.0.1",
+        type=str,
+        default="127.0.0.1",
+    )
+    parser_serve.add_argument(
+        "--port",
+        help="Port to listen on. Default is 8765",
+        type=int,
+        default=8765,
+    )
+    parser_serve.add_argument(
+        "--cache-size",
+        dest="cache_size",
+        help="Maximum number of ids kept in the lookup cache. Default is 1000000",
+        type=int,
+        default=1_000_000,
+    )
+
+    parser_db = subparsers.add_parser(
+        "db",
+        help="Manage the GTEx database",
+    )
+    db_subparsers = parser_db.add_subparsers(dest="db_command", help="database command help")
+    parser_install = db_subparsers.add_parser(
+        "install",
+        parents=[db_parser],
+        help="Download or copy the GTEx database, verify it and install it atomically. Interrupted downloads are resumed",
+    )
+    parser_install.add_argument(
+        "--from",
+        dest="source",
+        help="URL of a mirror or path of a local copy of the database to install from, instead of Google Drive",
+        type=str,
+    )
+    parser_install.add_argument(
+        "--sha256",
+        help="Expected SHA-256 checksum of the downloaded file",
+        type=str,
+    )
+    parser_install.add_argument(
+        "--force",
+        help="Flag to install the database again even if a valid copy exists",
+        action="store_true",
+    )
+    db_subparsers.add_parser(
+        "verify",
+        parents=[db_parser],
+        help="Run a full integrity check of the installed GTEx database",
+    )
+    db_subparsers.add_parser(
+        "warm",
+        parents=[db_parser],
+        help="Read the GTEx database once, so that it is in the OS page cache shared by all jobs on this node",
+    )
+    db_subparsers.add_parser(
+        "prepare",
+        parents=[db_parser],
+        help="Create lookup indexes on the GTEx database and run ANALYZE. Only needs to be run once",
+    )
+    db_subparsers.add_parser(
+        "build-store",
+        parents=[db_parser],
+        help="Build the memory-mapped binary lookup store used by '--backend binary' from the GTEx database",
+    )
+    db_subparsers.add_parser(
+        "build-partitions",
+        parents=[db_parser],
+        help="Split the GTEx database into one database per chromosome, used by '--partitioned'",
+    )
     return parser
@@ -0,0 +1,119 @@
+from datetime import UTC, datetime
+
+from RSIDBuildTranslator.cli import logger
+
+TABLE_NAME = "GTEx_lookup"
+METADATA_TABLE = "RSIDBuildTranslator_metadata"
+LOOKUP_COLUMNS = ("rsid_dbSNP155", "chrpos37", "chrpos38")
+GTEX_COLUMNS = ("rsid_dbSNP155", "chrpos37", "chrpos38", "ref", "alt")
+
+
+def get_index_name(lookup_column):
+    """
+    Returns the name of the covering index for a lookup column.
+
+    Parameters:
+    lookup_column (str): Name of column from GTEx table used for query.
+
+    Returns:
+    index_name (str): Name of the index.
+    """
+    return f"idx_{TABLE_NAME}_{lookup_column}"
+
+
+def get_covered_columns(lookup_column):
+    """
+    Returns the columns of the covering index for a lookup column, in index order.
+
+    Parameters:
+    lookup_column (str): Name of column from GTEx table used for query.
+
+    Returns:
+    covered_columns (list): The lookup column followed by the remaining GTEx columns.
+    """
+    return [lookup_column] + [col for col in GTEX_COLUMNS if col != lookup_column]
+
+
+def prepare_gtex_db(gtex_con):
+    """
+    Creates covering indexes for all lookup columns of the GTEx table, runs ANALYZE and records
+    the index status in a metadata table. Indexes that already exist are left untouched, so this
+    only does work the first time it is run on a database.
+
+    Parameters:
+    gtex_con: GTEx database file connection.
+
+    Returns:
+    bool: True if the database was prepared successfully, or False.
+    """
+    try:
+        for lookup_column in LOOKUP_COLUMNS:
+            index_name = get_index_name(lookup_column)
+            covered_columns = get_covered_columns(lookup_column)
+            logger.info(f"Creating index '{index_name}' (this may take a while)...")
+            gtex_con.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} "
+                f"ON {TABLE_NAME} ({', '.join(covered_columns)})"
+            )
+
+        logger.info("Running ANALYZE on GTEx database...")
+        gtex_con.execute("ANALYZE")
+
+        gtex_con.execute(
+            f"CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        metadata = {
+            f"index_{lookup_column}": "ok"
+            if has_lookup_index(gtex_con, lookup_column)
+            else "missing"
+            for lookup_column in LOOKUP_COLUMNS
+        }
+        metadata["prepared_at"] = datetime.now(UTC).isoformat()
+        gtex_con.executemany(
+            f"INSERT OR REPLACE INTO {METADATA_TABLE} (key, value) VALUES (?, ?)",
+            metadata.items(),
+        )
+        gtex_con.commit()
+        logger.info("GTEx database prepared successfully.")
+        return True
+    except Exception as e:
+        logger.error(f"An error has occured while preparing the GTEx database: {e}")
+        return False
+
+
+def has_lookup_index(gtex_con, lookup_column):
+    """
+    Checks if the GTEx table has an index that starts with the lookup column.
+
+    Parameters:
+    gtex_con: GTEx database file connection.
+    lookup_column (str): Name of column from GTEx table used for query.
+
+    Returns:
+    bool: True if such an index exists, or False.
+    """
+    try:
+        for index in gtex_con.execute(f"PRAGMA index_list({TABLE_NAME})").fetchall():
+            index_columns = gtex_con.execute(f"PRAGMA index_info({index[1]})").fetchall()
+            if index_columns and index_columns[0][2] == lookup_column:
+                return True
+        return False
+    except Exception as e:
+        logger.error(f"An error has occured while checking indexes of the GTEx database: {e}")
+        return False
+
+
+def get_metadata(gtex_con):
+    """
+    Reads the metadata table written by prepare_gtex_db().
+
+    Parameters:
+    gtex_con: GTEx database file connection.
+
+    Returns:
+    metadata (dict): Metadata keys and values, empty if the database was never prepared.
+    """
+    try:
+        return dict(gtex_con.execute(f"SELECT key, value FROM {METADATA_TABLE}").fetchall())
+    except Exception:
+        return {}
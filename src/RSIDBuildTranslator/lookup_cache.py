@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import GTEX_COLUMNS
+from RSIDBuildTranslator.profiling import count_cache, profile_stage
+from RSIDBuildTranslator.utils import fetch_columns
+
+CACHE_FILENAME = "lookup_cache.db"
+DEFAULT_MAX_KEYS = 5_000_000
+# Share of max_keys kept after an eviction, so that evictions do not run on every write.
+EVICT_TO = 0.9
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS cache_keys (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_keys_last_used ON cache_keys (last_used);
+CREATE TABLE IF NOT EXISTS cache_records (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    {", ".join(f"{col} TEXT" for col in GTEX_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS idx_cache_records_key ON cache_records (namespace, key);
+"""
+
+
+class LookupResultCache:
+    """
+    A persistent cache of lookup results in a local SQLite file, shared by all runs that use it.
+    For every key it holds all GTEx records, or none for keys not in the database, stored per
+    database version and lookup column, so that a new database never answers from old results.
+    Keys that were not used for longest are evicted once there are more than max_keys.
+
+    Example:
+        cache = LookupResultCache(path)
+        results_df = cache.lookup(namespace, ids, columns, query)
+    """
+
+    def __init__(self, path, max_keys=DEFAULT_MAX_KEYS):
+        self.path = path
+        self.max_keys = max_keys
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Concurrent runs wait for each other's writes instead of failing.
+        self.con = sqlite3.connect(path, timeout=60)
+        self.con.execute("PRAGMA journal_mode = WAL")
+        self.con.execute("PRAGMA synchronous = NORMAL")
+        self.con.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the cache file."""
+        self.con.close()
+
+    def lookup(self, namespace, ids, columns, query):
+        """
+        Returns the records of ids, reading cached keys from the cache file and querying only
+        the others, which are then added to the cache.
+
+        Parameters:
+        namespace (str): Database version and lookup column, see get_cache_namespace().
+        ids (list): Unique ids to look up.
+        columns (list): All GTEx columns, starting with the lookup column.
+        query (function): Called with the list of ids missing from the cache, returns their
+            records as a dataframe with the given columns.
+
+        Returns:
+        results_df (pd.DataFrame): Records of all ids, cached ones first.
+        """
+        now = time.time_ns()
+        with profile_stage("lookup_cache", len(ids)):
+            cur = self.con.cursor()
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS cache_lookup (key TEXT PRIMARY KEY)")
+            cur.execute("DELETE FROM cache_lookup")
+            cur.executemany("INSERT OR IGNORE INTO cache_lookup VALUES (?)", ((i,) for i in ids))
+            missing = [
+                row[0]
+                for row in cur.execute(
+                    "SELECT key FROM cache_lookup l WHERE NOT EXISTS "
+                    "(SELECT 1 FROM cache_keys k WHERE k.namespace = ? AND k.key = l.key)",
+                    (namespace,),
+                )
+            ]
+            cur.execute(
+                "UPDATE cache_keys SET last_used = ? "
+                "WHERE namespace = ? AND key IN (SELECT key FROM cache_lookup)",
+                (now, namespace),
+            )
+            # Records of a key come back in the order they were added, through the index.
+            cur.execute(
+                f"SELECT {', '.join(f'r.{col} AS {col}' for col in columns)} FROM cache_lookup l "
+                "JOIN cache_records r ON r.namespace = ? AND r.key = l.key",
+                (namespace,),
+            )
+            cached_df = fetch_columns(cur)
+            self.con.commit()
+
+        hits = len(ids) - len(missing)
+        count_cache("lookup_cache", hits, len(missing))
+        logger.info(
+            f"Lookup cache: {hits} of {len(ids)} ids found "
+            f"({hits / len(ids) if ids else 0:.1%}), {len(missing)} looked up in the database."
+        )
+        if not missing:
+            return cached_df
+
+        results_df = query(missing)
+        with profile_stage("lookup_cache", len(missing)):
+            self.add(namespace, missing, results_df[columns], now)
+        if cached_df.empty:
+            return results_df[columns]
+        return pd.concat([cached_df, results_df[columns]], ignore_index=True)
+
+    def add(self, namespace, keys, results_df, now):
+        """
+        Adds keys and their records to the cache, then evicts keys beyond max_keys. Records the
+        keys already have are replaced in the same transaction, so runs that missed the same keys
+        at the same time do not store their records twice.
+        """
+        cur = self.con.cursor()
+        cur.executemany(
+            "INSERT OR REPLACE INTO cache_keys VALUES (?, ?, ?)",
+            ((namespace, key, now) for key in keys),
+        )
+        cur.executemany(
+            "DELETE FROM cache_records WHERE namespace = ? AND key = ?",
+            ((namespace, key) for key in keys),
+        )
+        cur.executemany(
+            f"INSERT INTO cache_records (namespace, key, {', '.join(results_df.columns)}) "
+            f"VALUES (?, ?, {', '.join(['?'] * len(results_df.columns))})",
+            ((namespace, row[0], *row) for row in results_df.itertuples(index=False, name=None)),
+        )
+        count = cur.execute("SELECT COUNT(*) FROM cache_keys").fetchone()[0]
+        if count > self.max_keys:
+            evicted = count - int(self.max_keys * EVICT_TO)
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS cache_evict (namespace TEXT, key TEXT)")
+            cur.execute("DELETE FROM cache_evict")
+            cur.execute(
+                "INSERT INTO cache_evict "
+                "SELECT namespace, key FROM cache_keys ORDER BY last_used LIMIT ?",
+                (evicted,),
+            )
+            for table in ("cache_records", "cache_keys"):
+                cur.execute(
+                    f"DELETE FROM {table} "
+                    "WHERE (namespace, key) IN (SELECT namespace, key FROM cache_evict)"
+                )
+            logger.info(f"Evicted {evicted} least recently used keys from the lookup cache.")
+        self.con.commit()
+
+
+def get_cache_namespace(db_version, lookup_column):
+    """Returns the part of the cache holding the results of a database version and column."""
+    return f"{db_version}/{lookup_column}"
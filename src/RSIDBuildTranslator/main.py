@@ -1,5 +1,9 @@
-from RSIDBuildTranslator.cli import create_parser, logger
-from RSIDBuildTranslator.modes import mode_chrpos37, mode_chrpos38, mode_rsid
+import importlib
+
+from RSIDBuildTranslator.cli import configure_logging, create_parser, logger
+from RSIDBuildTranslator.profiling import disable_profiling, enable_profiling
+
+MODES = ["rsid", "chrpos37", "chrpos38", "auto", "batch", "db", "serve"]
 
 
 def main():
@@ -7,19 +11,29 @@ def main():
 
     args = parser.parse_args()
 
+    if args.mode not in MODES:
+        parser.print_help()
+        return
+
+    configure_logging()
     logger.info(f"Running tool in mode: '{args.mode}'")
 
-    mode_map = {
-        "rsid": mode_rsid.run,
-        "chrpos37": mode_chrpos37.run,
-        "chrpos38": mode_chrpos38.run,
-    }
+    # Mode modules import pandas, so only the one that runs is loaded.
+    selected_mode = importlib.import_module(f"RSIDBuildTranslator.modes.mode_{args.mode}").run
 
-    selected_mode = mode_map.get(args.mode)
-    if selected_mode:
-        selected_mode(args)
-    else:
-        parser.print_help()
+    profile_json = getattr(args, "profile_json", None)
+    profiler = None
+    if getattr(args, "profile", False) or profile_json:
+        profiler = enable_profiling()
+
+    selected_mode(args)
+
+    if profiler is not None:
+        disable_profiling()
+        print(f"\nProfile:\n\n{profiler.format_table()}")
+        if profile_json:
+            profiler.write_json(profile_json)
+            logger.info(f"Profile written to '{profile_json}'.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+
+from RSIDBuildTranslator.binary_store import (
+    CHR_CODES,
+    CHR_NAMES,
+    BinaryStore,
+    encode_chrpos,
+    pack_chrpos,
+)
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import TABLE_NAME, get_covered_columns
+from RSIDBuildTranslator.utils import (
+    attach_annotations,
+    get_annotation_columns,
+    get_left_join_rows,
+    get_output_columns,
+    parse_chrpos_parts,
+    query_to_df_temp_table,
+    split_and_drop_columns,
+    validate_columns,
+)
+
+# Sorted positions further apart than this start a new block, so that sparse inputs do not
+# scan long stretches of the database between their positions.
+MAX_GAP = 1_000
+# Smaller blocks are resolved together by one indexed join, which costs less than a query each.
+MIN_RANGE_KEYS = 16
+POWERS_OF_TEN = 10 ** np.arange(1, 11, dtype=np.int64)
+
+
+def get_input_keys(input_data, chr_col, pos_col):
+    """
+    Parses chromosome and position columns into packed integer (chromosome, position) keys,
+    which sort in genomic order.
+
+    Parameters:
+    input_data (pd.DataFrame): Input data.
+    chr_col (str): Name of the chr column as provided by user.
+    pos_col (str): Name of the pos column as provided by user.
+
+    Returns:
+    keys (np.ndarray): Keys as int64, -1 for invalid rows.
+    """
+    chromosomes, positions, reasons = parse_chrpos_parts(input_data, chr_col, pos_col)
+    chr_codes = chromosomes.map(CHR_CODES).fillna(0).to_numpy(dtype=np.int16)
+    positions = pd.to_numeric(positions.where(reasons.isna())).fillna(-1).to_numpy(np.int64)
+    # Larger positions would spill into the chromosome bits, and are not in the database.
+    positions = np.where(positions < 2**32, positions, -1)
+    return pack_chrpos(chr_codes, positions)
+
+
+def get_blocks(keys):
+    """
+    Splits sorted, unique keys into blocks of nearby positions on one chromosome. Positions in a
+    block also have the same number of digits, so that their "chr_pos" ids sort like numbers.
+
+    Parameters:
+    keys (np.ndarray): Sorted, unique, valid keys.
+
+    Returns:
+    starts (np.ndarray): Index of the first key of each block.
+    stops (np.ndarray): Index after the last key of each block.
+    """
+    chr_codes = keys >> 32
+    positions = keys & 0xFFFFFFFF
+    digits = np.searchsorted(POWERS_OF_TEN, positions, side="right")
+    breaks = np.flatnonzero(
+        (np.diff(chr_codes) != 0) | (np.diff(digits) != 0) | (np.diff(positions) > MAX_GAP)
+    )
+    return np.r_[0, breaks + 1], np.r_[breaks + 1, len(keys)]
+
+
+def get_range_query(lookup_column, columns):
+    """
+    Generates the SQL query returning all rows between two "chr_pos" ids of the same length, in
+    the order of the covering index.
+
+    Parameters:
+    lookup_column (str): "chrpos37" or "chrpos38".
+    columns (list): Names of GTEx columns to select.
+
+    Returns:
+    query (str): Query with parameters for the first id, the last id and the id length.
+    """
+    if lookup_column not in {"chrpos37", "chrpos38"}:
+        raise ValueError(f"Invalid column name: {lookup_column}")
+    # Longer ids can sort between two ids, e.g. "1_10000" between "1_1000" and "1_2000".
+    return f"""
+    SELECT {validate_columns(columns)} FROM {TABLE_NAME}
+    WHERE {lookup_column} BETWEEN ? AND ? AND length({lookup_column}) = ?
+    ORDER BY {", ".join(get_covered_columns(lookup_column))}
+    """
+
+
+def query_sorted_sqlite(keys, lookup_column, cur, columns):
+    """
+    Looks up sorted keys with one range scan of the covering index per block of nearby
+    positions, reading the database sequentially in genomic order. Blocks of only a few keys are
+    looked up together with query_to_df_temp_table() instead.
+
+    Parameters:
+    keys (np.ndarray): Sorted, unique, valid keys.
+    lookup_column (str): "chrpos37" or "chrpos38".
+    cur: SQLite database cursor.
+    columns (list): Names of GTEx columns to select, starting with the lookup column.
+
+    Returns:
+    result_keys (np.ndarray): Key of each result row, sorted.
+    results_df (pd.DataFrame): Query results.
+    """
+    query = get_range_query(lookup_column, columns)
+    # Rows of all range scans are collected column-wise and turned into one DataFrame.
+    data = [[] for _ in columns]
+    starts, stops = get_blocks(keys)
+    is_range = stops - starts >= MIN_RANGE_KEYS
+    for start, stop in zip(starts[is_range].tolist(), stops[is_range].tolist(), strict=True):
+        chrom = CHR_NAMES[keys[start] >> 32]
+        first_id = f"{chrom}_{keys[start] & 0xFFFFFFFF}"
+        last_id = f"{chrom}_{keys[stop - 1] & 0xFFFFFFFF}"
+        rows = cur.execute(query, (first_id, last_id, len(first_id))).fetchall()
+        if rows:
+            for values, column_values in zip(data, zip(*rows, strict=True), strict=True):
+                values.extend(column_values)
+    results_df = pd.DataFrame(dict(zip(columns, data, strict=True)), columns=columns, dtype=object)
+
+    probe_keys = keys[~np.repeat(is_range, stops - starts)]
+    if len(probe_keys):
+        probe_ids = [
+            f"{CHR_NAMES[code]}_{position}"
+            for code, position in zip(
+                (probe_keys >> 32).tolist(), (probe_keys & 0xFFFFFFFF).tolist(), strict=True
+            )
+        ]
+        probe_df = query_to_df_temp_table(TABLE_NAME, probe_ids, lookup_column, cur, columns)
+        results_df = pd.concat([results_df, probe_df], ignore_index=True)
+
+    result_keys = pack_chrpos(*encode_chrpos(results_df[lookup_column].tolist()))
+    # Probed rows come in id string order, which differs from genomic order.
+    order = np.argsort(result_keys, kind="stable")
+    return result_keys[order], results_df.iloc[order].reset_index(drop=True)
+
+
+def query_sorted_store(keys, lookup_column, gtex_store, columns):
+    """
+    Looks up sorted keys in the binary store, whose key arrays are already in genomic order.
+
+    Parameters:
+    keys (np.ndarray): Sorted, unique, valid keys.
+    lookup_column (str): "chrpos37" or "chrpos38".
+    gtex_store (BinaryStore): Opened binary store.
+    columns (list): Names of GTEx columns to return.
+
+    Returns:
+    result_keys (np.ndarray): Key of each result row, sorted.
+    results_df (pd.DataFrame): Lookup results, without the lookup column.
+    """
+    query_idx, rows = gtex_store.find_keys(keys, lookup_column)
+    return keys[query_idx], pd.DataFrame(gtex_store.get_rows(rows, lookup_column, columns))
+
+
+def merge_join_chrpos(
+    input_data, chr_col, pos_col, lookup_column, gtex_cur, exclude_ref_alt, alleles=None
+):
+    """
+    Annotates input data sorted by chromosome and position with a merge join on integer
+    (chromosome, position) keys, instead of looking up "chr_pos" strings and merging on them.
+    Unsorted input gives the same result, but reads the database in a less sequential order.
+
+    Parameters:
+    input_data (pd.DataFrame): Input data.
+    chr_col (str): Name of the chr column as provided by user.
+    pos_col (str): Name of the pos column as provided by user.
+    lookup_column (str): "chrpos37" or "chrpos38".
+    gtex_cur: SQLite database cursor or a BinaryStore.
+    exclude_ref_alt (bool): "True" excludes ref and alt alleles from gtex database
+    alleles (list): Names of the input ref and alt allele columns to match, see match_alleles().
+
+    Returns:
+    final_df (pd.DataFrame): Input data with the GTEx columns, like cleanup_query_df().
+    """
+    keys = get_input_keys(input_data, chr_col, pos_col)
+    valid_keys = keys[keys >= 0]
+    if (np.diff(valid_keys) < 0).any():
+        logger.warning(
+            f"Input is not sorted by chromosome column '{chr_col}' and position column "
+            f"'{pos_col}'. Results are the same, but sorted input is faster."
+        )
+    unique_keys = np.unique(valid_keys)
+
+    other_build = "38" if lookup_column == "chrpos37" else "37"
+    # Allele matching needs the alleles of the records, even if they are not written.
+    columns = get_output_columns(lookup_column, exclude_ref_alt and not alleles)
+    if isinstance(gtex_cur, BinaryStore):
+        result_keys, results_df = query_sorted_store(unique_keys, lookup_column, gtex_cur, columns)
+    else:
+        result_keys, results_df = query_sorted_sqlite(unique_keys, lookup_column, gtex_cur, columns)
+        results_df = split_and_drop_columns(
+            results_df, f"chrpos{other_build}", f"chr{other_build}", f"pos{other_build}"
+        )
+    logger.info(
+        f"Merged {len(unique_keys)} unique positions with {len(result_keys)} database records."
+    )
+
+    # Each input row is repeated once per matching record, or kept once without a match.
+    left = np.searchsorted(result_keys, keys, side="left")
+    counts = np.where(keys >= 0, np.searchsorted(result_keys, keys, side="right") - left, 0)
+    input_rows, result_rows = get_left_join_rows(left, counts)
+    return attach_annotations(
+        input_data,
+        input_rows,
+        results_df,
+        result_rows,
+        get_annotation_columns(lookup_column, exclude_ref_alt),
+        ["new_ids"],
+        alleles,
+    )
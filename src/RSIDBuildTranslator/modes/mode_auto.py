@@ -0,0 +1,21 @@
+from RSIDBuildTranslator.api import annotate_file
+from RSIDBuildTranslator.cli import logger
+
+
+def run(args):
+    """Handles mode "auto" logic."""
+    keys = {}
+    if args.rsid_col:
+        keys["rsid"] = [args.rsid_col]
+    for build in ("38", "37"):
+        chr_col, pos_col = getattr(args, f"chr{build}"), getattr(args, f"pos{build}")
+        if chr_col and pos_col:
+            keys[f"chrpos{build}"] = [chr_col, pos_col]
+        elif chr_col or pos_col:
+            logger.error(f"Mode 'auto' needs both -chr{build} and -pos{build}.")
+            return
+    if not keys:
+        logger.error("Mode 'auto' needs -rs, -chr38 and -pos38, or -chr37 and -pos37.")
+        return
+
+    annotate_file(args, "auto", keys)
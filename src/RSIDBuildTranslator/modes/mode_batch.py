@@ -0,0 +1,60 @@
+import glob
+import os
+
+import pandas as pd
+
+from RSIDBuildTranslator.api import annotate_files
+from RSIDBuildTranslator.cli import logger
+
+
+def get_file_pairs(args):
+    """
+    Returns the (input path, output path) pairs given by --inputs and --output-dir, or by
+    --manifest.
+
+    Parameters:
+    args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+    file_pairs (list): (input path, output path) tuples, or None on errors.
+    """
+    if args.manifest:
+        try:
+            manifest = pd.read_csv(args.manifest, sep=None, engine="python", dtype=str)
+        except Exception as e:
+            logger.error(f"An error has occured while reading the manifest: {e}")
+            return None
+        if not {"input", "output"}.issubset(manifest.columns):
+            logger.error(f"Manifest '{args.manifest}' needs an 'input' and an 'output' column.")
+            return None
+        file_pairs = list(zip(manifest["input"], manifest["output"], strict=True))
+    else:
+        if not args.output_dir:
+            logger.error("Please provide --output-dir for the output files of --inputs.")
+            return None
+        input_paths = sorted({path for pattern in args.inputs for path in glob.glob(pattern)})
+        file_pairs = [
+            (path, os.path.join(args.output_dir, os.path.basename(path))) for path in input_paths
+        ]
+
+    if not file_pairs:
+        logger.error("No input files found.")
+        return None
+    for input_path, output_path in file_pairs:
+        if os.path.abspath(input_path) == os.path.abspath(output_path):
+            logger.error(f"Output file '{output_path}' would overwrite its input file.")
+            return None
+    outputs = [os.path.abspath(output_path) for _, output_path in file_pairs]
+    if len(set(outputs)) < len(outputs):
+        logger.error("Several input files would be written to the same output file.")
+        return None
+    return file_pairs
+
+
+def run(args):
+    """Handles mode "batch" logic."""
+    file_pairs = get_file_pairs(args)
+    if file_pairs is None:
+        return
+    logger.info(f"Annotating {len(file_pairs)} files in mode '{args.batch_mode}'.")
+    annotate_files(args, args.batch_mode, args.columns, file_pairs)
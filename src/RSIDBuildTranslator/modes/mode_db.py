@@ -0,0 +1,91 @@
+import sqlite3
+
+from RSIDBuildTranslator.binary_store import build_binary_store
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import prepare_gtex_db
+from RSIDBuildTranslator.partitions import build_gtex_partitions
+from RSIDBuildTranslator.provision import install_gtex_db, verify_gtex_db, warm_gtex_db
+from RSIDBuildTranslator.utils import (
+    find_gtex_db,
+    get_local_db_path,
+    get_local_partitions_path,
+    get_local_store_path,
+)
+
+
+def install(args):
+    """Handles "db install" logic."""
+    install_gtex_db(
+        args.db or get_local_db_path(), source=args.source, sha256=args.sha256, force=args.force
+    )
+
+
+def verify(args):
+    """Handles "db verify" logic."""
+    verify_gtex_db(args.db or get_local_db_path())
+
+
+def warm(args):
+    """Handles "db warm" logic."""
+    db_path = find_gtex_db(args.db)
+    if db_path is None:
+        return
+
+    warm_gtex_db(db_path)
+
+
+def prepare(args):
+    """Handles "db prepare" logic."""
+    db_path = find_gtex_db(args.db)
+    if db_path is None:
+        return
+
+    gtex_con = sqlite3.connect(db_path)
+    try:
+        prepare_gtex_db(gtex_con)
+    finally:
+        gtex_con.close()
+
+
+def build_store(args):
+    """Handles "db build-store" logic."""
+    db_path = find_gtex_db(args.db)
+    if db_path is None:
+        return
+
+    gtex_con = sqlite3.connect(db_path)
+    try:
+        build_binary_store(gtex_con, get_local_store_path(db_path))
+    finally:
+        gtex_con.close()
+
+
+def build_partitions(args):
+    """Handles "db build-partitions" logic."""
+    db_path = find_gtex_db(args.db)
+    if db_path is None:
+        return
+
+    gtex_con = sqlite3.connect(db_path)
+    try:
+        build_gtex_partitions(gtex_con, db_path, get_local_partitions_path(db_path))
+    finally:
+        gtex_con.close()
+
+
+def run(args):
+    """Handles mode "db" logic."""
+    command_map = {
+        "install": install,
+        "verify": verify,
+        "warm": warm,
+        "prepare": prepare,
+        "build-store": build_store,
+        "build-partitions": build_partitions,
+    }
+
+    selected_command = command_map.get(args.db_command)
+    if selected_command:
+        selected_command(args)
+    else:
+        logger.error("Please provide a database command, see 'RSIDBuildTranslator db -h'.")
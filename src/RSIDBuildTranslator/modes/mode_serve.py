@@ -0,0 +1,26 @@
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.server import create_server
+from RSIDBuildTranslator.utils import find_gtex_db
+
+
+def run(args):
+    """Handles mode "serve" logic."""
+    db_path = find_gtex_db(args.db)
+    if db_path is None:
+        return
+
+    try:
+        server = create_server(db_path, args.host, args.port, args.cache_size)
+    except Exception as e:
+        logger.error(f"An error has occured while starting the lookup server: {e}")
+        return
+
+    host, port = server.server_address[:2]
+    logger.info(f"Lookup server listening on http://{host}:{port} (Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping lookup server.")
+    finally:
+        server.server_close()
+        server.service.close()
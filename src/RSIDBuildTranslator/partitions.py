@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import GTEX_COLUMNS, TABLE_NAME, prepare_gtex_db
+from RSIDBuildTranslator.provision import get_db_version
+from RSIDBuildTranslator.utils import COMPRESSED_EXTENSIONS, parse_chrpos_parts
+
+PARTITIONS_VERSION = 1
+# Chromosomes the chrpos modes parse from the input, see CHR_PATTERN.
+CHROMOSOMES = [str(i) for i in range(1, 23)] + ["X", "Y"]
+# Input row of each row in a partition, for putting the annotated rows back in input order.
+ROW_COLUMN = "__input_row"
+
+
+def get_partition_path(partitions_path, chrom):
+    """Returns the path of the database partition of a chromosome."""
+    return os.path.join(partitions_path, f"chr{chrom}.db")
+
+
+def build_gtex_partitions(gtex_con, db_path, partitions_path):
+    """
+    Splits the GTEx database into one database per chromosome, each prepared with
+    prepare_gtex_db(). A record is stored in the partitions of its GRCh37 and its GRCh38
+    chromosome, so that the partition of a chromosome answers the lookups of both chrpos modes
+    for it. The records of a chromosome are read through the covering indexes of the chrpos
+    columns, so the database is not scanned once per chromosome.
+
+    Parameters:
+    gtex_con: GTEx database file connection.
+    db_path (str): Path to the GTEx database, whose version is recorded in meta.json.
+    partitions_path (str): Directory to write the partitions to.
+
+    Returns:
+    bool: True if the partitions were built successfully, or False.
+    """
+    try:
+        os.makedirs(partitions_path, exist_ok=True)
+        meta_path = os.path.join(partitions_path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        column_list = ", ".join(GTEX_COLUMNS)
+        # "_" is followed by "`" in ASCII, so this range holds all "chr_pos" ids of chromosome chr.
+        in_range = "{col} >= :low AND {col} < :high"
+        in37, in38 = in_range.format(col="chrpos37"), in_range.format(col="chrpos38")
+        rows = {}
+        for chrom in CHROMOSOMES:
+            path = get_partition_path(partitions_path, chrom)
+            if os.path.exists(path):
+                os.remove(path)
+            gtex_con.execute("ATTACH DATABASE ? AS part", (path,))
+            try:
+                gtex_con.execute(
+                    f"CREATE TABLE part.{TABLE_NAME} "
+                    f"({', '.join(f'{col} TEXT' for col in GTEX_COLUMNS)})"
+                )
+                bounds = {"low": f"{chrom}_", "high": f"{chrom}`"}
+                for condition in (in38, f"{in37} AND (chrpos38 IS NULL OR NOT ({in38}))"):
+                    gtex_con.execute(
+                        f"INSERT INTO part.{TABLE_NAME} "
+                        f"SELECT {column_list} FROM main.{TABLE_NAME} WHERE {condition}",
+                        bounds,
+                    )
+                gtex_con.commit()
+                rows[chrom] = gtex_con.execute(
+                    f"SELECT COUNT(*) FROM part.{TABLE_NAME}"
+                ).fetchone()[0]
+            finally:
+                gtex_con.execute("DETACH DATABASE part")
+
+            with closing(sqlite3.connect(path)) as partition_con:
+                if not prepare_gtex_db(partition_con):
+                    raise RuntimeError(f"Partition '{path}' could not be prepared.")
+            logger.info(f"Built partition of chromosome {chrom} with {rows[chrom]} variants.")
+
+        # meta.json is written last, so an interrupted build is never mistaken for a complete one.
+        with open(meta_path, "w") as f:
+            json.dump(
+                {
+                    "version": PARTITIONS_VERSION,
+                    "db_version": get_db_version(db_path),
+                    "rows": rows,
+                },
+                f,
+            )
+        logger.info(f"Database partitions built successfully in '{partitions_path}'.")
+        return True
+    except Exception as e:
+        logger.error(f"An error has occured while building the database partitions: {e}")
+        return False
+
+
+def check_partitions(partitions_path, db_path):
+    """
+    Checks that the database partitions are complete and were built from the current database.
+
+    Parameters:
+    partitions_path (str): Directory of the partitions.
+    db_path (str): Path to the GTEx database.
+
+    Returns:
+    bool: True if the partitions can be used, or False
+    """
+    command = f"RSIDBuildTranslator db build-partitions --db {db_path}"
+    try:
+        with open(os.path.join(partitions_path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        logger.error(
+            f"Database partitions '{partitions_path}' are missing or incomplete. "
+            f"Please run '{command}' once to build them."
+        )
+        return False
+    if meta.get("version") != PARTITIONS_VERSION or meta.get("db_version") != get_db_version(
+        db_path
+    ):
+        logger.error(
+            f"Database partitions '{partitions_path}' were built from another version of "
+            f"'{db_path}'. Please run '{command}' to build them again."
+        )
+        return False
+    return True
+
+
+def split_by_chromosome(input_data, chr_col, pos_col):
+    """
+    Splits input data into the rows of each chromosome, in order of first appearance. Every
+    part gets a ROW_COLUMN with the position of its rows in the input data.
+
+    Parameters:
+    input_data (pd.DataFrame): Input data.
+    chr_col (str): Name of the chr column as provided by user.
+    pos_col (str): Name of the pos column as provided by user.
+
+    Returns:
+    parts (list): (chromosome, rows) tuples, with chromosome None for rows without a valid one.
+    """
+    chromosomes = parse_chrpos_parts(input_data, chr_col, pos_col)[0]
+    input_data = input_data.assign(**{ROW_COLUMN: np.arange(len(input_data))})
+    codes, uniques = pd.factorize(chromosomes, use_na_sentinel=False)
+    return [
+        (None if pd.isna(chrom) else chrom, input_data[codes == code])
+        for code, chrom in enumerate(uniques)
+    ]
+
+
+def restore_input_order(parts):
+    """
+    Concatenates annotated partitions and puts their rows back in input order, see
+    split_by_chromosome(). The rows annotated from one input row stay in their order.
+
+    Parameters:
+    parts (list): Annotated dataframes with a ROW_COLUMN.
+
+    Returns:
+    final_df (pd.DataFrame): Annotated data without the ROW_COLUMN, indexed by input row like
+        VCF data in attach_annotations().
+    """
+    final_df = pd.concat(parts, ignore_index=True)
+    order = np.argsort(final_df[ROW_COLUMN].to_numpy(), kind="stable")
+    return drop_row_column(final_df.take(order))
+
+
+def drop_row_column(final_df):
+    """Moves the ROW_COLUMN of annotated data into its index, see restore_input_order()."""
+    return final_df.set_index(ROW_COLUMN).rename_axis(None)
+
+
+def get_partition_output_path(path, chrom):
+    """
+    Returns the output path for the rows of one chromosome, e.g. "out.chr7.tsv.gz" for
+    "out.tsv.gz", or "out.invalid.tsv.gz" for rows without a valid chromosome.
+    """
+    root, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSED_EXTENSIONS:
+        root, inner_ext = os.path.splitext(root)
+        ext = inner_ext + ext
+    return f"{root}.{'invalid' if chrom is None else f'chr{chrom}'}{ext}"
@@ -0,0 +1,241 @@
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+from RSIDBuildTranslator.cli import logger
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak RSS is left out of the report.
+    resource = None
+
+# Seconds between two progress messages of the same task.
+PROGRESS_INTERVAL = 5.0
+# Order of the stages of an annotation in reports, other stages follow in the order they ran.
+STAGES = [
+    "read",
+    "validate",
+    "key_build",
+    "lookup_cache",
+    "query_to_df",
+    "cleanup_query_df",
+    "merge_join",
+    "write",
+]
+
+
+def get_peak_rss_mb():
+    """Returns the peak resident set size of the process so far in MB, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes.
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+class Profiler:
+    """
+    Collects the wall time, number of rows and peak RSS of each stage of a run, the cache hits
+    and misses of stages that reuse earlier results, and the repeated ids a stage dropped. A stage
+    can run many times, e.g. once per chunk, and its totals are summed.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.start = time.perf_counter()
+
+    def get_stage(self, name):
+        """Returns the totals of a stage, adding it if it is new."""
+        if name not in self.stages:
+            self.stages[name] = {
+                "calls": 0,
+                "seconds": 0.0,
+                "rows": 0,
+                "cache_hits": 0,
+                "cache_misses": 0,
+                "deduplicated": 0,
+                "peak_rss_mb": None,
+            }
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        """
+        Times a block of code as one call of a stage. Yields a dict whose "rows" can be set
+        inside the block, if the number of rows is not known before.
+        """
+        call = {"rows": rows}
+        start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            totals = self.get_stage(name)
+            totals["calls"] += 1
+            totals["seconds"] += time.perf_counter() - start
+            totals["rows"] += call["rows"]
+            totals["peak_rss_mb"] = get_peak_rss_mb()
+
+    def count_cache(self, name, hits, misses):
+        """Adds cache hits and misses to a stage."""
+        totals = self.get_stage(name)
+        totals["cache_hits"] += hits
+        totals["cache_misses"] += misses
+
+    def count_deduplicated(self, name, count):
+        """Adds repeated ids, which are answered by the lookup of their first occurrence."""
+        self.get_stage(name)["deduplicated"] += count
+
+    def to_dict(self):
+        """Returns the totals of all stages, with rows per second and cache hit rates."""
+        stages = []
+        names = sorted(self.stages, key=lambda name: STAGES.index(name) if name in STAGES else 99)
+        for name in names:
+            totals = self.stages[name]
+            lookups = totals["cache_hits"] + totals["cache_misses"]
+            stages.append(
+                {
+                    "stage": name,
+                    **totals,
+                    "seconds": round(totals["seconds"], 4),
+                    "rows_per_second": (
+                        round(totals["rows"] / totals["seconds"]) if totals["seconds"] else None
+                    ),
+                    "cache_hit_rate": round(totals["cache_hits"] / lookups, 4) if lookups else None,
+                }
+            )
+        return {
+            "total_seconds": round(time.perf_counter() - self.start, 4),
+            "peak_rss_mb": get_peak_rss_mb(),
+            "stages": stages,
+        }
+
+    def format_table(self):
+        """Returns the totals of all stages as a text table."""
+        report = self.to_dict()
+        header = [
+            "stage",
+            "calls",
+            "seconds",
+            "rows",
+            "rows/s",
+            "cache hits",
+            "deduplicated",
+            "peak RSS MB",
+        ]
+        rows = [
+            [
+                stage["stage"],
+                str(stage["calls"]),
+                f"{stage['seconds']:.3f}",
+                str(stage["rows"]),
+                str(stage["rows_per_second"] or "-"),
+                f"{stage['cache_hit_rate']:.1%}" if stage["cache_hit_rate"] is not None else "-",
+                str(stage["deduplicated"] or "-"),
+                str(stage["peak_rss_mb"] or "-"),
+            ]
+            for stage in report["stages"]
+        ]
+        rows.append(["total", "", f"{report['total_seconds']:.3f}", "", "", "", "", ""])
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+        lines = [
+            "  ".join(
+                # Stage names are left aligned, numbers right aligned.
+                value.ljust(width) if i == 0 else value.rjust(width)
+                for i, (value, width) in enumerate(zip(row, widths, strict=True))
+            )
+            for row in [header, *rows]
+        ]
+        lines.insert(1, "-" * len(lines[0]))
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        """Writes the totals of all stages to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+
+# Profiler of the current run, set by enable_profiling().
+active_profiler = None
+
+
+def enable_profiling():
+    """Starts collecting stage statistics for this process and returns the Profiler."""
+    global active_profiler
+    active_profiler = Profiler()
+    return active_profiler
+
+
+def disable_profiling():
+    """Stops collecting stage statistics."""
+    global active_profiler
+    active_profiler = None
+
+
+def profile_stage(name, rows=0):
+    """Returns a context manager timing a stage if profiling is enabled, see Profiler.stage()."""
+    if active_profiler is None:
+        return nullcontext({"rows": rows})
+    return active_profiler.stage(name, rows)
+
+
+def profile_chunks(name, chunks):
+    """Times getting each dataframe from an iterator as one call of a stage."""
+    while True:
+        with profile_stage(name) as call:
+            chunk = next(chunks, None)
+            call["rows"] = len(chunk) if chunk is not None else 0
+        if chunk is None:
+            return
+        yield chunk
+
+
+def count_cache(name, hits, misses):
+    """Adds cache hits and misses to a stage if profiling is enabled."""
+    if active_profiler is not None:
+        active_profiler.count_cache(name, hits, misses)
+
+
+def count_deduplicated(name, count):
+    """Adds repeated ids to a stage if profiling is enabled."""
+    if active_profiler is not None:
+        active_profiler.count_deduplicated(name, count)
+
+
+class ProgressReporter:
+    """
+    Logs the progress of a long task at most once every PROGRESS_INTERVAL seconds, instead of
+    once per batch.
+
+    Example:
+        progress = ProgressReporter("Looked up", len(ids), "ids")
+        for batch in batches:
+            ...
+            progress.update(len(batch))
+    """
+
+    def __init__(self, description, total=None, unit="rows", interval=PROGRESS_INTERVAL):
+        self.description = description
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last_report = self.start
+
+    def update(self, count):
+        """Adds count finished units, logging the progress if the interval has passed."""
+        self.done += count
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now):
+        """Logs the progress."""
+        rate = self.done / (now - self.start) if now > self.start else 0
+        done = f"{self.done}/{self.total}" if self.total else str(self.done)
+        percent = f" ({self.done / self.total:.0%})" if self.total else ""
+        logger.info(f"{self.description} {done} {self.unit}{percent}, {rate:,.0f} {self.unit}/s...")
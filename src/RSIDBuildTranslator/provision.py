@@ -0,0 +1,329 @@
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+from contextlib import closing, contextmanager
+from datetime import UTC, datetime
+
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import prepare_gtex_db
+from RSIDBuildTranslator.profiling import ProgressReporter
+
+# Directory holding the database, e.g. one shared by all nodes of a cluster.
+DATA_DIR_VARIABLE = "RSIDBuildTranslator_DATA"
+DB_FILENAME = "GTEx_v10.db"
+GDRIVE_URL = "https://drive.google.com/uc?id=1Bug-VI1HGJbyymeveeb75hrym18krrh9"
+SQLITE_MAGIC = b"SQLite format 3\x00"
+CHUNK_SIZE = 8 * 2**20
+LOCK_POLL_SECONDS = 5
+
+
+def get_data_dir():
+    """
+    Returns the directory the GTEx database is kept in, which is $RSIDBuildTranslator_DATA if
+    set, or else the package's data folder.
+
+    Returns:
+    data_dir (str): Path to the data directory, created if missing.
+    """
+    data_dir = os.environ.get(DATA_DIR_VARIABLE) or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "data"
+    )
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def check_db_file(db_path):
+    """
+    Checks that a file is a complete SQLite database from its 100 byte header, without reading
+    the rest of the file. An interrupted download fails the check, since it is shorter than the
+    number of pages recorded in the header.
+
+    Parameters:
+    db_path (str): Path to the database file.
+
+    Returns:
+    problem (str): Description of the problem, or None if the file passes the check.
+    """
+    try:
+        size = os.path.getsize(db_path)
+        with open(db_path, "rb") as f:
+            header = f.read(100)
+    except OSError:
+        return "file does not exist"
+    if len(header) < 100 or header[:16] != SQLITE_MAGIC:
+        return "not a SQLite database"
+    page_size = int.from_bytes(header[16:18], "big")
+    page_size = 65536 if page_size == 1 else page_size
+    page_count = int.from_bytes(header[28:32], "big")
+    # The page count is only kept up to date if the change counter matches "version-valid-for".
+    if header[24:28] == header[92:96] and size < page_count * page_size:
+        return f"file is truncated ({size} of {page_count * page_size} bytes)"
+    return None
+
+
+def get_db_version(db_path):
+    """
+    Returns a short fingerprint of a database file from its size and header. The header holds
+    a counter that SQLite increments on every change, so the fingerprint changes with the data.
+
+    Parameters:
+    db_path (str): Path to the database file.
+
+    Returns:
+    version (str): Hex fingerprint.
+    """
+    with open(db_path, "rb") as f:
+        header = f.read(100)
+    digest = hashlib.sha1(header + str(os.path.getsize(db_path)).encode())
+    return digest.hexdigest()[:16]
+
+
+def get_manifest_path(db_path):
+    """Returns the path of the manifest recording where a database was installed from."""
+    return f"{db_path}.manifest.json"
+
+
+def file_sha256(path):
+    """Returns the SHA-256 checksum of a file as a hex string."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_stale_lock(lock_path):
+    """Returns True if a lock file was left by a process of this host that no longer runs."""
+    try:
+        with open(lock_path) as f:
+            host, pid = f.read().split()
+    except (OSError, ValueError):
+        return False
+    # Processes of other hosts, and signals on Windows, cannot be checked.
+    if host != socket.gethostname() or os.name == "nt":
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+@contextmanager
+def install_lock(db_path):
+    """
+    Holds a lock file next to the database while installing or preparing it, so that processes
+    sharing a data directory do this only once. Other processes wait until the lock is released.
+    """
+    lock_path = f"{db_path}.lock"
+    waiting = False
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if is_stale_lock(lock_path):
+                logger.warning(f"Removing stale lock file '{lock_path}'.")
+                os.remove(lock_path)
+                continue
+            if not waiting:
+                logger.info(
+                    f"Waiting for another process to install or prepare '{db_path}'. If none is "
+                    f"running, remove '{lock_path}'."
+                )
+                waiting = True
+            time.sleep(LOCK_POLL_SECONDS)
+    with os.fdopen(fd, "w") as f:
+        f.write(f"{socket.gethostname()} {os.getpid()}")
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+def fetch_gdrive(path):
+    """Downloads the database from Google Drive, resuming gdown's partial file if present."""
+    # Only needed for the download, and slow to import.
+    import gdown
+
+    if gdown.download(GDRIVE_URL, path, quiet=False, resume=True) is None:
+        raise RuntimeError("Download from Google Drive failed.")
+
+
+def fetch_url(url, path):
+    """Downloads a URL to a file, resuming a partial file with an HTTP Range request."""
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    try:
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            # The partial file is already complete.
+            return
+        raise
+    with response, open(path, "ab" if offset else "wb") as f:
+        if offset and response.status != 206:
+            logger.warning("The server does not support resuming, downloading from the start.")
+            f.truncate(0)
+        elif offset:
+            logger.info(f"Resuming download at {offset} bytes.")
+        shutil.copyfileobj(response, f, CHUNK_SIZE)
+
+
+def copy_file(source, path):
+    """Copies a local file, continuing a partial copy."""
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    with open(source, "rb") as src, open(path, "ab") as dst:
+        src.seek(offset)
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def install_gtex_db(db_path, source=None, sha256=None, force=False):
+    """
+    Installs the GTEx database. The file is downloaded or copied next to the final path first,
+    resuming an earlier partial download of the same source. It is then checked, prepared with
+    prepare_gtex_db() and only then renamed to the final path, so an interrupted install never
+    leaves an incomplete database behind.
+
+    Parameters:
+    db_path (str): Path to install the database to.
+    source (str): URL or local path of a copy of the database, e.g. a mirror or a file already
+        downloaded on another machine. Defaults to Google Drive.
+    sha256 (str): Expected SHA-256 checksum of the source file, verified if provided.
+    force (bool): "True" installs again even if a valid database exists at db_path.
+
+    Returns:
+    db_path (str): Path to the installed database, or None on errors.
+    """
+    source_name = source or GDRIVE_URL
+    # Partial files of different sources must not be mixed when resuming.
+    tag = hashlib.sha1(source_name.encode()).hexdigest()[:8]
+    staged_path = f"{db_path}.{tag}.part"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with install_lock(db_path):
+            if not force and check_db_file(db_path) is None:
+                logger.info(f"GTEx database is already installed at '{db_path}'.")
+                return db_path
+
+            logger.info(f"Installing GTEx database from {source_name} to '{db_path}'...")
+            if check_db_file(staged_path) is not None:
+                if source is None:
+                    fetch_gdrive(staged_path)
+                elif source.startswith(("http://", "https://")):
+                    fetch_url(source, staged_path)
+                else:
+                    copy_file(source, staged_path)
+
+            problem = check_db_file(staged_path)
+            if problem is not None:
+                os.remove(staged_path)
+                logger.error(f"Installed file is not a valid GTEx database: {problem}.")
+                return None
+            logger.info("Verifying checksum..." if sha256 else "Computing checksum...")
+            checksum = file_sha256(staged_path)
+            if sha256 and checksum != sha256.lower():
+                os.remove(staged_path)
+                logger.error(f"Checksum mismatch: expected {sha256.lower()}, got {checksum}.")
+                return None
+            if not sha256:
+                logger.warning(
+                    f"No --sha256 given, checksum {checksum} is recorded unverified in the manifest."
+                )
+
+            with closing(sqlite3.connect(staged_path)) as gtex_con:
+                prepared = prepare_gtex_db(gtex_con)
+            if not prepared:
+                # The staged file is kept, so the next install prepares it without downloading.
+                logger.error("Preparing the GTEx database failed, it was not installed.")
+                return None
+            os.replace(staged_path, db_path)
+            with open(get_manifest_path(db_path), "w") as f:
+                manifest = {
+                    "source": source_name,
+                    "sha256": checksum,
+                    "sha256_verified": bool(sha256),
+                    "installed": datetime.now(UTC).isoformat(timespec="seconds"),
+                }
+                json.dump(manifest, f, indent=2)
+            logger.info(f"GTEx database installed successfully to '{db_path}'.")
+            return db_path
+    except Exception as e:
+        logger.error(f"Failed to install GTEx database: {e}")
+        return None
+
+
+def verify_gtex_db(db_path):
+    """
+    Fully checks an installed database with "PRAGMA quick_check", which reads every page.
+
+    Parameters:
+    db_path (str): Path to the database file.
+
+    Returns:
+    bool: True if the database passes the checks, or False
+    """
+    problem = check_db_file(db_path)
+    if problem is not None:
+        logger.error(f"'{db_path}' is not a valid GTEx database: {problem}.")
+        return False
+    try:
+        with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as gtex_con:
+            result = gtex_con.execute("PRAGMA quick_check").fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"'{db_path}' could not be checked: {e}")
+        return False
+    if result != [("ok",)]:
+        logger.error(f"'{db_path}' is corrupt: {'; '.join(row[0] for row in result[:5])}")
+        return False
+    if os.path.exists(get_manifest_path(db_path)):
+        with open(get_manifest_path(db_path)) as f:
+            manifest = json.load(f)
+        logger.info(
+            f"Installed from {manifest['source']} on {manifest['installed']}, "
+            f"source checksum {manifest['sha256']} "
+            f"({'verified' if manifest.get('sha256_verified') else 'unverified'})."
+        )
+    logger.info(f"'{db_path}' passed all checks.")
+    return True
+
+
+def warm_gtex_db(db_path):
+    """
+    Reads the whole database file once, so that it is held in the OS page cache. The page cache
+    is shared by all processes of a node, so jobs opened afterwards, in particular with
+    connect_read_only(mmap=True), find every page in memory.
+
+    Parameters:
+    db_path (str): Path to the database file.
+
+    Returns:
+    bool: True if the file was read, or False
+    """
+    try:
+        size = os.path.getsize(db_path)
+        progress = ProgressReporter("Warmed", size // 2**20, "MB")
+        start = time.perf_counter()
+        with open(db_path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                # Lets the kernel read ahead in large blocks.
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            buffer = bytearray(CHUNK_SIZE)
+            while read := f.readinto(buffer):
+                progress.update(read // 2**20)
+    except OSError as e:
+        logger.error(f"An error has occured while reading '{db_path}': {e}")
+        return False
+    seconds = time.perf_counter() - start
+    logger.info(
+        f"Read {size / 2**20:,.0f} MB of '{db_path}' into the page cache in {seconds:.1f} seconds."
+    )
+    return True
@@ -0,0 +1,283 @@
+import http.client
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from RSIDBuildTranslator.api import LOOKUP_COLUMNS
+from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import GTEX_COLUMNS
+from RSIDBuildTranslator.utils import (
+    connect_read_only,
+    normalize_ids,
+    prepare_gtex_db_if_needed,
+    query_to_df,
+    warn_missing_index,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 1_000_000
+
+
+class LookupCache:
+    """
+    Bounded least-recently-used cache of lookup results, mapping a (lookup column, id) key to
+    the list of GTEx records found for it. Ids without any record are cached as an empty list.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.records = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, key):
+        """Returns the cached records of a key, or None if it is not cached."""
+        records = self.records.get(key)
+        if records is None:
+            self.misses += 1
+            return None
+        self.records.move_to_end(key)
+        self.hits += 1
+        return records
+
+    def put(self, key, records):
+        """Caches the records of a key, evicting the least recently used keys if full."""
+        self.records[key] = records
+        self.records.move_to_end(key)
+        while len(self.records) > self.max_size:
+            self.records.popitem(last=False)
+
+    def stats(self):
+        """Returns the cache size and hit counts."""
+        return {
+            "size": len(self.records),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class LookupService:
+    """
+    Answers batch lookups from memory-mapped, read-only connections to the GTEx database, one
+    per request thread, going to the database only for ids missing from the shared cache.
+    """
+
+    def __init__(self, db_path, cache_size=DEFAULT_CACHE_SIZE):
+        prepare_gtex_db_if_needed(db_path)
+        self.db_path = db_path
+        self.cache = LookupCache(cache_size)
+        # Only guards the cache and the list of connections, so that queries of different
+        # threads run in parallel.
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.connections = []
+        self.checked_columns = set()
+
+    def get_connection(self):
+        """Returns the database connection of the current thread, opening it on first use."""
+        gtex_con = getattr(self.local, "gtex_con", None)
+        if gtex_con is None:
+            # Maps the whole file, so warm lookups read pages from the OS page cache directly.
+            gtex_con = connect_read_only(self.db_path, mmap=True)
+            self.local.gtex_con = gtex_con
+            with self.lock:
+                self.connections.append(gtex_con)
+        return gtex_con
+
+    def close(self):
+        """Closes the database connections of all threads."""
+        with self.lock:
+            for gtex_con in self.connections:
+                gtex_con.close()
+            self.connections.clear()
+
+    def lookup(self, mode, ids):
+        """
+        Looks up ids of one key type.
+
+        Parameters:
+        mode (str): One of "rsid", "chrpos37" or "chrpos38".
+        ids (list): Ids in the format of the GTEx database, e.g. "rs123" or "7_127741848".
+
+        Returns:
+        results (dict): Maps every requested id to a list of records, each a list of values in
+            the order of GTEX_COLUMNS. Ids not found, or not in a valid format, map to [].
+        """
+        if mode not in LOOKUP_COLUMNS:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {list(LOOKUP_COLUMNS)}.")
+        if not isinstance(ids, list) or not all(isinstance(id, str) for id in ids):
+            raise ValueError("'ids' must be a list of strings.")
+        lookup_column = LOOKUP_COLUMNS[mode]
+
+        with self.lock:
+            results = {}
+            for id in ids:
+                records = self.cache.get((lookup_column, id))
+                if records is not None:
+                    results[id] = records
+        missing = [id for id in dict.fromkeys(ids) if id not in results]
+        if missing:
+            results.update(self.query(lookup_column, missing))
+        return results
+
+    def query(self, lookup_column, ids):
+        """Looks up ids missing from the cache in the database and caches the results."""
+        gtex_con = self.get_connection()
+        if lookup_column not in self.checked_columns:
+            warn_missing_index(gtex_con, lookup_column)
+            self.checked_columns.add(lookup_column)
+
+        results = {id: [] for id in ids}
+        valid_ids = normalize_ids(ids, lookup_column)
+        if valid_ids:
+            results_df = query_to_df(
+                "GTEx_lookup",
+                valid_ids,
+                lookup_column,
+                gtex_con.cursor(),
+                len(valid_ids),
+                "temp-table",
+                GTEX_COLUMNS,
+            )
+            if results_df is None:
+                raise RuntimeError("Looking up ids in the GTEx database failed.")
+            for record in zip(*(results_df[col].tolist() for col in GTEX_COLUMNS), strict=True):
+                results[record[GTEX_COLUMNS.index(lookup_column)]].append(list(record))
+
+        with self.lock:
+            for id, records in results.items():
+                self.cache.put((lookup_column, id), records)
+        return results
+
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles "POST /lookup" with a JSON body {"mode": ..., "ids": [...]}, and "GET /health".
+    Connections are kept alive, so a client pays the connection setup only once.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which Nagle's algorithm would delay by ~40 ms.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {"error": f"Unknown path '{self.path}'."})
+            return
+        with self.server.service.lock:
+            stats = self.server.service.cache.stats()
+        self.send_json(200, {"status": "ok", "cache": stats})
+
+    def do_POST(self):
+        if self.path != "/lookup":
+            self.send_json(404, {"error": f"Unknown path '{self.path}'."})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            results = self.server.service.lookup(request.get("mode"), request.get("ids"))
+        except (ValueError, AttributeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logger.error(f"An error has occured while answering a lookup: {e}")
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, {"columns": GTEX_COLUMNS, "results": results})
+
+    def send_json(self, status, body):
+        """Sends a JSON response."""
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def create_server(db_path, host=DEFAULT_HOST, port=DEFAULT_PORT, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Creates the lookup server, without starting it.
+
+    Parameters:
+    db_path (str): Path to the GTEx database.
+    host (str): Address to listen on.
+    port (int): Port to listen on, 0 picks a free port.
+    cache_size (int): Maximum number of ids kept in the LRU cache.
+
+    Returns:
+    server (ThreadingHTTPServer): Server, with the LookupService as server.service.
+    """
+    server = ThreadingHTTPServer((host, port), LookupRequestHandler)
+    server.daemon_threads = True
+    server.service = LookupService(db_path, cache_size)
+    return server
+
+
+class LookupClient:
+    """
+    Client for the lookup server started with "RSIDBuildTranslator serve". Keeps one connection
+    open for all requests.
+
+    Example:
+        client = LookupClient("http://127.0.0.1:8765")
+        client.lookup("rsid", ["rs116944008"])
+    """
+
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=60):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(
+            parts.hostname, parts.port or DEFAULT_PORT, timeout=timeout
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connection."""
+        self.connection.close()
+
+    def request(self, method, path, body=None):
+        """Sends a request and returns the decoded JSON response."""
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        data = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"Lookup server returned {response.status}: {data.get('error')}")
+        return data
+
+    def lookup(self, mode, ids):
+        """
+        Looks up ids of one key type.
+
+        Parameters:
+        mode (str): One of "rsid", "chrpos37" or "chrpos38".
+        ids (list): Ids in the format of the GTEx database, e.g. "rs123" or "7_127741848".
+
+        Returns:
+        results (dict): Maps every requested id to a list of records, each a dict with the GTEx
+            columns.
+        """
+        data = self.request("POST", "/lookup", json.dumps({"mode": mode, "ids": list(ids)}))
+        columns = data["columns"]
+        return {
+            id: [dict(zip(columns, record, strict=True)) for record in records]
+            for id, records in data["results"].items()
+        }
+
+    def health(self):
+        """Returns the server status and cache statistics."""
+        return self.request("GET", "/health")
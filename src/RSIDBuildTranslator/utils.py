@@ -1,85 +1,355 @@
+import csv
+import gzip
 import os
 import re
 import sqlite3
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from urllib.parse import quote
 
-import gdown
+import numpy as np
 import pandas as pd
 
+from RSIDBuildTranslator.bgzf import open_bgzf_text
+from RSIDBuildTranslator.binary_store import BinaryStore
 from RSIDBuildTranslator.cli import logger
+from RSIDBuildTranslator.db import (
+    GTEX_COLUMNS,
+    LOOKUP_COLUMNS,
+    get_covered_columns,
+    has_lookup_index,
+    prepare_gtex_db,
+)
+from RSIDBuildTranslator.profiling import ProgressReporter, count_deduplicated, profile_stage
+from RSIDBuildTranslator.provision import (
+    DB_FILENAME,
+    check_db_file,
+    get_data_dir,
+    install_gtex_db,
+    install_lock,
+)
+from RSIDBuildTranslator.vcf import (
+    VCF_EXTENSION,
+    is_vcf_path,
+    read_vcf,
+    write_vcf_header,
+    write_vcf_records,
+)
+
+TEXT_EXTENSIONS = {".txt": "\t", ".tsv": "\t", ".csv": ","}
+COLUMNAR_EXTENSIONS = {".parquet": "Parquet", ".feather": "Feather", ".arrow": "Feather"}
+COMPRESSED_EXTENSIONS = (".gz", ".bgz")
+SUPPORTED_EXTENSIONS_MESSAGE = (
+    "Supported extensions are .txt, .tsv, .csv and .vcf (optionally followed by .gz or .bgz), "
+    ".parquet, .feather and .arrow"
+)
+CHR_PATTERN = re.compile(r"^(?:chr)?(1[0-9]?|2[0-2]?|[1-9]|X|Y)\b", re.IGNORECASE)
 
 
 def get_local_db_path():
     """
-    Returns the correct database path inside the package's data folder.
+    Returns the default database path, inside $RSIDBuildTranslator_DATA if set or else the
+    package's data folder.
 
     Returns:
     Constructs and returns path to the GTEx database.
     """
-    package_path = os.path.dirname(os.path.abspath(__file__))  # Get the package location
-    data_folder = os.path.join(package_path, "data")  # Path to data/ folder
-    os.makedirs(data_folder, exist_ok=True)  # Ensure data folder exists
-    return os.path.join(data_folder, "GTEx_v10.db")  # Path to database file
+    return os.path.join(get_data_dir(), DB_FILENAME)
+
+
+def get_local_store_path(db_path=None):
+    """
+    Returns the path of the binary lookup store, kept next to the GTEx database.
+
+    Parameters:
+    db_path (str): Path to the GTEx database. Defaults to get_local_db_path().
+
+    Returns:
+    Constructs and returns path to the binary store directory.
+    """
+    return os.path.join(os.path.dirname(db_path or get_local_db_path()), "GTEx_v10_store")
+
+
+def get_local_partitions_path(db_path=None):
+    """
+    Returns the path of the per-chromosome database partitions, kept next to the GTEx database.
+
+    Parameters:
+    db_path (str): Path to the GTEx database. Defaults to get_local_db_path().
+
+    Returns:
+    Constructs and returns path to the partitions directory.
+    """
+    return os.path.join(os.path.dirname(db_path or get_local_db_path()), "GTEx_v10_partitions")
 
 
 def download_gtex_db():
     """
-    Downloads the GTEx database from Google Drive if it does not exist locally.
+    Installs the GTEx database from Google Drive if there is no complete copy at the default
+    path. The existing file is only checked from its header, see check_db_file().
 
     Returns:
-    local_db_path: Path to the downloaded GTEx database.
+    local_db_path: Path to the downloaded GTEx database, or None on errors.
     """
-    gdrive_file_id = "1Bug-VI1HGJbyymeveeb75hrym18krrh9"
-    gdrive_url = f"https://drive.google.com/uc?id={gdrive_file_id}"
     local_db_path = get_local_db_path()
+    problem = check_db_file(local_db_path)
+    if problem is None:
+        return local_db_path
+    if os.path.exists(local_db_path):
+        logger.warning(f"'{local_db_path}' is not a complete database ({problem}), replacing it.")
+    return install_gtex_db(local_db_path, force=True)
 
-    if not os.path.exists(local_db_path):
-        logger.info("Downloading GTEx database from Google Drive...")
 
-        try:
-            gdown.download(gdrive_url, local_db_path, quiet=False)
-            logger.info(f"Database downloaded successfully to {local_db_path}")
-        except Exception as e:
-            logger.error(f"Failed to download GTEx database: {e}")
-            return None
+def find_gtex_db(db_path=None):
+    """
+    Returns the path of a GTEx database that passes check_db_file().
+
+    Parameters:
+    db_path (str): Path to a GTEx database. Defaults to the package's copy, which is downloaded
+        if missing.
+
+    Returns:
+    db_path (str): Path to the GTEx database, or None on errors.
+    """
+    if db_path is None:
+        db_path = download_gtex_db()
+        if db_path is None:
+            logger.error("GTEx database file is missing.")
+        return db_path
+    problem = check_db_file(db_path)
+    if problem is not None:
+        logger.error(
+            f"'{db_path}' is not a valid GTEx database ({problem}). Install it with "
+            f"'RSIDBuildTranslator db install --db {db_path}'."
+        )
+        return None
+    return db_path
+
+
+def prepare_gtex_db_if_needed(db_path):
+    """
+    Prepares a GTEx database without lookup indexes with prepare_gtex_db(), e.g. one downloaded
+    by an older version of RSIDBuildTranslator. Processes sharing the database wait for each
+    other, so it is only prepared once.
+
+    Parameters:
+    db_path (str): Path to the GTEx database.
+
+    Returns:
+    bool: True if the database has an index for every lookup column, or False.
+    """
+
+    def is_prepared():
+        with closing(sqlite3.connect(db_path)) as gtex_con:
+            return all(has_lookup_index(gtex_con, col) for col in LOOKUP_COLUMNS)
+
+    try:
+        if is_prepared():
+            return True
+        with install_lock(db_path):
+            if is_prepared():
+                return True
+            logger.info(
+                "GTEx database has no lookup indexes yet, preparing it once "
+                "(this may take a while)..."
+            )
+            with closing(sqlite3.connect(db_path)) as gtex_con:
+                return prepare_gtex_db(gtex_con)
+    except Exception as e:
+        logger.error(f"An error has occured while preparing the GTEx database: {e}")
+        return False
+
+
+def warn_missing_index(gtex_con, lookup_column):
+    """
+    Logs a warning if the GTEx table has no index on a lookup column, since every lookup then
+    scans the whole table.
+
+    Parameters:
+    gtex_con: GTEx database file connection.
+    lookup_column (str): Name of column from GTEx table used for query.
 
-    return local_db_path
+    Returns:
+    bool: True if the lookup column has an index, or False.
+    """
+    if has_lookup_index(gtex_con, lookup_column):
+        return True
+    logger.warning(
+        f"GTEx database has no index on '{lookup_column}', lookups will be slow. "
+        "Please run 'RSIDBuildTranslator db prepare' once to create it."
+    )
+    return False
 
 
-def load_gtex_data():
+def load_gtex_data(db_path=None, mmap=False):
     """
-    Reads GTEx database file.
+    Reads GTEx database file, preparing it first if it has no lookup indexes yet. If it cannot
+    be prepared, e.g. because it is read-only, lookups run without the indexes.
+
+    Parameters:
+    db_path (str): Path to a GTEx database. Defaults to the package's copy, which is downloaded
+        if missing.
+    mmap (bool): "True" opens the database read-only and memory-mapped, see connect_read_only().
 
     Returns:
     gtex_con : GTEx database file connection.
     """
-    db_path = download_gtex_db()
-    if db_path and os.path.exists(db_path):
-        try:
-            gtex_con = sqlite3.connect(db_path)
-            logger.info("GTEx database read successfully.")
-            return gtex_con
-        except Exception as e:
-            logger.error(f"An error has occured while reading the GTEx database: {e}")
-            return None
-    else:
-        logger.error("GTEx database file is missing.")
+    db_path = find_gtex_db(db_path)
+    if db_path is None:
+        return None
+    if not prepare_gtex_db_if_needed(db_path):
+        logger.warning(
+            f"'{db_path}' could not be prepared, lookups will be slow. Please run "
+            f"'RSIDBuildTranslator db prepare --db {db_path}' once to create its indexes."
+        )
+    try:
+        gtex_con = connect_read_only(db_path, mmap=True) if mmap else sqlite3.connect(db_path)
+        logger.info("GTEx database read successfully.")
+        return gtex_con
+    except Exception as e:
+        logger.error(f"An error has occured while reading the GTEx database: {e}")
+        return None
+
+
+def is_gzipped(path):
+    """
+    Checks if a file is gzip (or bgzip) compressed from its first bytes.
+
+    Parameters:
+    path (str): Filename including path as provided by user.
+
+    Returns:
+    bool: True if the file is gzip compressed, or False.
+    """
+    with open(path, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
+def sniff_delimiter(path, sample_size=65536):
+    """
+    Detects the delimiter of a delimited file from its first few KB.
+
+    Parameters:
+    path (str): Filename including path as provided by user.
+    sample_size (int): Number of characters to sniff.
+
+    Returns:
+    sep (str): Delimiter to pass to pandas.
+    """
+    opener = gzip.open if is_gzipped(path) else open
+    with opener(path, "rt", newline="") as f:
+        sample = f.read(sample_size)
+    if len(sample) == sample_size and "\n" in sample:
+        # Only sniff complete lines.
+        sample = sample[: sample.rfind("\n") + 1]
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters="\t,; |").delimiter
+    except csv.Error:
+        delimiter = csv.Sniffer().sniff(sample.splitlines()[0]).delimiter
+    # Space separated files are usually aligned with runs of spaces.
+    return r"\s+" if delimiter == " " else delimiter
+
+
+def parse_dtype_hints(dtype_hints):
+    """
+    Converts dtype hints given on the command line as "COLUMN=TYPE" to a dictionary.
+
+    Parameters:
+    dtype_hints (list): Hints like ["CHROM=str", "POS=int64"], or None.
+
+    Returns:
+    dtype (dict): Column names mapped to dtypes, or None.
+    """
+    if not dtype_hints:
         return None
+    dtype = {}
+    for hint in dtype_hints:
+        column, sep, column_type = hint.partition("=")
+        if not sep or not column or not column_type:
+            raise ValueError(f"Invalid dtype hint '{hint}', expected COLUMN=TYPE.")
+        dtype[column] = column_type
+    return dtype
+
+
+def get_read_options(path, sep=None, dtype=None, passthrough=False):
+    """
+    Builds the pandas read options for an input file. The delimiter is sniffed unless given and
+    gzip/bgzip compression is detected from the file content. Columns are read as text unless
+    a dtype is given for them, so that their values are written back as they were and do not
+    depend on the types pandas would infer for the whole file or for each chunk, e.g. "5" is not
+    written as "5.0" because of a missing value elsewhere in the column. With passthrough,
+    missing values are kept as text as well.
+
+    Parameters:
+    path (str): Filename including path as provided by user.
+    sep (str): Delimiter. Sniffed from the file if not provided.
+    dtype (dict): Column names mapped to dtypes, for columns that should not be read as text.
+    passthrough (bool): "True" reads all columns as text without converting missing values.
+
+    Returns:
+    options (dict): Keyword arguments for pd.read_table().
+    """
+    options = {
+        "sep": sep or sniff_delimiter(path),
+        "compression": "gzip" if is_gzipped(path) else None,
+        "float_precision": "round_trip",
+    }
+    if passthrough:
+        options["dtype"] = str
+        options["keep_default_na"] = False
+    else:
+        options["dtype"] = defaultdict(lambda: str, dtype or {})
+    return options
+
+
+def clean_column_names(df):
+    """
+    Removes special characters from the column names of a dataframe.
+
+    Parameters:
+    df (pd.DataFrame): Input data.
+
+    Returns:
+    df (pd.DataFrame): Input data with cleaned column names.
+    """
+    df.columns = [re.sub(r"[^a-zA-Z0-9\_ ]", "", col) for col in df.columns]
+    return df
 
 
-def read_input_file(path):
+def read_input_file(path, sep=None, dtype=None, passthrough=False):
     """
     Reads input file provided by user by automatically detecting demlimiter.
-    Also ensures file is not empty.
+    Also ensures file is not empty. Delimited files are read with the C parser, with the options
+    of get_read_options(). Parquet, Feather and VCF files are read based on their file
+    extension, VCF files with all columns as text.
 
     Parameters:
     path (str): Filename including path as provided by user.
+    sep (str): Delimiter. Sniffed from the file if not provided.
+    dtype (dict): Column names mapped to dtypes, for columns that should not be read as text.
+    passthrough (bool): "True" reads all columns as text without converting missing values.
 
     Returns:
     df (pd.DataFrame): Input file as Pandas dataframe.
     """
     try:
-        df = pd.read_table(path, sep=None, engine="python")
-        df.columns = [re.sub(r"[^a-zA-Z0-9\_ ]", "", col) for col in df.columns]
+        ext = os.path.splitext(path.lower())[1]
+        if ext in COLUMNAR_EXTENSIONS or is_vcf_path(path):
+            if ext in COLUMNAR_EXTENSIONS:
+                import_pyarrow()
+                read = pd.read_parquet if ext == ".parquet" else pd.read_feather
+                df = clean_column_names(read(path))
+            else:
+                df = read_vcf(path, compression="gzip" if is_gzipped(path) else None)
+            if df.empty:
+                logger.error(f"Input file '{path}' is empty.")
+                return None
+            logger.info(f"Input file '{path}' read successfully.")
+            return df
+
+        df = pd.read_table(path, **get_read_options(path, sep, dtype, passthrough))
+        df = clean_column_names(df)
         if df.empty:
             logger.error(f"Input file '{path}' is empty.")
             return None
@@ -91,6 +361,66 @@ def read_input_file(path):
         return None
 
 
+def read_input_chunks(path, chunksize, sep=None, dtype=None, passthrough=False):
+    """
+    Reads input file provided by user in chunks of a fixed number of rows. The delimiter
+    is sniffed once, after which the fast C parser is used. VCF files are read with all columns
+    as text.
+
+    Parameters:
+    path (str): Filename including path as provided by user.
+    chunksize (int): Number of rows per chunk.
+    sep (str): Delimiter. Sniffed from the file if not provided.
+    dtype (dict): Column names mapped to dtypes, for columns that should not be read as text.
+    passthrough (bool): "True" reads all columns as text without converting missing values.
+
+    Returns:
+    chunks (generator): Generator of input file chunks as Pandas dataframes, or None.
+    """
+    try:
+        ext = os.path.splitext(path.lower())[1]
+        if ext in COLUMNAR_EXTENSIONS:
+            reader = read_columnar_chunks(path, ext, chunksize)
+            logger.info(f"Input file '{path}' opened for reading in chunks of {chunksize} rows.")
+            return (clean_column_names(chunk) for chunk in reader)
+        if is_vcf_path(path):
+            reader = read_vcf(path, chunksize, "gzip" if is_gzipped(path) else None)
+            logger.info(f"Input file '{path}' opened for reading in chunks of {chunksize} rows.")
+            return reader
+
+        options = get_read_options(path, sep, dtype, passthrough)
+        reader = pd.read_table(path, chunksize=chunksize, **options)
+        logger.info(f"Input file '{path}' opened for reading in chunks of {chunksize} rows.")
+        return (clean_column_names(chunk) for chunk in reader)
+    except Exception as e:
+        logger.error(f"An error has occured while reading the input file: {e}")
+        return None
+
+
+def read_columnar_chunks(path, ext, chunksize):
+    """
+    Reads a Parquet or Feather file in chunks of a fixed number of rows.
+
+    Parameters:
+    path (str): Filename including path as provided by user.
+    ext (str): File extension, ".parquet", ".feather" or ".arrow".
+    chunksize (int): Number of rows per chunk.
+
+    Returns:
+    chunks (generator): Generator of input file chunks as Pandas dataframes.
+    """
+    pa = import_pyarrow()
+    if ext == ".parquet":
+        batches = pa.parquet.ParquetFile(path).iter_batches(batch_size=chunksize)
+        return (batch.to_pandas() for batch in batches)
+
+    # Feather files are memory-mapped, so slicing them does not copy any data.
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return (
+        table.slice(start, chunksize).to_pandas() for start in range(0, table.num_rows, chunksize)
+    )
+
+
 def make_checks_rsid(input_data, rsid_col):
     """
     Checks if the rsID column specified has rsIDs in the correct format.
@@ -137,9 +467,86 @@ def make_checks_rsid(input_data, rsid_col):
         return False
 
 
+def parse_chrpos_parts(input_data, chr_col, pos_col):
+    """
+    Parses chromosome and position columns in one vectorized pass into canonical chromosomes,
+    i.e. without a "chr" prefix and with upper case X/Y, and positions without whitespace or a
+    trailing ".0". Also records why each invalid row is invalid.
+
+    Parameters:
+    input_data (pd.DataFrame): Input data.
+    chr_col (str): Name of the chr column as provided by user.
+    pos_col (str): Name of the pos column as provided by user.
+
+    Returns:
+    chromosomes (pd.Series): Canonical chromosomes, missing where invalid.
+    positions (pd.Series): Positions as digit strings, missing where invalid.
+    reasons (pd.Series): Reason each row is invalid, missing for valid rows.
+    """
+    chr_values = input_data[chr_col]
+    pos_values = input_data[pos_col]
+
+    # Chromosome columns only hold a handful of distinct values, so only those are parsed.
+    chr_codes, chr_uniques = pd.factorize(chr_values)
+    parsed_uniques = (
+        pd.Series(chr_uniques, dtype=object)
+        .astype(str)
+        .str.strip()
+        .str.extract(CHR_PATTERN, expand=False)
+        .str.upper()
+    )
+    # Missing chromosomes get code -1, which picks the appended None.
+    chromosomes = pd.Series(
+        np.append(parsed_uniques.to_numpy(dtype=object, na_value=None), None)[chr_codes],
+        index=input_data.index,
+        dtype=object,
+    ).where(chr_codes >= 0)
+
+    if pd.api.types.is_numeric_dtype(pos_values) and not pd.api.types.is_bool_dtype(pos_values):
+        valid_positions = pos_values.notna() & (pos_values >= 0) & (pos_values % 1 == 0)
+        positions = pos_values.where(valid_positions, 0).astype(np.int64).astype(str)
+        positions = positions.astype(object).where(valid_positions)
+    else:
+        positions = pos_values.astype(str).str.strip().str.replace(r"\.0*$", "", regex=True)
+        # Object dtype like the chromosomes, since text columns with the "str" dtype cannot be
+        # added to object columns.
+        positions = positions.astype(object).where(positions.str.fullmatch(r"\d+"))
+
+    reasons = pd.Series(
+        np.select(
+            [chr_values.isna(), chromosomes.isna(), pos_values.isna(), positions.isna()],
+            ["missing chromosome", "invalid chromosome", "missing position", "invalid position"],
+            default=None,
+        ),
+        index=input_data.index,
+        dtype=object,
+    )
+    return chromosomes, positions, reasons
+
+
+def parse_chrpos(input_data, chr_col, pos_col):
+    """
+    Parses chromosome and position columns into canonical "chr_pos" ids, see
+    parse_chrpos_parts().
+
+    Parameters:
+    input_data (pd.DataFrame): Input data.
+    chr_col (str): Name of the chr column as provided by user.
+    pos_col (str): Name of the pos column as provided by user.
+
+    Returns:
+    ids (pd.Series): "chr_pos" ids, missing for invalid rows.
+    reasons (pd.Series): Reason each row is invalid, missing for valid rows.
+    """
+    chromosomes, positions, reasons = parse_chrpos_parts(input_data, chr_col, pos_col)
+    ids = (chromosomes + "_" + positions).where(reasons.isna())
+    return ids, reasons
+
+
 def make_checks_chrpos(input_data, chr_col, pos_col):
     """
-    Checks if the chr and pos columns specified have correct format.
+    Checks if the chr and pos columns specified have correct format. The ids parsed on the way
+    are stored in the "new_ids" column, so create_ids_to_search() does not parse them again.
 
     Parameters:
     input_data (pd.DataFrame): Input data.
@@ -158,28 +565,29 @@ def make_checks_chrpos(input_data, chr_col, pos_col):
                 logger.error(f"Column '{col}' is empty.")
                 return False
 
-        chr_pattern = re.compile(r"(?i)\b(?:chr)?(1[0-9]?|2[0-2]?|[1-9]|X|Y)\b", re.IGNORECASE)
-        pos_pattern = re.compile(r"\d+")
+        input_data["new_ids"], reasons = parse_chrpos(input_data, chr_col, pos_col)
 
-        invalid_rows = input_data.apply(
-            lambda row: not (
-                chr_pattern.match(str(row[chr_col])) and pos_pattern.match(str(row[pos_col]))
-            ),
-            axis=1,
-        )
-
-        num_invalid = invalid_rows.sum()
+        invalid_reasons = reasons.dropna()
+        num_invalid = len(invalid_reasons)
         total_count = len(input_data)
 
         if num_invalid > 0:
+            first_invalid = input_data.loc[invalid_reasons.index[:5], [chr_col, pos_col]]
+            first_invalid = [
+                f"{chrom}:{pos} ({reason})"
+                for chrom, pos, reason in zip(
+                    first_invalid[chr_col], first_invalid[pos_col], invalid_reasons[:5], strict=True
+                )
+            ]
             logger.warning(
                 f"Some rows in chromosome column '{chr_col}' and position column '{pos_col}' do not match correct format. "
-                f"{num_invalid}/{total_count} invalid values. First few: {invalid_rows.head().tolist()}"
+                f"{num_invalid}/{total_count} invalid values: {invalid_reasons.value_counts().to_dict()}. "
+                f"First few: {first_invalid}"
             )
         if num_invalid == total_count:
             logger.error(
                 f"Values in chromosome column '{chr_col}' and position column '{pos_col}' do not match correct format. "
-                f"First few invalid values: {invalid_rows.head().tolist()}"
+                f"First few invalid values: {first_invalid}"
             )
             return False
         logger.info(
@@ -193,7 +601,9 @@ def make_checks_chrpos(input_data, chr_col, pos_col):
 
 def create_ids_to_search(input_data, colnames):
     """
-    Creates a list of ids that will be later used to query the SQL database.
+    Creates a list of ids that will be later used to query the SQL database. For chromosome and
+    position columns, the ids are canonical "chr_pos" strings from parse_chrpos(), kept in a
+    "new_ids" column. If make_checks_chrpos() already created that column it is reused.
 
     Parameters:
     input_data (pd.DataFrame): Input file provided by user as Pandas dataframe.
@@ -207,13 +617,8 @@ def create_ids_to_search(input_data, colnames):
             ids_to_search = input_data[colnames[0]].tolist()
             return ids_to_search
         else:
-            input_data["new_ids"] = (
-                input_data[colnames[0]]
-                .astype(str)
-                .str.extract(r"(?i)\b(?:chr)?(1[0-9]?|2[0-2]?|[1-9]|X|Y)\b", expand=False)
-                + "_"
-                + input_data[colnames[1]].astype(str)
-            )
+            if "new_ids" not in input_data.columns:
+                input_data["new_ids"], _reasons = parse_chrpos(input_data, colnames[0], colnames[1])
             ids_to_search = input_data["new_ids"].tolist()
             return input_data, ids_to_search
     except Exception as e:
@@ -221,7 +626,61 @@ def create_ids_to_search(input_data, colnames):
         return None
 
 
-def get_query(table_name, lookup_column, batch_size):
+def normalize_ids(ids_to_search, lookup_column):
+    """
+    Reduces the ids to look up to the unique ids that have a valid format for the lookup column.
+    Missing, invalid and repeated ids are dropped here, and the results are mapped back onto all
+    input rows when merging in cleanup_query_df(). Errors are raised rather than logged, since
+    every caller needs the ids to go on.
+
+    Parameters:
+    ids_to_search (list): The ids as returned by create_ids_to_search().
+    lookup_column (str): Name of column from GTEx table used for query.
+
+    Returns:
+    unique_ids (list): Unique, valid ids to look up.
+    """
+    id_patterns = {
+        "rsid_dbSNP155": r"rs\d+",
+        "chrpos37": r"(?:1[0-9]?|2[0-2]?|[1-9]|X|Y)_\d+",
+        "chrpos38": r"(?:1[0-9]?|2[0-2]?|[1-9]|X|Y)_\d+",
+    }
+    codes, unique_ids = pd.factorize(pd.Series(ids_to_search, dtype=object))
+    is_valid = pd.Series(unique_ids).astype(str).str.fullmatch(id_patterns[lookup_column])
+    is_valid = is_valid.to_numpy(dtype=bool)
+    unique_ids = pd.Series(unique_ids[is_valid]).astype(str).tolist()
+    # Repeated ids are answered by the lookup of their first occurrence.
+    valid_count = int(is_valid[codes[codes >= 0]].sum())
+    count_deduplicated("query_to_df", valid_count - len(unique_ids))
+
+    total_count = len(ids_to_search)
+    logger.info(
+        f"Looking up {len(unique_ids)} unique valid ids out of {total_count} input rows, "
+        f"saving {total_count - len(unique_ids)} database lookups."
+    )
+    return unique_ids
+
+
+def get_output_columns(lookup_column, exclude_ref_alt=False):
+    """
+    Returns the GTEx columns that cleanup_query_df() keeps for a lookup column.
+
+    Parameters:
+    lookup_column (str): Name of column from GTEx table used for query.
+    exclude_ref_alt (bool): "True" excludes ref and alt alleles from gtex database
+
+    Returns:
+    columns (list): Names of GTEx columns, starting with the lookup column.
+    """
+    columns = [lookup_column] + [
+        col for col in ["rsid_dbSNP155", "chrpos37", "chrpos38"] if col != lookup_column
+    ]
+    if not exclude_ref_alt:
+        columns += ["ref", "alt"]
+    return columns
+
+
+def get_query(table_name, lookup_column, batch_size, columns=None):
     """
     Dynamically generates SQL query based on user input. Also reduces SQL injection risk.
 
@@ -229,6 +688,7 @@ def get_query(table_name, lookup_column, batch_size):
     table_name (str): Name of GTEx database table.
     ids_to_search (list): The values from user input colnames converted to a list.
     lookup_column (str): Name of column from GTEx table to use for query.
+    columns (list): Names of GTEx columns to select. All columns are selected if not provided.
 
     Returns:
     query (str): A query string formatted to have same number of "?" as "ids_to_search", which can be dynamically replaced.
@@ -241,10 +701,14 @@ def get_query(table_name, lookup_column, batch_size):
             raise ValueError(f"Invalid table name: {table_name}")
         if lookup_column not in allowed_lookup_columns:
             raise ValueError(f"Invalid column name: {lookup_column}")
+        select_columns = validate_columns(columns)
 
+        # Ordering by the covering index columns is free when the index is used, and keeps the
+        # order of multiple records per id independent of the query plan.
         query = f"""
-        SELECT * FROM {table_name}
+        SELECT {select_columns} FROM {table_name}
         WHERE {lookup_column} IN ({", ".join(["?"] * batch_size)})
+        ORDER BY {", ".join(get_covered_columns(lookup_column))}
         """
         return query
     except Exception as e:
@@ -252,40 +716,263 @@ def get_query(table_name, lookup_column, batch_size):
         return None
 
 
-def query_to_df(table_name, ids_to_search, lookup_column, cur, batch_size):
+def validate_columns(columns):
+    """
+    Checks that the columns to select exist in the GTEx table and joins them for a query.
+
+    Parameters:
+    columns (list): Names of GTEx columns to select, or None for all columns.
+
+    Returns:
+    select_columns (str): Comma separated column names, or "*".
+    """
+    if columns is None:
+        return "*"
+    invalid_columns = set(columns) - set(GTEX_COLUMNS)
+    if invalid_columns:
+        raise ValueError(f"Invalid column names: {sorted(invalid_columns)}")
+    return ", ".join(columns)
+
+
+def get_join_query(table_name, lookup_column, columns=None):
+    """
+    Generates SQL query that joins the GTEx table against the temporary table of ids created by
+    query_to_df_temp_table().
+
+    Parameters:
+    table_name (str): Name of GTEx database table.
+    lookup_column (str): Name of column from GTEx table to use for query.
+    columns (list): Names of GTEx columns to select. All columns are selected if not provided.
+
+    Returns:
+    query (str): A query string joining the temporary "lookup_ids" table with the GTEx table.
+    """
+    try:
+        allowed_tables = {"GTEx_lookup"}
+        allowed_lookup_columns = {"rsid_dbSNP155", "chrpos37", "chrpos38"}
+
+        if table_name not in allowed_tables:
+            raise ValueError(f"Invalid table name: {table_name}")
+        if lookup_column not in allowed_lookup_columns:
+            raise ValueError(f"Invalid column name: {lookup_column}")
+        select_columns = validate_columns(columns)
+        if columns is not None:
+            select_columns = ", ".join(f"g.{col}" for col in columns)
+
+        # CROSS JOIN makes SQLite walk the ids in order and probe the lookup index for each, and
+        # ordering by k.id then keeps the result in index order without a sort.
+        other_columns = get_covered_columns(lookup_column)[1:]
+        query = f"""
+        SELECT {"g.*" if columns is None else select_columns} FROM lookup_ids AS k
+        CROSS JOIN {table_name} AS g ON g.{lookup_column} = k.id
+        ORDER BY k.id, {", ".join(f"g.{col}" for col in other_columns)}
+        """
+        return query
+    except Exception as e:
+        logger.error(f"Error encountered while running get_join_query() : {e}")
+        return None
+
+
+def fetch_columns(cur, block_size=100_000):
+    """
+    Fetches the result of an executed query column-wise in blocks, without building a Python
+    object per row.
+
+    Parameters:
+    cur: SQLite database cursor with an executed query.
+    block_size (int): Number of rows per fetchmany() call.
+
+    Returns:
+    pd.DataFrame: Query results.
+    """
+    columns = [desc[0] for desc in cur.description]
+    data = [[] for _ in columns]
+    while rows := cur.fetchmany(block_size):
+        for values, column_values in zip(data, zip(*rows, strict=True), strict=True):
+            values.extend(column_values)
+    if not data or not data[0]:
+        return pd.DataFrame(columns=columns, dtype=object)
+    return pd.DataFrame(dict(zip(columns, data, strict=True)), columns=columns)
+
+
+def query_to_df_temp_table(table_name, ids_to_search, lookup_column, cur, columns=None):
     """
-    Executes query in batches of 10,000 and returns a dataframe.
+    Bulk-inserts the unique ids into a temporary table and resolves them all with a single
+    indexed join, instead of one query per batch.
 
     Parameters:
     - table_name (str): Name of the database table.
-    - ids_to_search (list): List of values for the IN clause.
+    - ids_to_search (list): List of values to look up.
     - lookup_column (str): Column name to filter results.
     - cur: SQLite database cursor.
+    - columns (list): Names of GTEx columns to select. All columns are selected if not provided.
+
+    Returns:
+    - pd.DataFrame: Query results.
+    """
+    query = get_join_query(table_name, lookup_column, columns)
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_ids (id TEXT PRIMARY KEY) WITHOUT ROWID")
+    cur.execute("DELETE FROM lookup_ids")
+    try:
+        # Inserting in sorted order appends to the primary key b-tree instead of splitting pages.
+        unique_ids = sorted({str(id) for id in ids_to_search if pd.notna(id)})
+        cur.executemany("INSERT INTO lookup_ids (id) VALUES (?)", ((id,) for id in unique_ids))
+        cur.execute(query)
+        results = fetch_columns(cur)
+        logger.info(f"Processed {len(unique_ids)} unique entries...")
+        return results
+    finally:
+        cur.execute("DELETE FROM lookup_ids")
+
+
+def connect_read_only(db_path, mmap=False):
+    """
+    Opens a read-only connection to the GTEx database. The file is opened as immutable, so SQLite
+    skips all locking, and the connection may be used from other threads.
+
+    Parameters:
+    db_path (str): Path to the GTEx database.
+    mmap (bool): "True" memory-maps the whole file (up to SQLite's compile-time limit). Pages are
+        then read straight from the OS page cache instead of being copied into a page cache of
+        each connection, so many processes on one node share a single copy of the database.
+
+    Returns:
+    gtex_con : GTEx database file connection.
+    """
+    gtex_con = sqlite3.connect(
+        f"file:{quote(os.path.abspath(db_path))}?mode=ro&immutable=1",
+        uri=True,
+        check_same_thread=False,
+    )
+    if mmap:
+        gtex_con.execute(f"PRAGMA mmap_size = {os.path.getsize(db_path)}")
+    return gtex_con
+
+
+# Read-only connection of the current ReadOnlyConnectionPool worker process.
+worker_connection = None
+
+
+def init_lookup_worker(db_path, mmap):
+    """Opens the read-only database connection of a ReadOnlyConnectionPool worker process."""
+    global worker_connection
+    worker_connection = connect_read_only(db_path, mmap)
+
+
+def run_lookup_worker(table_name, ids_to_search, lookup_column, batch_size, strategy, columns):
+    """Runs query_to_df() in a ReadOnlyConnectionPool worker process."""
+    return query_to_df(
+        table_name,
+        ids_to_search,
+        lookup_column,
+        worker_connection.cursor(),
+        batch_size,
+        strategy,
+        columns,
+    )
+
+
+class ReadOnlyConnectionPool:
+    """
+    A pool of worker processes, each holding its own read-only connection to the GTEx database.
+    Lookups are split into one contiguous slice of ids per worker, and the results are
+    concatenated in slice order, so the output is the same as with a single connection.
+    """
+
+    def __init__(self, db_path, workers, mmap=False):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=init_lookup_worker, initargs=(db_path, mmap)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shuts down the worker processes, which closes their connections."""
+        self.executor.shutdown()
+
+    def query_to_df(self, table_name, ids_to_search, lookup_column, batch_size, strategy, columns):
+        """Runs query_to_df() on each slice of ids in parallel and concatenates the results."""
+        slice_size = -(-len(ids_to_search) // self.workers) or 1
+        slices = [
+            ids_to_search[i : i + slice_size] for i in range(0, len(ids_to_search), slice_size)
+        ]
+        futures = [
+            self.executor.submit(
+                run_lookup_worker, table_name, ids, lookup_column, batch_size, strategy, columns
+            )
+            for ids in slices
+        ]
+        results = [future.result() for future in futures]
+        if not results:
+            return pd.DataFrame(columns=columns, dtype=object)
+        if any(result is None for result in results):
+            return None
+        return pd.concat(results, ignore_index=True)
+
+
+def query_to_df(
+    table_name, ids_to_search, lookup_column, cur, batch_size, strategy="in-list", columns=None
+):
+    """
+    Executes query and returns a dataframe. With the "in-list" strategy ids are looked up in
+    batches of batch_size, with the "temp-table" strategy they are all resolved with one join.
+
+    Parameters:
+    - table_name (str): Name of the database table.
+    - ids_to_search (list): List of values for the IN clause.
+    - lookup_column (str): Column name to filter results.
+    - cur: SQLite database cursor, a ReadOnlyConnectionPool or a BinaryStore.
+    - batch_size (int): Number of ids per query for the "in-list" strategy.
+    - strategy (str): Either "in-list" or "temp-table".
+    - columns (list): Names of GTEx columns to select, e.g. from get_output_columns(). All columns
+      are selected if not provided.
 
     Returns:
     - pd.DataFrame: Query results.
     """
     try:
-        results = []
+        if isinstance(cur, BinaryStore):
+            return cur.query_to_df(ids_to_search, lookup_column, columns)
+        if isinstance(cur, ReadOnlyConnectionPool):
+            return cur.query_to_df(
+                table_name, ids_to_search, lookup_column, batch_size, strategy, columns
+            )
+        if strategy == "temp-table":
+            return query_to_df_temp_table(table_name, ids_to_search, lookup_column, cur, columns)
+
+        # Ids repeated across batches would otherwise return duplicate records.
+        ids_to_search = list(dict.fromkeys(id for id in ids_to_search if pd.notna(id)))
+        batches = []
+        progress = ProgressReporter("Looked up", len(ids_to_search), "ids")
         for i in range(0, len(ids_to_search), batch_size):
             batch = ids_to_search[i : i + batch_size]
-            query = get_query(table_name, lookup_column, len(batch))
+            query = get_query(table_name, lookup_column, len(batch), columns)
             cur.execute(query, batch)
-            columns = [desc[0] for desc in cur.description]
-            results.extend([dict(zip(columns, row, strict=False)) for row in cur.fetchall()])
-            logger.info(f"Processed entries {i + 1} to {i + len(batch)}...")
+            batches.append(fetch_columns(cur))
+            progress.update(len(batch))
+        logger.info(f"Processed {len(ids_to_search)} unique entries...")
 
-        return pd.DataFrame(results)
+        if not batches:
+            return pd.DataFrame(columns=columns, dtype=object)
+        return pd.concat(batches, ignore_index=True)
     except Exception as e:
         logger.error(f"Error in query_to_df(): {e}")
         return None
 
 
 def cleanup_query_df(
-    results_df, input_data, input_data_column, lookup_column, exclude_ref_alt=False
+    results_df, input_data, input_data_column, lookup_column, exclude_ref_alt=False, alleles=None
 ):
     """
-    Cleans up the query result df and merges it with input file.
+    Cleans up the query result df and merges it with input file. Like a left merge on the ids,
+    every input row is repeated once per matching GTEx record, in the order of the records. The
+    annotation columns are built from the query results alone and attached to the input data,
+    so that its columns are only copied if rows have to be repeated.
 
     Parameters:
     results_df (pd.Dataframe): Query result dataframe as returned by query_to_df()
@@ -293,49 +980,41 @@ def cleanup_query_df(
     input_data_column (str): Name of the column in the input data to use for merging dataframes.
     lookup_column (str): Name of column from GTEx table used for query.
     exclude_ref_alt (bool): "True" excludes ref and alt alleles from gtex database
+    alleles (list): Names of the input ref and alt allele columns. If given, rows are only
+        merged with the records matching their alleles, see match_alleles().
 
     Returns:
     final_df (pd.DataFrame): Merged final data in the form of a Pandas dataframe.
     """
     try:
-        if lookup_column == "rsid_dbSNP155":
-            results_df = split_and_drop_columns(results_df, "chrpos37", "chr37", "pos37")
-            results_df = split_and_drop_columns(results_df, "chrpos38", "chr38", "pos38")
-            if exclude_ref_alt:
-                results_df = results_df[["rsid_dbSNP155", "chr37", "pos37", "chr38", "pos38"]]
-            else:
-                results_df = results_df[
-                    ["rsid_dbSNP155", "chr37", "pos37", "chr38", "pos38", "ref", "alt"]
-                ]
-            final_df = pd.merge(
-                input_data,
-                results_df,
-                how="left",
-                left_on=input_data_column,
-                right_on=lookup_column,
-            ).drop(columns=lookup_column)
-            logger.info("Data cleaned and merged successfully.")
-            return final_df
-
-        elif lookup_column == "chrpos37":
-            results_df = split_and_drop_columns(results_df, "chrpos38", "chr38", "pos38")
-            if exclude_ref_alt:
-                results_df = results_df[["chrpos37", "rsid_dbSNP155", "chr38", "pos38"]]
-            else:
-                results_df = results_df[
-                    ["chrpos37", "rsid_dbSNP155", "chr38", "pos38", "ref", "alt"]
-                ]
-        elif lookup_column == "chrpos38":
-            results_df = split_and_drop_columns(results_df, "chrpos37", "chr37", "pos37")
-            if exclude_ref_alt:
-                results_df = results_df[["chrpos38", "rsid_dbSNP155", "chr37", "pos37"]]
-            else:
-                results_df = results_df[
-                    ["chrpos38", "rsid_dbSNP155", "chr37", "pos37", "ref", "alt"]
-                ]
-        final_df = pd.merge(
-            input_data, results_df, how="left", left_on=input_data_column, right_on=lookup_column
-        ).drop(columns=[lookup_column, input_data_column])
+        for col in ("chrpos37", "chrpos38"):
+            if col != lookup_column:
+                build = col[-2:]
+                results_df = split_and_drop_columns(results_df, col, f"chr{build}", f"pos{build}")
+
+        codes, uniques = pd.factorize(results_df[lookup_column])
+        counts = np.bincount(codes, minlength=len(uniques))
+        # Records grouped by id, in their original order within each id.
+        order = np.argsort(codes, kind="stable")
+        # Input ids without a match get -1, which picks the appended 0 count.
+        input_codes = pd.Index(uniques).get_indexer(input_data[input_data_column])
+        input_rows, result_rows = get_left_join_rows(
+            np.append(np.cumsum(counts) - counts, 0)[input_codes],
+            np.append(counts, 0)[input_codes],
+        )
+        if len(order):
+            result_rows = np.where(result_rows >= 0, order[result_rows], -1)
+
+        drop_columns = [input_data_column] if lookup_column != "rsid_dbSNP155" else []
+        final_df = attach_annotations(
+            input_data,
+            input_rows,
+            results_df,
+            result_rows,
+            get_annotation_columns(lookup_column, exclude_ref_alt),
+            drop_columns,
+            alleles,
+        )
         logger.info("Data cleaned and merged successfully.")
         return final_df
     except Exception as e:
@@ -343,23 +1022,218 @@ def cleanup_query_df(
         return None
 
 
+def get_annotation_columns(lookup_column, exclude_ref_alt=False):
+    """
+    Returns the columns that cleanup_query_df() adds to the input data for a lookup column, in
+    output order, with the "chr_pos" columns split into chromosome and position.
+
+    Parameters:
+    lookup_column (str): Name of column from GTEx table used for query.
+    exclude_ref_alt (bool): "True" excludes ref and alt alleles from gtex database
+
+    Returns:
+    columns (list): Names of the annotation columns.
+    """
+    columns = []
+    for col in get_output_columns(lookup_column, exclude_ref_alt)[1:]:
+        if col.startswith("chrpos"):
+            columns += [f"chr{col[-2:]}", f"pos{col[-2:]}"]
+        else:
+            columns.append(col)
+    return columns
+
+
+def get_left_join_rows(first_rows, counts):
+    """
+    Pairs input rows with result rows like a left merge: every input row is repeated once per
+    matching result row, or kept once if it has none.
+
+    Parameters:
+    first_rows (np.ndarray): Position of the first matching result row of each input row.
+    counts (np.ndarray): Number of consecutive matching result rows of each input row.
+
+    Returns:
+    input_rows (np.ndarray): Input row of each output row.
+    result_rows (np.ndarray): Result row of each output row, -1 for input rows without a match.
+    """
+    repeats = np.maximum(counts, 1)
+    input_rows = np.repeat(np.arange(len(counts)), repeats)
+    offsets = np.arange(len(input_rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    result_rows = np.where(
+        np.repeat(counts, repeats) > 0, np.repeat(first_rows, repeats) + offsets, -1
+    )
+    return input_rows, result_rows
+
+
+def attach_annotations(
+    input_data,
+    input_rows,
+    results_df,
+    result_rows,
+    annotation_columns,
+    drop_columns=(),
+    alleles=None,
+):
+    """
+    Adds annotation columns taken from the results to the input data. Input columns are not
+    copied unless input rows are repeated. Column names present in both get the suffixes "_x"
+    and "_y", like pd.merge().
+
+    Parameters:
+    input_data (pd.DataFrame): Input data.
+    input_rows (np.ndarray): Input row of each output row, see get_left_join_rows().
+    results_df (pd.DataFrame): Lookup results.
+    result_rows (np.ndarray): Result row of each output row, -1 for missing values.
+    annotation_columns (list): Names of the results columns to add.
+    drop_columns (list): Names of input columns to leave out.
+    alleles (list): Names of the input ref and alt allele columns. If given, only the records
+        matching the alleles are kept, see match_alleles(), and an "allele_match" column is
+        added.
+
+    Returns:
+    final_df (pd.DataFrame): Input data with the annotation columns. VCF data, see read_vcf(), is
+        indexed by the position of the input row of each row, so that the rows of one record can
+        be merged again when written as VCF. Other data gets a new RangeIndex.
+    """
+    if alleles:
+        input_rows, result_rows, allele_match = match_alleles(
+            input_data, input_rows, results_df, result_rows, *alleles
+        )
+    if len(input_rows) == len(input_data):
+        final_df = input_data.copy(deep=False)
+        final_df.index = pd.RangeIndex(len(final_df))
+    else:
+        final_df = input_data.take(input_rows)
+        is_vcf = "vcf_header" in input_data.attrs
+        final_df.index = pd.Index(input_rows) if is_vcf else pd.RangeIndex(len(final_df))
+    for col in drop_columns:
+        if col in final_df.columns:
+            del final_df[col]
+    clashes = set(annotation_columns).intersection(final_df.columns)
+    final_df.columns = [f"{col}_x" if col in clashes else col for col in final_df.columns]
+    for col in annotation_columns:
+        values = pd.api.extensions.take(results_df[col].array, result_rows, allow_fill=True)
+        final_df[f"{col}_y" if col in clashes else col] = values
+    if alleles:
+        final_df["allele_match"] = allele_match
+    return final_df
+
+
+# Allele classes of match_alleles(), from best to worst.
+ALLELE_MATCHES = ["exact", "swap", "flip", "flip_swap"]
+COMPLEMENT = str.maketrans("ACGTacgt", "TGCAtgca")
+
+
+def get_reverse_complement(alleles):
+    """Returns the alleles of a pd.Series on the opposite strand, e.g. "AGT" for "ACT"."""
+    return alleles.str.translate(COMPLEMENT).str[::-1]
+
+
+def match_alleles(input_data, input_rows, results_df, result_rows, ref_col, alt_col):
+    """
+    Keeps only the records whose alleles match the alleles of their input row, instead of one
+    output row per record at multi-allelic sites. Alleles match exactly, swapped (input ref is
+    the record's alt), on the opposite strand ("flip"), or both. Only the records of the best of
+    these classes are kept. Rows matching several records, or with palindromic alleles (A/T,
+    C/G) that only match swapped or flipped, are "ambiguous", since their strand cannot be
+    told. Rows without a matching record are kept once without annotations ("mismatch"). Rows
+    without alleles keep all records of their key.
+
+    Parameters:
+    input_data (pd.DataFrame): Input data.
+    input_rows (np.ndarray): Input row of each pair, see get_left_join_rows().
+    results_df (pd.DataFrame): Lookup results with "ref" and "alt" columns.
+    result_rows (np.ndarray): Result row of each pair, -1 for input rows without a record.
+    ref_col (str): Name of the input column with the reference (or effect) allele.
+    alt_col (str): Name of the input column with the alternate (or other) allele.
+
+    Returns:
+    input_rows (np.ndarray): Input row of each output row.
+    result_rows (np.ndarray): Result row of each output row, -1 for missing values.
+    allele_match (np.ndarray): Allele class of each output row, None without a record.
+    """
+    input_ref = input_data[ref_col].astype("string").str.strip().str.upper().array
+    input_alt = input_data[alt_col].astype("string").str.strip().str.upper().array
+    result_ref = results_df["ref"].astype("string").str.upper().array
+    result_alt = results_df["alt"].astype("string").str.upper().array
+    pairs = pd.DataFrame(
+        {
+            "in_ref": input_ref.take(input_rows),
+            "in_alt": input_alt.take(input_rows),
+            "ref": result_ref.take(result_rows, allow_fill=True),
+            "alt": result_alt.take(result_rows, allow_fill=True),
+        }
+    )
+    flip_ref = get_reverse_complement(pairs["in_ref"])
+    flip_alt = get_reverse_complement(pairs["in_alt"])
+    conditions = [
+        (pairs["in_ref"] == pairs["ref"]) & (pairs["in_alt"] == pairs["alt"]),
+        (pairs["in_ref"] == pairs["alt"]) & (pairs["in_alt"] == pairs["ref"]),
+        (flip_ref == pairs["ref"]) & (flip_alt == pairs["alt"]),
+        (flip_ref == pairs["alt"]) & (flip_alt == pairs["ref"]),
+    ]
+    mismatch = len(ALLELE_MATCHES)
+    classes = np.select(
+        [condition.fillna(False).to_numpy(dtype=bool) for condition in conditions],
+        range(mismatch),
+        default=mismatch,
+    )
+    has_alleles = (pairs["in_ref"].notna() & pairs["in_alt"].notna()).to_numpy(dtype=bool)
+    # Rows without a record (-2) or without alleles (-1) keep all their pairs.
+    classes = np.where(result_rows < 0, -2, np.where(has_alleles, classes, -1))
+
+    # Pairs of an input row are consecutive, so the best class of each row is a reduceat.
+    starts = np.flatnonzero(np.r_[True, input_rows[1:] != input_rows[:-1]])
+    best = np.minimum.reduceat(classes, starts) if len(classes) else classes
+    row_best = np.repeat(best, np.diff(np.r_[starts, len(classes)]))
+    keep = classes == row_best
+    # Rows without a matching record keep their first pair, without the record.
+    keep[row_best == mismatch] = False
+    keep[starts[best == mismatch]] = True
+    result_rows = np.where(row_best == mismatch, -1, result_rows)
+    input_rows, result_rows, classes = input_rows[keep], result_rows[keep], classes[keep]
+
+    in_ref = pd.Series(input_ref.take(input_rows))
+    in_alt = pd.Series(input_alt.take(input_rows))
+    palindromic = (in_ref == get_reverse_complement(in_alt)).fillna(False).to_numpy(dtype=bool)
+    records = np.bincount(input_rows, minlength=len(input_data))[input_rows]
+    matched = (classes >= 0) & (classes < mismatch)
+    ambiguous = matched & ((records > 1) | (palindromic & (classes > 0)))
+
+    # Classes -2 and -1 pick the last two labels.
+    labels = np.array([*ALLELE_MATCHES, "mismatch", "not found", "no alleles"], dtype=object)
+    row_labels = labels[classes]
+    row_labels[ambiguous] = "ambiguous"
+    first = np.r_[True, input_rows[1:] != input_rows[:-1]] if len(input_rows) else []
+    logger.info(
+        f"Allele matching of input rows: {pd.Series(row_labels[first]).value_counts().to_dict()}"
+    )
+    allele_match = np.where(classes >= 0, row_labels, None)
+    return input_rows, result_rows, allele_match
+
+
 def split_and_drop_columns(df, col_to_split, new_col_1, new_col_2):
     """
     Splits a column and returns 2 columns with provided names. Applicable to GTEx database.
 
     Parameters:
     df (pd.Dataframe): Pandas dataframe.
-    col_to_split (str): Name of column to be split into 2.
-    new_col_1 (str): Name of new column for 1st part of str.split().
-    new_col_2 (str): Name of new column for 2nd part of str.split().
+    col_to_split (str): Name of "chr_pos" column to be split into 2.
+    new_col_1 (str): Name of new column for the chromosome.
+    new_col_2 (str): Name of new column for the position, as nullable integers.
 
     Returns:
     df (pd.DataFrame): Returns dataframe with 2 new columns and dropped col_to_split.
     """
     try:
+        if new_col_1 in df.columns and new_col_2 in df.columns:
+            # Already split, e.g. by the binary store backend.
+            return df
         if col_to_split in df.columns:
-            df[[new_col_1, new_col_2]] = df[col_to_split].str.split("_", expand=True)
-            df.drop(columns=col_to_split, inplace=True)
+            chromosomes, positions = split_chrpos(df[col_to_split].tolist())
+            df = df.drop(columns=col_to_split)
+            df[new_col_1] = chromosomes
+            df[new_col_2] = positions
             return df
         else:
             logger.warning(f"Column {col_to_split} not found in results_df.")
@@ -368,37 +1242,187 @@ def split_and_drop_columns(df, col_to_split, new_col_1, new_col_2):
         return None
 
 
-def write_output_file(final_df, path):
+def split_chrpos(values):
+    """
+    Splits "chr_pos" strings like "7_127741848" into chromosomes and integer positions.
+
+    Parameters:
+    values (list): "chr_pos" strings.
+
+    Returns:
+    chromosomes (list or pd.Series): Chromosomes as strings.
+    positions (pd.arrays.IntegerArray): Positions as nullable integers, missing if invalid.
+    """
+    try:
+        # Fast path for well-formed values, falls back to pandas below on anything else.
+        parts = [value.partition("_") for value in values]
+        positions = np.fromiter(map(int, [pos for _, _, pos in parts]), np.int64, len(parts))
+        return [chrom for chrom, _, _ in parts], pd.array(positions, dtype="Int64")
+    except (AttributeError, TypeError, ValueError):
+        parts = pd.Series(values, dtype=object).str.partition("_").reindex(columns=[0, 1, 2])
+        positions = pd.to_numeric(parts[2], errors="coerce").astype("Int64")
+        return parts[0], positions.array
+
+
+def import_pyarrow():
+    """
+    Imports pyarrow, which is an optional dependency needed for Parquet and Feather files.
+
+    Returns:
+    pyarrow module, with the parquet and ipc submodules loaded.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Reading and writing Parquet and Feather files requires pyarrow. "
+            "Install it with 'pip install RSIDBuildTranslator[arrow]'."
+        ) from e
+    return pyarrow
+
+
+def get_file_format(path):
+    """
+    Determines the output file format from the file extension.
+
+    Parameters:
+    path (str): The file path as provided by the user.
+
+    Returns:
+    ext (str): File extension without compression suffix, e.g. ".tsv" or ".parquet".
+    compressed (bool): True if the extension ends with .gz or .bgz.
+    """
+    name = os.path.basename(path).lower()
+    compressed = name.endswith(COMPRESSED_EXTENSIONS)
+    if compressed:
+        name = os.path.splitext(name)[0]
+    ext = os.path.splitext(name)[1]
+    if ext in (*TEXT_EXTENSIONS, VCF_EXTENSION) or (ext in COLUMNAR_EXTENSIONS and not compressed):
+        return ext, compressed
+    if not ext:
+        raise ValueError(
+            f"Output file '{path}' does not have an extension.\n{SUPPORTED_EXTENSIONS_MESSAGE}"
+        )
+    raise ValueError(f"Unsupported file extension: '{ext}'\n{SUPPORTED_EXTENSIONS_MESSAGE}")
+
+
+class OutputWriter:
+    """
+    Writes dataframes to one output file, one after the other, in the format given by the file
+    extension. Text formats ending in .gz or .bgz are written as BGZF, compressed by several
+    threads. Parquet and Feather files are written with pyarrow, using the schema of the first
+    dataframe. Chunks read from one file may infer different column types, so with
+    text_columns=True all columns are stored as strings instead. VCF files are written with the
+    header of the input VCF file, given as vcf_header, see write_vcf_records().
+    """
+
+    def __init__(self, path, append=False, text_columns=False, vcf_header=None):
+        self.path = path
+        self.ext, self.compressed = get_file_format(path)
+        if append and (self.compressed or self.ext not in TEXT_EXTENSIONS):
+            raise ValueError(f"Cannot append to '{path}', only plain text files can be appended.")
+        if self.ext == VCF_EXTENSION and vcf_header is None:
+            raise ValueError(f"Cannot write '{path}' as VCF, the input file is not a VCF file.")
+
+        dir = os.path.dirname(path)
+        if dir and not os.path.isdir(dir):
+            logger.warning(f"Output file path '{dir}' does not exist.")
+            # Another writer may create the same directory at the same time.
+            os.makedirs(dir, exist_ok=True)
+            logger.info(f"Creating '{dir}' ...")
+
+        self.append = append
+        self.text_columns = text_columns
+        self.vcf_header = vcf_header
+        self.header = not append
+        self.handle = None
+        self.arrow_writer = None
+        self.schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def description(self):
+        """Describes the output format for log messages."""
+        if self.ext in COLUMNAR_EXTENSIONS:
+            return f"as {COLUMNAR_EXTENSIONS[self.ext]}"
+        if self.ext == VCF_EXTENSION:
+            return "as VCF" + (" (BGZF compressed)" if self.compressed else "")
+        delimiter = "tab" if TEXT_EXTENSIONS[self.ext] == "\t" else "commas"
+        return f"with {delimiter} as delimiter" + (" (BGZF compressed)" if self.compressed else "")
+
+    def write(self, df):
+        """Writes a dataframe to the output file."""
+        with profile_stage("write", len(df)):
+            if self.ext in (*TEXT_EXTENSIONS, VCF_EXTENSION):
+                if self.handle is None:
+                    if self.compressed:
+                        self.handle = open_bgzf_text(self.path)
+                    else:
+                        # Kept open across chunks and closed by close().
+                        self.handle = open(self.path, "a" if self.append else "w", newline="")  # noqa: SIM115
+                if self.ext == VCF_EXTENSION:
+                    if self.header:
+                        write_vcf_header(self.handle, self.vcf_header, df.columns)
+                        self.header = False
+                    write_vcf_records(self.handle, df, self.vcf_header)
+                    return
+                df.to_csv(
+                    self.handle, sep=TEXT_EXTENSIONS[self.ext], index=False, header=self.header
+                )
+                self.header = False
+                return
+
+            pa = import_pyarrow()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.arrow_writer is None:
+                # Columns without any values in the first dataframe are stored as strings.
+                self.schema = pa.schema(
+                    [
+                        field.with_type(pa.string())
+                        if self.text_columns or pa.types.is_null(field.type)
+                        else field
+                        for field in table.schema
+                    ]
+                ).remove_metadata()
+                if self.ext == ".parquet":
+                    self.arrow_writer = pa.parquet.ParquetWriter(self.path, self.schema)
+                else:
+                    self.arrow_writer = pa.ipc.new_file(self.path, self.schema)
+            self.arrow_writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        """Closes the output file."""
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+        if self.arrow_writer is not None:
+            self.arrow_writer.close()
+            self.arrow_writer = None
+
+
+def write_output_file(final_df, path, append=False, vcf_header=None):
     """
     Writes the final data to a file with the appropriate format based on the file extension.
 
     Parameters:
     final_df (pd.DataFrame): The DataFrame to be written to the file.
     path (str): The file path as provided by the user.
+    append (bool): "True" appends to an existing text file without writing the header.
+    vcf_header (list): Header lines of the input VCF file, needed to write VCF files.
 
     Returns:
     None
     """
     try:
-        dir, file = os.path.split(path)
-        _filename, ext = os.path.splitext(file)
-        if dir and not os.path.isdir(dir):
-            logger.warning(f"Output file path '{dir}' does not exist.")
-            os.makedirs(dir)
-            logger.info(f"Creating '{dir}' ...")
-        if not ext:
-            logger.error(
-                f"Output file '{path}' does not have an extension.\nSupported extensions are .txt, .tsv, and .csv"
-            )
-        elif ext in [".txt", ".tsv"]:
-            final_df.to_csv(path, sep="\t", index=False)
-            logger.info(f"Output file successfully written to '{path}' with tab as delimiter.")
-        elif ext == ".csv":
-            final_df.to_csv(path, index=False)
-            logger.info(f"Output file successfully written to '{path}' with commas as delimiter.")
-        else:
-            logger.error(
-                f"Unsupported file extension: '{ext}'\nSupported extensions are .txt, .tsv, and .csv"
-            )
+        with OutputWriter(path, append, vcf_header=vcf_header) as writer:
+            writer.write(final_df)
+        logger.info(f"Output file successfully written to '{path}' {writer.description}.")
     except Exception as e:
         logger.error(f"An error occurred while writing the output file: {e}")
@@ -0,0 +1,184 @@
+import csv
+import gzip
+
+import numpy as np
+import pandas as pd
+
+VCF_EXTENSION = ".vcf"
+# Rows per chunk when a VCF file is annotated without --chunksize, so it is always streamed.
+VCF_CHUNKSIZE = 100_000
+# Fixed columns of a VCF file, the first 8 of the "#CHROM" header line.
+VCF_COLUMNS = ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"]
+# INFO fields written for annotation columns: name, type and description.
+INFO_FIELDS = {
+    "chr37": ("CHR37", "String", "Chromosome in GRCh37 (hg19)"),
+    "pos37": ("POS37", "Integer", "Position in GRCh37 (hg19)"),
+    "chr38": ("CHR38", "String", "Chromosome in GRCh38 (hg38)"),
+    "pos38": ("POS38", "Integer", "Position in GRCh38 (hg38)"),
+    "ref": ("GTEX_REF", "String", "Reference allele of the GTEx lookup table"),
+    "alt": ("GTEX_ALT", "String", "Alternate allele of the GTEx lookup table"),
+    "allele_match": ("ALLELE_MATCH", "String", "Match of REF and ALT to the GTEx alleles"),
+}
+
+
+def is_vcf_path(path):
+    """Returns True if a file name ends with .vcf, optionally followed by .gz or .bgz."""
+    name = str(path).lower()
+    for suffix in (".gz", ".bgz"):
+        name = name.removesuffix(suffix)
+    return name.endswith(VCF_EXTENSION)
+
+
+def read_vcf_header(path, compression=None):
+    """
+    Reads the header of a VCF file, i.e. the "##" meta-information lines and the "#CHROM" line.
+
+    Parameters:
+    path (str): VCF file path.
+    compression (str): "gzip" for gzip or bgzip compressed files, or None.
+
+    Returns:
+    header (list): Header lines without line endings, ending with the "#CHROM" line.
+    """
+    opener = gzip.open if compression == "gzip" else open
+    header = []
+    with opener(path, "rt", newline="") as f:
+        for line in f:
+            header.append(line.rstrip("\r\n"))
+            if not line.startswith("##"):
+                break
+    columns = header[-1].split("\t") if header else []
+    if [col.lstrip("#") for col in columns[:8]] != VCF_COLUMNS or not columns[0].startswith("#"):
+        raise ValueError(f"'{path}' is not a VCF file, its header has no '#CHROM' line.")
+    return header
+
+
+def read_vcf(path, chunksize=None, compression=None):
+    """
+    Reads the records of a VCF file with all columns as text, so they are written back exactly
+    as they were. The header lines are stored in the "vcf_header" entry of the attrs of every
+    dataframe, for writing the records back as VCF with write_vcf_header().
+
+    Parameters:
+    path (str): VCF file path.
+    chunksize (int): Number of records per chunk, or None to read all records at once.
+    compression (str): "gzip" for gzip or bgzip compressed files, or None.
+
+    Returns:
+    pd.DataFrame, or a generator of them if chunksize is set.
+    """
+    header = read_vcf_header(path, compression)
+    reader = pd.read_table(
+        path,
+        sep="\t",
+        skiprows=len(header),
+        header=None,
+        names=[col.lstrip("#") for col in header[-1].split("\t")],
+        dtype=str,
+        keep_default_na=False,
+        quoting=csv.QUOTE_NONE,
+        compression=compression,
+        chunksize=chunksize,
+    )
+    if chunksize is None:
+        reader.attrs["vcf_header"] = header
+        return reader
+    return (set_vcf_header(chunk, header) for chunk in reader)
+
+
+def set_vcf_header(df, header):
+    """Stores the VCF header lines in the attrs of a dataframe and returns it."""
+    df.attrs["vcf_header"] = header
+    return df
+
+
+def write_vcf_header(handle, header, columns):
+    """
+    Writes the header of the output VCF file, with an INFO line for every annotation column
+    that get_vcf_records() moves into the INFO column.
+
+    Parameters:
+    handle: Text file handle.
+    header (list): Header lines of the input VCF file, see read_vcf_header().
+    columns (list): Columns of the annotated data.
+    """
+    defined = {line.split(",", 1)[0] for line in header if line.startswith("##INFO=<ID=")}
+    info_lines = [
+        f'##INFO=<ID={name},Number=.,Type={info_type},Description="{description}">'
+        for col, (name, info_type, description) in INFO_FIELDS.items()
+        if col in columns and f"##INFO=<ID={name}" not in defined
+    ]
+    handle.write("\n".join([*header[:-1], *info_lines, header[-1]]) + "\n")
+
+
+def join_unique(values, sep):
+    """Joins the distinct values of a group that are not missing, or returns None."""
+    values = dict.fromkeys(str(value) for value in values if not pd.isna(value))
+    return sep.join(values) if values else None
+
+
+def get_vcf_records(final_df, header):
+    """
+    Turns annotated data back into VCF records. Matched rsIDs replace the ID of a record, and
+    the other annotation columns are added to its INFO column, see INFO_FIELDS. Rows repeated
+    for several GTEx records are merged into one record again, with their rsIDs separated by
+    ";" and the distinct values of an INFO field by ",", as the VCF format specifies.
+
+    Parameters:
+    final_df (pd.DataFrame): Annotated data, starting with the columns of the input VCF file and
+        indexed by input row, see attach_annotations().
+    header (list): Header lines of the input VCF file, see read_vcf_header().
+
+    Returns:
+    records (pd.DataFrame): VCF records with the columns of the input VCF file.
+    """
+    records = final_df.iloc[:, : len(header[-1].split("\t"))]
+    annotations = {
+        col: final_df[col] for col in ["rsid_dbSNP155", *INFO_FIELDS] if col in final_df.columns
+    }
+    # Rows of one input record are consecutive and share its input row. Adjacent input records
+    # may have the same fixed columns, so these are not compared.
+    input_rows = final_df.index.to_numpy()
+    new_record = np.r_[True, input_rows[1:] != input_rows[:-1]]
+    if not new_record.all():
+        groups = new_record.cumsum()
+        records = records[new_record]
+        annotations = {
+            col: values.groupby(groups, sort=False)
+            .agg(join_unique, sep=";" if col == "rsid_dbSNP155" else ",")
+            .set_axis(records.index)
+            for col, values in annotations.items()
+        }
+    records = records.copy()
+    id_col, info_col = records.columns[2], records.columns[7]
+
+    if "rsid_dbSNP155" in annotations:
+        rsids = annotations.pop("rsid_dbSNP155").astype("string")
+        records[id_col] = rsids.fillna(records[id_col])
+    added = pd.Series("", index=records.index, dtype="string")
+    for col, values in annotations.items():
+        values = values.astype("string")
+        added = added + (f";{INFO_FIELDS[col][0]}=" + values).fillna("")
+    added = added.str[1:]
+    info = records[info_col].astype("string")
+    records[info_col] = info.where(
+        added == "", added.where(info.isin([".", ""]), info + ";" + added)
+    )
+    return records
+
+
+def write_vcf_records(handle, final_df, header):
+    """
+    Writes annotated data as VCF records, see get_vcf_records().
+
+    Parameters:
+    handle: Text file handle.
+    final_df (pd.DataFrame): Annotated data, starting with the columns of the input VCF file.
+    header (list): Header lines of the input VCF file, see read_vcf_header().
+    """
+    records = get_vcf_records(final_df, header)
+    if records.empty:
+        return
+    columns = [records[col].astype("string").fillna(".") for col in records.columns]
+    lines = columns[0].str.cat(columns[1:], sep="\t")
+    handle.write("\n".join(lines) + "\n")
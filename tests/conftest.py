@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import pytest
+
+from RSIDBuildTranslator import utils
+from RSIDBuildTranslator.db import prepare_gtex_db
+
+GTEX_ROWS = [
+    ("rs116944008", "7_127381902", "7_127741848", "C", "T"),
+    ("rs17151229", "7_127382155", "7_127742101", "G", "C"),
+    ("rs75008380", "7_127382169", "7_127742115", "A", "G"),
+    ("rs6467145", "7_127382265", "7_127742211", "G", "A"),
+    ("rs17151241", "7_127382743", "7_127742689", "A", "G"),
+    ("rs117086422", "1_845635", "1_910255", "C", "T"),
+    ("rs57760052", "1_845938", "1_910558", "G", "A"),
+    ("rs28612348", "1_846078", "1_910698", "C", "T"),
+    ("rs3131972", "1_752721", "1_817341", "A", "G"),
+    ("rs3131972", "1_752721", "1_817341", "A", "C"),
+    ("rs5939319", "X_2700157", "X_2782116", "G", "A"),
+]
+
+SUMSTATS = """ID\tCHROM\tPOS\tA1\tBETA\tP
+rs116944008\t7\t127741848\tT\t-0.0243852\t0.643348
+rs17151229\t7\t127742101\tC\t0.000517255\t0.97631
+rs000000001\t7\t1\tA\t0.1\t0.5
+rs75008380\t7\t127742115\tG\t0.0197173\t0.559175
+rs3131972\t1\t817341\tA\t0.05\t1e-08
+rs6467145\t7\t127742211\tG\t0.0343268\t0.0417584
+rs5939319\tX\t2782116\tA\t-0.2\t0.003
+rs116944008\t7\t127741848\tT\t-0.0243852\t0.643348
+"""
+
+
+@pytest.fixture
+def unprepared_gtex_db(tmp_path, monkeypatch):
+    """A small GTEx_lookup database without indexes, used in place of the downloaded one."""
+    db_path = tmp_path / "GTEx_v10.db"
+    con = sqlite3.connect(db_path)
+    con.execute(
+        "CREATE TABLE GTEx_lookup "
+        "(rsid_dbSNP155 TEXT, chrpos37 TEXT, chrpos38 TEXT, ref TEXT, alt TEXT)"
+    )
+    con.executemany("INSERT INTO GTEx_lookup VALUES (?, ?, ?, ?, ?)", GTEX_ROWS)
+    con.commit()
+    con.close()
+    monkeypatch.setattr(utils, "get_local_db_path", lambda: str(db_path))
+    return str(db_path)
+
+
+@pytest.fixture
+def gtex_db(unprepared_gtex_db):
+    """A small prepared GTEx_lookup database used in place of the downloaded one."""
+    con = sqlite3.connect(unprepared_gtex_db)
+    prepare_gtex_db(con)
+    con.close()
+    return unprepared_gtex_db
+
+
+@pytest.fixture
+def sumstats_file(tmp_path):
+    """A small tab-delimited summary statistics file."""
+    path = tmp_path / "sumstats.txt"
+    path.write_text(SUMSTATS)
+    return str(path)
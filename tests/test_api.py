@@ -0,0 +1,54 @@
+from io import StringIO
+
+import pandas as pd
+import pytest
+
+from RSIDBuildTranslator import Translator
+from RSIDBuildTranslator.utils import read_input_file
+
+from .conftest import SUMSTATS
+from .test_modes import MODE_ARGS, run_mode
+
+
+@pytest.mark.parametrize(
+    "mode, columns",
+    [("rsid", "ID"), ("chrpos38", ["CHROM", "POS"]), ("chrpos37", ["CHROM", "POS"])],
+)
+def test_annotate_matches_cli(gtex_db, sumstats_file, tmp_path, mode, columns):
+    mode_module, mode_args = next(args for args in MODE_ARGS if args[1][0] == mode)
+    expected = run_mode(mode_module, mode_args, sumstats_file, tmp_path / "out.tsv")
+    df = read_input_file(sumstats_file)
+    original = df.copy()
+
+    with Translator() as translator:
+        annotated = translator.annotate(df, mode=mode, columns=columns)
+        # The same handle can be used again.
+        again = translator.annotate(df, mode=mode, columns=columns)
+
+    assert annotated.to_csv(sep="\t", index=False).encode() == expected
+    pd.testing.assert_frame_equal(again, annotated)
+    pd.testing.assert_frame_equal(df, original)
+
+
+def test_annotate_arrow_table(gtex_db):
+    pa = pytest.importorskip("pyarrow")
+    df = pd.read_csv(StringIO(SUMSTATS), sep="\t")
+
+    with Translator() as translator:
+        annotated = translator.annotate(pa.Table.from_pandas(df), mode="rsid", columns="ID")
+        expected = translator.annotate(df, mode="rsid", columns="ID")
+
+    assert isinstance(annotated, pa.Table)
+    pd.testing.assert_frame_equal(annotated.to_pandas(), expected)
+
+
+def test_annotate_invalid_input(gtex_db):
+    df = pd.read_csv(StringIO(SUMSTATS), sep="\t")
+
+    with Translator() as translator:
+        with pytest.raises(ValueError, match="Unknown mode"):
+            translator.annotate(df, mode="chrpos19", columns=["CHROM", "POS"])
+        with pytest.raises(ValueError, match="needs 2 input column"):
+            translator.annotate(df, mode="chrpos38", columns="CHROM")
+        with pytest.raises(ValueError, match="did not pass the checks"):
+            translator.annotate(df, mode="rsid", columns="CHROM")
@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+from RSIDBuildTranslator.binary_store import build_binary_store, load_binary_store
+from RSIDBuildTranslator.main import main
+from RSIDBuildTranslator.utils import get_local_store_path
+
+from .test_modes import MODE_ARGS, run_mode
+
+# Records whose ids and chromosomes do not fit the integer keys of the store.
+UNUSUAL_ROWS = [
+    (None, "7_127741848", "MT_100", "A", "G"),
+    ("rs012", "MT_150", "7_127742101", "C", "T"),
+    ("esv1", "chr5_2", "7_1", "A", "G"),
+    ("", "1_817341", "", "A", "T"),
+    ("rs5939319", "X_2782116", "X_02782116", "G", "T"),
+    ("rs17151229", "7_127742101", None, "C", "A"),
+]
+
+
+@pytest.fixture
+def binary_store(gtex_db):
+    con = sqlite3.connect(gtex_db)
+    assert build_binary_store(con, get_local_store_path(), chunk_rows=4)
+    con.close()
+    return load_binary_store(get_local_store_path())
+
+
+@pytest.fixture
+def unusual_gtex_db(gtex_db):
+    con = sqlite3.connect(gtex_db)
+    con.executemany("INSERT INTO GTEx_lookup VALUES (?, ?, ?, ?, ?)", UNUSUAL_ROWS)
+    con.commit()
+    con.close()
+    return gtex_db
+
+
+def test_binary_store_lookup(binary_store):
+    results = binary_store.query_to_df(
+        ["7_127741848", "1_817341", "X_2782116", "7_1", None, "junk", "7_127741848"], "chrpos38"
+    )
+
+    assert results["chrpos38"].tolist() == ["1_817341", "1_817341", "7_127741848", "X_2782116"]
+    assert results["rsid_dbSNP155"].tolist() == [
+        "rs3131972",
+        "rs3131972",
+        "rs116944008",
+        "rs5939319",
+    ]
+    assert results["chr37"].tolist() == ["1", "1", "7", "X"]
+    assert results["pos37"].tolist() == [752721, 752721, 127381902, 2700157]
+    assert results["alt"].tolist() == ["C", "G", "T", "A"]
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+def test_binary_backend_matches_sqlite(
+    gtex_db, sumstats_file, tmp_path, mode, mode_args, monkeypatch
+):
+    monkeypatch.setattr("sys.argv", ["RSIDBuildTranslator", "db", "build-store"])
+    main()
+
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "sqlite.txt")
+    binary = run_mode(
+        mode, mode_args, sumstats_file, tmp_path / "binary.txt", "--backend", "binary"
+    )
+
+    assert binary == expected
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS[1:])
+def test_binary_backend_sorted(binary_store, sumstats_file, tmp_path, mode, mode_args):
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "sqlite.txt")
+    merged = run_mode(
+        mode, mode_args, sumstats_file, tmp_path / "binary.txt", "--backend", "binary", "--sorted"
+    )
+
+    assert merged == expected
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+def test_binary_backend_keeps_unusual_records(
+    unusual_gtex_db, sumstats_file, tmp_path, mode, mode_args, monkeypatch
+):
+    monkeypatch.setattr("sys.argv", ["RSIDBuildTranslator", "db", "build-store"])
+    main()
+
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "sqlite.txt")
+    binary = run_mode(
+        mode, mode_args, sumstats_file, tmp_path / "binary.txt", "--backend", "binary"
+    )
+
+    assert binary == expected
+
+
+def test_binary_store_lookup_exact_ids(unusual_gtex_db):
+    con = sqlite3.connect(unusual_gtex_db)
+    assert build_binary_store(con, get_local_store_path(), chunk_rows=4)
+    con.close()
+    binary_store = load_binary_store(get_local_store_path())
+
+    rsids = binary_store.query_to_df(["rs12", "rs012", "esv1"], "rsid_dbSNP155")
+    assert rsids["rsid_dbSNP155"].tolist() == ["rs012", "esv1"]
+    assert rsids["chr37"].tolist() == ["MT", "chr5"]
+
+    results = binary_store.query_to_df(["5_2", "chr5_2", "X_2782116", "X_02782116"], "chrpos38")
+    assert results["chrpos38"].tolist() == ["X_2782116", "X_02782116"]
+    assert results["rsid_dbSNP155"].tolist() == ["rs5939319", "rs5939319"]
+    assert results["pos38"].tolist() == [2782116, 2782116]
+
+    results = binary_store.query_to_df(["5_2", "chr5_2", "7_127741848"], "chrpos37")
+    assert results["chrpos37"].tolist() == ["7_127741848", "chr5_2"]
+    assert results["rsid_dbSNP155"].fillna("").tolist() == ["", "esv1"]
+    assert results["chr38"].tolist() == ["MT", "7"]
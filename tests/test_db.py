@@ -0,0 +1,64 @@
+import logging
+import sqlite3
+
+from RSIDBuildTranslator import utils
+from RSIDBuildTranslator.cli import create_parser
+from RSIDBuildTranslator.db import LOOKUP_COLUMNS, get_metadata, has_lookup_index
+from RSIDBuildTranslator.main import main
+from RSIDBuildTranslator.modes import mode_rsid
+from RSIDBuildTranslator.utils import connect_read_only
+
+
+def test_db_prepare_creates_covering_indexes(unprepared_gtex_db, monkeypatch):
+    con = sqlite3.connect(unprepared_gtex_db)
+    assert not any(has_lookup_index(con, col) for col in LOOKUP_COLUMNS)
+
+    monkeypatch.setattr("sys.argv", ["RSIDBuildTranslator", "db", "prepare"])
+    main()
+
+    assert all(has_lookup_index(con, col) for col in LOOKUP_COLUMNS)
+    metadata = get_metadata(con)
+    assert all(metadata[f"index_{col}"] == "ok" for col in LOOKUP_COLUMNS)
+    for col in LOOKUP_COLUMNS:
+        plan = con.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM GTEx_lookup WHERE {col} IN (?, ?)", ["a", "b"]
+        ).fetchall()
+        assert "COVERING INDEX" in plan[0][-1]
+
+
+def test_mode_prepares_database_without_indexes(unprepared_gtex_db, sumstats_file, tmp_path):
+    output_path = tmp_path / "out.txt"
+    args = create_parser().parse_args(
+        ["rsid", "-i", sumstats_file, "-o", str(output_path), "-rs", "ID"]
+    )
+    mode_rsid.run(args)
+
+    con = sqlite3.connect(unprepared_gtex_db)
+    assert all(has_lookup_index(con, col) for col in LOOKUP_COLUMNS)
+    con.close()
+    assert len(output_path.read_text().splitlines()) == 10
+
+
+def test_mode_runs_without_indexes_if_not_prepared(
+    unprepared_gtex_db, sumstats_file, tmp_path, monkeypatch, caplog
+):
+    monkeypatch.setattr(utils, "prepare_gtex_db", lambda gtex_con: False)
+    output_path = tmp_path / "out.txt"
+    args = create_parser().parse_args(
+        ["rsid", "-i", sumstats_file, "-o", str(output_path), "-rs", "ID"]
+    )
+    mode_rsid.run(args)
+
+    assert "has no index on 'rsid_dbSNP155'" in caplog.text
+    assert len(output_path.read_text().splitlines()) == 10
+
+
+def test_db_warm_and_mmap_connection(gtex_db, monkeypatch, caplog):
+    monkeypatch.setattr("sys.argv", ["RSIDBuildTranslator", "db", "warm"])
+    with caplog.at_level(logging.INFO):
+        main()
+    assert "into the page cache" in caplog.text
+
+    con = connect_read_only(gtex_db, mmap=True)
+    assert con.execute("PRAGMA mmap_size").fetchone()[0] > 0
+    con.close()
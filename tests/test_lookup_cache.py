@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from RSIDBuildTranslator import api
+from RSIDBuildTranslator.lookup_cache import LookupResultCache
+from RSIDBuildTranslator.provision import DATA_DIR_VARIABLE
+
+from .test_modes import MODE_ARGS, run_mode
+
+COLUMNS = ["rsid_dbSNP155", "chrpos37", "chrpos38", "ref", "alt"]
+
+
+def query_records(ids):
+    """Stands in for the database, with two records for even ids and none for odd ones."""
+    rows = [(id, f"1_{id[2:]}", f"1_{id[2:]}", "A", alt) for id in ids for alt in "CG"]
+    return pd.DataFrame([row for row in rows if int(row[0][2:]) % 2 == 0], columns=COLUMNS)
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+def test_cached_run_skips_database(gtex_db, sumstats_file, tmp_path, monkeypatch, mode, mode_args):
+    monkeypatch.setenv(DATA_DIR_VARIABLE, str(tmp_path / "data"))
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "expected.txt")
+    first = run_mode(mode, mode_args, sumstats_file, tmp_path / "first.txt", "--lookup-cache")
+
+    def fail(*args):
+        raise AssertionError("All ids should be answered by the lookup cache.")
+
+    with monkeypatch.context() as m:
+        m.setattr(api, "query_to_df", fail)
+        cached = run_mode(
+            mode,
+            mode_args,
+            sumstats_file,
+            tmp_path / "c.txt",
+            "--lookup-cache",
+            "--exclude-ref-alt",
+        )
+    uncached = run_mode(mode, mode_args, sumstats_file, tmp_path / "u.txt", "--exclude-ref-alt")
+
+    assert first == expected
+    assert cached == uncached
+
+
+def test_cache_keeps_records_per_version(tmp_path):
+    cache = LookupResultCache(str(tmp_path / "cache.db"))
+    ids = ["rs1", "rs2", "rs4"]
+    first = cache.lookup("v1/rsid_dbSNP155", ids, COLUMNS, query_records)
+    again = cache.lookup("v1/rsid_dbSNP155", ids[::-1], COLUMNS, pytest.fail)
+    other_version = cache.lookup("v2/rsid_dbSNP155", ids, COLUMNS, query_records)
+    cache.close()
+
+    pd.testing.assert_frame_equal(again, first)
+    pd.testing.assert_frame_equal(other_version, first)
+    assert first["alt"].tolist() == ["C", "G", "C", "G"]
+
+
+def test_concurrent_misses_store_records_once(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache, other = LookupResultCache(path), LookupResultCache(path)
+
+    def query_during_other_run(ids):
+        # Another run misses the same ids before this one has added them.
+        other.lookup("v1/rsid_dbSNP155", ids, COLUMNS, query_records)
+        return query_records(ids)
+
+    cache.lookup("v1/rsid_dbSNP155", ["rs2", "rs4"], COLUMNS, query_during_other_run)
+    results = cache.lookup("v1/rsid_dbSNP155", ["rs2", "rs4"], COLUMNS, pytest.fail)
+    records = cache.con.execute("SELECT COUNT(*) FROM cache_records").fetchone()[0]
+    cache.close()
+    other.close()
+
+    assert records == 4
+    assert results["alt"].tolist() == ["C", "G", "C", "G"]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = LookupResultCache(str(tmp_path / "cache.db"), max_keys=10)
+    cache.lookup("v1/rsid_dbSNP155", ["rs0"], COLUMNS, query_records)
+    for i in range(1, 20):
+        # Keeps rs0 recently used.
+        cache.lookup("v1/rsid_dbSNP155", ["rs0", f"rs{i}"], COLUMNS, query_records)
+
+    keys = [row[0] for row in cache.con.execute("SELECT key FROM cache_keys")]
+    records = cache.con.execute("SELECT COUNT(*) FROM cache_records").fetchone()[0]
+    cache.close()
+    assert len(keys) <= 10
+    assert "rs0" in keys and "rs19" in keys and "rs1" not in keys
+    assert records == 2 * sum(int(key[2:]) % 2 == 0 for key in keys)
@@ -0,0 +1,336 @@
+import gzip
+from io import BytesIO, StringIO
+
+import pandas as pd
+import pytest
+
+from RSIDBuildTranslator import merge_join
+from RSIDBuildTranslator.cli import create_parser
+from RSIDBuildTranslator.modes import (
+    mode_auto,
+    mode_batch,
+    mode_chrpos37,
+    mode_chrpos38,
+    mode_rsid,
+)
+
+from .conftest import SUMSTATS
+
+MODE_ARGS = [
+    (mode_rsid, ["rsid", "-rs", "ID"]),
+    (mode_chrpos38, ["chrpos38", "-chr38", "CHROM", "-pos38", "POS"]),
+    (mode_chrpos37, ["chrpos37", "-chr37", "CHROM", "-pos37", "POS"]),
+]
+
+
+def run_mode(mode, mode_args, input_path, output_path, *extra_args):
+    args = create_parser().parse_args(
+        [*mode_args, "-i", input_path, "-o", str(output_path), *extra_args]
+    )
+    mode.run(args)
+    return output_path.read_bytes()
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+@pytest.mark.parametrize("chunksize", ["1", "3", "100"])
+def test_chunked_output_matches_in_memory(
+    gtex_db, sumstats_file, tmp_path, mode, mode_args, chunksize
+):
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "full.txt")
+    chunked = run_mode(
+        mode, mode_args, sumstats_file, tmp_path / "chunked.txt", "--chunksize", chunksize
+    )
+
+    assert chunked == expected
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+def test_chunked_output_matches_with_missing_values_in_later_chunk(
+    gtex_db, tmp_path, mode, mode_args
+):
+    input_path = tmp_path / "input.txt"
+    input_path.write_text(
+        "ID\tCHROM\tPOS\tN\tP\n"
+        "rs116944008\t7\t127741848\t5\t0.5\n"
+        "rs17151229\t7\t127742101\t6\t1e-08\n"
+        "rs3131972\t1\t817341\t\t0.1\n"
+    )
+    expected = run_mode(mode, mode_args, str(input_path), tmp_path / "full.txt")
+    chunked = run_mode(
+        mode, mode_args, str(input_path), tmp_path / "chunked.txt", "--chunksize", "2"
+    )
+
+    assert chunked == expected
+    assert expected.decode().splitlines()[1].split("\t")[3] == "5"
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+def test_lookup_strategies_match(gtex_db, sumstats_file, tmp_path, mode, mode_args):
+    temp_table = run_mode(
+        mode, mode_args, sumstats_file, tmp_path / "temp.txt", "--lookup-strategy", "temp-table"
+    )
+    in_list = run_mode(
+        mode,
+        mode_args,
+        sumstats_file,
+        tmp_path / "in_list.txt",
+        "--lookup-strategy",
+        "in-list",
+        "--batch-size",
+        "2",
+    )
+
+    assert temp_table == in_list
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+def test_parallel_lookup_matches_single(gtex_db, sumstats_file, tmp_path, mode, mode_args):
+    single = run_mode(mode, mode_args, sumstats_file, tmp_path / "single.txt")
+    parallel = run_mode(mode, mode_args, sumstats_file, tmp_path / "parallel.txt", "--threads", "3")
+
+    assert parallel == single
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+@pytest.mark.parametrize("extra_args", [[], ["--threads", "2"], ["--lookup-strategy", "in-list"]])
+def test_mmap_matches_default(gtex_db, sumstats_file, tmp_path, mode, mode_args, extra_args):
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "default.txt")
+    mapped = run_mode(mode, mode_args, sumstats_file, tmp_path / "mmap.txt", "--mmap", *extra_args)
+
+    assert mapped == expected
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+def test_gzipped_input_and_explicit_sep(gtex_db, sumstats_file, tmp_path, mode, mode_args):
+    gzipped_file = tmp_path / "sumstats.txt.bgz"
+    with open(sumstats_file, "rb") as f:
+        gzipped_file.write_bytes(gzip.compress(f.read()))
+
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "plain.txt")
+    gzipped = run_mode(mode, mode_args, str(gzipped_file), tmp_path / "gzipped.txt", "--sep", "\\t")
+
+    assert gzipped == expected
+
+
+def test_passthrough_keeps_input_text(gtex_db, tmp_path):
+    input_path = tmp_path / "input.csv"
+    input_path.write_text("ID,BETA,P\nrs116944008,0.10,NA\nrs17151229,1.5e-3,1E-8\n")
+    output = run_mode(
+        mode_rsid, ["rsid", "-rs", "ID"], str(input_path), tmp_path / "out.csv", "--passthrough"
+    )
+
+    lines = output.decode().splitlines()
+    assert lines[1].startswith("rs116944008,0.10,NA,")
+    assert lines[2].startswith("rs17151229,1.5e-3,1E-8,")
+
+
+@pytest.mark.parametrize("chunksize", [[], ["--chunksize", "3"]])
+@pytest.mark.parametrize("ext", [".tsv.gz", ".txt.bgz", ".parquet", ".feather"])
+def test_output_formats(gtex_db, sumstats_file, tmp_path, ext, chunksize):
+    if ext in (".parquet", ".feather"):
+        pytest.importorskip("pyarrow")
+    expected = run_mode(mode_rsid, ["rsid", "-rs", "ID"], sumstats_file, tmp_path / "out.tsv")
+
+    output_path = tmp_path / f"out{ext}"
+    run_mode(mode_rsid, ["rsid", "-rs", "ID"], sumstats_file, output_path, *chunksize)
+    if ext in (".tsv.gz", ".txt.bgz"):
+        assert gzip.decompress(output_path.read_bytes()) == expected
+        return
+
+    # Columnar files keep typed values, so they are compared after parsing both sides as text.
+    written = pd.read_parquet(output_path) if ext == ".parquet" else pd.read_feather(output_path)
+    written = written.to_csv(sep="\t", index=False)
+    pd.testing.assert_frame_equal(
+        pd.read_csv(StringIO(written), sep="\t"), pd.read_csv(BytesIO(expected), sep="\t")
+    )
+
+
+def test_parquet_input(gtex_db, sumstats_file, tmp_path):
+    pytest.importorskip("pyarrow")
+    parquet_path = tmp_path / "sumstats.parquet"
+    pd.read_table(sumstats_file).to_parquet(parquet_path)
+
+    expected = run_mode(mode_rsid, ["rsid", "-rs", "ID"], sumstats_file, tmp_path / "a.tsv")
+    from_parquet = run_mode(mode_rsid, ["rsid", "-rs", "ID"], str(parquet_path), tmp_path / "b.tsv")
+
+    assert from_parquet == expected
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS)
+@pytest.mark.parametrize("extra_args", [[], ["--threads", "2", "--chunksize", "2"]])
+def test_batch_matches_single_files(gtex_db, tmp_path, mode, mode_args, extra_args):
+    header, *rows = SUMSTATS.splitlines(keepends=True)
+    input_dir = tmp_path / "inputs"
+    input_dir.mkdir()
+    # Overlapping files, so some ids are shared between them.
+    for i, start in enumerate([0, 2, 4]):
+        (input_dir / f"sumstats_{i}.txt").write_text(header + "".join(rows[start : start + 4]))
+    (input_dir / "broken.txt").write_text("A\tB\nx\ty\n")
+
+    args = create_parser().parse_args(
+        ["batch", "-m", mode_args[0], "-c", *mode_args[2::2], "--inputs", str(input_dir / "*.txt")]
+        + ["--output-dir", str(tmp_path / "outputs"), *extra_args]
+    )
+    mode_batch.run(args)
+
+    assert not (tmp_path / "outputs" / "broken.txt").exists()
+    for i in range(3):
+        expected = run_mode(
+            mode, mode_args, str(input_dir / f"sumstats_{i}.txt"), tmp_path / f"expected_{i}.txt"
+        )
+        assert (tmp_path / "outputs" / f"sumstats_{i}.txt").read_bytes() == expected
+
+
+def test_batch_manifest(gtex_db, sumstats_file, tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"input,output\n{sumstats_file},{tmp_path / 'out.tsv.gz'}\n")
+    args = create_parser().parse_args(
+        ["batch", "-m", "rsid", "-c", "ID", "--manifest", str(manifest)]
+    )
+    mode_batch.run(args)
+
+    expected = run_mode(mode_rsid, ["rsid", "-rs", "ID"], sumstats_file, tmp_path / "out.tsv")
+    assert gzip.decompress((tmp_path / "out.tsv.gz").read_bytes()) == expected
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS[1:])
+@pytest.mark.parametrize("extra_args", [[], ["--chunksize", "3"], ["--exclude-ref-alt"]])
+@pytest.mark.parametrize("sort_input", [False, True])
+@pytest.mark.parametrize("range_scans", [False, True])
+def test_sorted_matches_default(
+    gtex_db,
+    sumstats_file,
+    tmp_path,
+    monkeypatch,
+    mode,
+    mode_args,
+    extra_args,
+    sort_input,
+    range_scans,
+):
+    if range_scans:
+        # The test inputs are too sparse for range scans otherwise.
+        monkeypatch.setattr(merge_join, "MIN_RANGE_KEYS", 1)
+        monkeypatch.setattr(merge_join, "MAX_GAP", 2**32)
+    if sort_input:
+        df = pd.read_csv(sumstats_file, sep="\t")
+        df["CHROM"] = df["CHROM"].astype(str)
+        df.sort_values(["CHROM", "POS"], key=lambda col: col.map(chrom_order), inplace=True)
+        df.to_csv(sumstats_file, sep="\t", index=False)
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "default.txt", *extra_args)
+    merged = run_mode(
+        mode, mode_args, sumstats_file, tmp_path / "sorted.txt", "--sorted", *extra_args
+    )
+
+    assert merged == expected
+
+
+def chrom_order(value):
+    return int(value) if str(value).isdigit() else 23
+
+
+AUTO_SUMSTATS = """ID\tCHR37\tPOS37\tCHR38\tPOS38\tBETA
+rs116944008\t7\t127381902\t7\t127741848\t0.1
+NA\t7\t127382155\t7\t127742101\t0.2
+rs000000001\t1\t752721\tNA\tNA\t0.3
+NA\tNA\tNA\tNA\tNA\t0.4
+rs5939319\tX\t1\tX\t1\t0.5
+rs000000002\t1\t1\t1\t910255\t0.6
+"""
+
+
+@pytest.mark.parametrize("extra_args", [[], ["--chunksize", "2"], ["--exclude-ref-alt"]])
+def test_auto_falls_back_to_positions(gtex_db, tmp_path, extra_args):
+    input_path = tmp_path / "sumstats.tsv"
+    input_path.write_text(AUTO_SUMSTATS)
+    keys = ["-rs", "ID", "-chr37", "CHR37", "-pos37", "POS37", "-chr38", "CHR38", "-pos38"]
+    args = ["auto", *keys, "POS38"]
+    run_mode(mode_auto, args, str(input_path), tmp_path / "out.tsv", *extra_args)
+    output = pd.read_csv(tmp_path / "out.tsv", sep="\t", dtype=str).fillna("-")
+
+    assert output["matched_by"].tolist() == [
+        "rsid",
+        "chrpos38",
+        "chrpos37",
+        "chrpos37",
+        "-",
+        "rsid",
+        "chrpos38",
+    ]
+    assert output["rsid_dbSNP155"].tolist() == [
+        "rs116944008",
+        "rs17151229",
+        "rs3131972",
+        "rs3131972",
+        "-",
+        "rs5939319",
+        "rs117086422",
+    ]
+    assert output["pos38"].tolist()[:3] == ["127741848", "127742101", "817341"]
+    assert output["BETA"].tolist() == ["0.1", "0.2", "0.3", "0.3", "0.4", "0.5", "0.6"]
+    assert ("ref" in output.columns) == ("--exclude-ref-alt" not in extra_args)
+
+
+def test_auto_with_one_key_matches_mode(gtex_db, sumstats_file, tmp_path):
+    run_mode(mode_rsid, ["rsid", "-rs", "ID"], sumstats_file, tmp_path / "rsid.tsv")
+    run_mode(mode_auto, ["auto", "-rs", "ID"], sumstats_file, tmp_path / "auto.tsv")
+    rsid = pd.read_csv(tmp_path / "rsid.tsv", sep="\t")
+    auto = pd.read_csv(tmp_path / "auto.tsv", sep="\t")
+
+    pd.testing.assert_frame_equal(auto[rsid.columns], rsid)
+    assert auto["rsid_dbSNP155"].equals(auto["ID"].where(auto["matched_by"].notna()))
+
+
+ALLELE_SUMSTATS = """CHROM\tPOS\tREF\tALT
+1\t817341\tA\tG
+1\t817341\tc\tA
+1\t817341\tT\tC
+7\t127741848\tA\tG
+1\t817341\tA\tT
+7\t1\tA\tG
+7\t127742101\tC\tG
+7\t127742115\tNA\tG
+"""
+
+
+@pytest.mark.parametrize(
+    "mode, mode_args",
+    [
+        (mode_chrpos38, ["chrpos38", "-chr38", "CHROM", "-pos38", "POS"]),
+        (mode_chrpos38, ["chrpos38", "-chr38", "CHROM", "-pos38", "POS", "--sorted"]),
+        (mode_auto, ["auto", "-chr38", "CHROM", "-pos38", "POS"]),
+    ],
+)
+@pytest.mark.parametrize("extra_args", [[], ["--exclude-ref-alt"], ["--chunksize", "3"]])
+def test_allele_matching(gtex_db, tmp_path, mode, mode_args, extra_args):
+    input_path = tmp_path / "sumstats.tsv"
+    input_path.write_text(ALLELE_SUMSTATS)
+    alleles = ["--ref-col", "REF", "--alt-col", "ALT"]
+    run_mode(mode, mode_args, str(input_path), tmp_path / "out.tsv", *alleles, *extra_args)
+    output = pd.read_csv(tmp_path / "out.tsv", sep="\t", dtype=str).fillna("-")
+
+    # One output row per input row, instead of one per record at multi-allelic sites.
+    assert output["POS"].tolist() == pd.read_csv(input_path, sep="\t", dtype=str)["POS"].tolist()
+    assert output["allele_match"].tolist() == [
+        "exact",
+        "swap",
+        "flip",
+        "flip_swap",
+        "mismatch",
+        "-",
+        "ambiguous",
+        "-",
+    ]
+    assert output["rsid_dbSNP155"].tolist() == [
+        "rs3131972",
+        "rs3131972",
+        "rs3131972",
+        "rs116944008",
+        "-",
+        "-",
+        "rs17151229",
+        "rs75008380",
+    ]
+    if not extra_args:
+        assert output["alt"].tolist()[:3] == ["G", "C", "G"]
+    assert ("alt" in output.columns) == ("--exclude-ref-alt" not in extra_args)
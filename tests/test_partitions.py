@@ -0,0 +1,68 @@
+import json
+import sqlite3
+
+import pytest
+
+from RSIDBuildTranslator.cli import create_parser
+from RSIDBuildTranslator.main import main
+from RSIDBuildTranslator.partitions import get_partition_output_path
+from RSIDBuildTranslator.utils import get_local_partitions_path
+
+from .conftest import GTEX_ROWS
+from .test_modes import MODE_ARGS, run_mode
+
+
+@pytest.fixture
+def partitions(gtex_db, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["RSIDBuildTranslator", "db", "build-partitions"])
+    main()
+    return get_local_partitions_path()
+
+
+def test_partitions_hold_records_by_chromosome(partitions):
+    with open(f"{partitions}/meta.json") as f:
+        rows = json.load(f)["rows"]
+
+    assert {chrom: count for chrom, count in rows.items() if count} == {"1": 5, "7": 5, "X": 1}
+    assert sum(rows.values()) == len(GTEX_ROWS)
+
+
+@pytest.mark.parametrize("mode, mode_args", MODE_ARGS[1:])
+@pytest.mark.parametrize("extra_args", [[], ["--threads", "2"], ["--chunksize", "3", "--sorted"]])
+def test_partitioned_matches_default(
+    partitions, sumstats_file, tmp_path, mode, mode_args, extra_args
+):
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "default.txt", *extra_args)
+    partitioned = run_mode(
+        mode, mode_args, sumstats_file, tmp_path / "partitioned.txt", "--partitioned", *extra_args
+    )
+
+    assert partitioned == expected
+
+
+def test_split_output(partitions, sumstats_file, tmp_path):
+    mode, mode_args = MODE_ARGS[1]
+    expected = run_mode(mode, mode_args, sumstats_file, tmp_path / "default.txt").decode()
+    output_path = str(tmp_path / "out.txt")
+    args = create_parser().parse_args(
+        [*mode_args, "-i", sumstats_file, "-o", output_path, "--partitioned", "--split-output"]
+    )
+    mode.run(args)
+
+    header, *rows = expected.splitlines()
+    for chrom in ("1", "7", "X"):
+        with open(get_partition_output_path(output_path, chrom)) as f:
+            chrom_header, *chrom_rows = f.read().splitlines()
+        assert chrom_header == header
+        assert chrom_rows == [row for row in rows if row.split("\t")[1] == chrom]
+
+
+def test_partitions_of_changed_database_are_rejected(partitions, gtex_db, sumstats_file, tmp_path):
+    con = sqlite3.connect(gtex_db)
+    con.execute("INSERT INTO GTEx_lookup VALUES ('rs1', '2_1', '2_1', 'A', 'G')")
+    con.commit()
+    con.close()
+
+    mode, mode_args = MODE_ARGS[1]
+    with pytest.raises(FileNotFoundError):
+        run_mode(mode, mode_args, sumstats_file, tmp_path / "out.txt", "--partitioned")
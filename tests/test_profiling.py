@@ -0,0 +1,96 @@
+import json
+import logging
+
+from RSIDBuildTranslator import main
+from RSIDBuildTranslator.profiling import Profiler, ProgressReporter
+from RSIDBuildTranslator.provision import DATA_DIR_VARIABLE
+
+
+def test_profile_report(gtex_db, sumstats_file, tmp_path, monkeypatch, capsys):
+    profile_path = tmp_path / "profile.json"
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "RSIDBuildTranslator",
+            "rsid",
+            "-rs",
+            "ID",
+            "-i",
+            str(sumstats_file),
+            "-o",
+            str(tmp_path / "out.tsv"),
+            "--profile-json",
+            str(profile_path),
+        ],
+    )
+    main.main()
+
+    report = json.loads(profile_path.read_text())
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert list(stages) == [
+        "read",
+        "validate",
+        "key_build",
+        "query_to_df",
+        "cleanup_query_df",
+        "write",
+    ]
+    assert stages["key_build"]["calls"] == 1 and stages["key_build"]["rows"] == 8
+    # rs116944008 is repeated in the input, and answered by its first lookup.
+    assert stages["query_to_df"]["deduplicated"] == 1
+    assert stages["query_to_df"]["cache_hit_rate"] is None
+    assert stages["write"]["rows"] == 9
+    assert "cleanup_query_df" in capsys.readouterr().out
+
+
+def test_profile_counts_lookup_cache_hits(gtex_db, sumstats_file, tmp_path, monkeypatch):
+    monkeypatch.setenv(DATA_DIR_VARIABLE, str(tmp_path / "data"))
+    for run in ("first", "second"):
+        monkeypatch.setattr(
+            "sys.argv",
+            [
+                "RSIDBuildTranslator",
+                "rsid",
+                "-rs",
+                "ID",
+                "-i",
+                str(sumstats_file),
+                "-o",
+                str(tmp_path / "out.tsv"),
+                "--lookup-cache",
+                "--profile-json",
+                str(tmp_path / f"{run}.json"),
+            ],
+        )
+        main.main()
+
+    for run, hits in (("first", 0), ("second", 7)):
+        report = json.loads((tmp_path / f"{run}.json").read_text())
+        stages = {stage["stage"]: stage for stage in report["stages"]}
+        assert stages["lookup_cache"]["cache_hits"] == hits
+        assert stages["lookup_cache"]["cache_misses"] == 7 - hits
+        assert stages["query_to_df"]["deduplicated"] == 1
+
+
+def test_profiler_sums_calls():
+    profiler = Profiler()
+    for rows in (10, 20):
+        with profiler.stage("read") as call:
+            call["rows"] = rows
+    profiler.count_cache("query_to_df", hits=3, misses=1)
+
+    report = profiler.to_dict()
+    assert report["stages"][0]["calls"] == 2 and report["stages"][0]["rows"] == 30
+    assert report["stages"][1]["cache_hit_rate"] == 0.75
+
+
+def test_progress_is_rate_limited(caplog):
+    with caplog.at_level(logging.INFO):
+        progress = ProgressReporter("Looked up", 1000, "ids", interval=3600)
+        for _ in range(10):
+            progress.update(100)
+        assert not caplog.records
+
+        progress = ProgressReporter("Looked up", 1000, "ids", interval=0)
+        progress.update(500)
+    assert "Looked up 500/1000 ids (50%)" in caplog.text
@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from RSIDBuildTranslator import provision, utils
+from RSIDBuildTranslator.main import main
+from RSIDBuildTranslator.modes import mode_rsid
+from RSIDBuildTranslator.provision import check_db_file, file_sha256, install_gtex_db
+
+from .test_modes import run_mode
+
+
+def install(monkeypatch, *args):
+    monkeypatch.setattr("sys.argv", ["RSIDBuildTranslator", "db", "install", *args])
+    main()
+
+
+def test_install_from_local_copy(gtex_db, sumstats_file, tmp_path, monkeypatch):
+    target = tmp_path / "shared" / "GTEx_v10.db"
+    install(monkeypatch, "--from", gtex_db, "--db", str(target), "--sha256", file_sha256(gtex_db))
+
+    assert check_db_file(target) is None
+    manifest = json.loads((tmp_path / "shared" / "GTEx_v10.db.manifest.json").read_text())
+    assert manifest["source"] == gtex_db
+    assert manifest["sha256"] == file_sha256(gtex_db)
+    assert manifest["sha256_verified"]
+    # Neither the partial file nor the lock are left behind.
+    assert sorted(os.listdir(target.parent)) == ["GTEx_v10.db", "GTEx_v10.db.manifest.json"]
+
+    expected = run_mode(mode_rsid, ["rsid", "-rs", "ID"], sumstats_file, tmp_path / "a.txt")
+    annotated = run_mode(
+        mode_rsid, ["rsid", "-rs", "ID"], sumstats_file, tmp_path / "b.txt", "--db", str(target)
+    )
+    assert annotated == expected
+
+
+def test_install_rejects_checksum_mismatch(gtex_db, tmp_path):
+    target = tmp_path / "GTEx_copy.db"
+
+    assert install_gtex_db(str(target), source=gtex_db, sha256="0" * 64) is None
+    assert os.listdir(tmp_path) == ["GTEx_v10.db"]
+
+
+def test_truncated_database_is_replaced(gtex_db, tmp_path, monkeypatch):
+    source = tmp_path / "source.db"
+    shutil.copy(gtex_db, source)
+    with open(gtex_db, "r+b") as f:
+        f.truncate(os.path.getsize(source) // 2)
+    assert "truncated" in check_db_file(gtex_db)
+
+    # Stands in for the Google Drive download.
+    monkeypatch.setattr(provision, "fetch_gdrive", lambda path: shutil.copy(source, path))
+    assert utils.download_gtex_db() == gtex_db
+    assert check_db_file(gtex_db) is None
+    assert utils.load_gtex_data() is not None
+
+
+def test_install_fails_if_not_prepared(gtex_db, tmp_path, monkeypatch, caplog):
+    target = tmp_path / "GTEx_copy.db"
+    monkeypatch.setattr(provision, "prepare_gtex_db", lambda gtex_con: False)
+
+    assert install_gtex_db(str(target), source=gtex_db) is None
+    assert "Preparing the GTEx database failed" in caplog.text
+    assert not target.exists()
+    assert not os.path.exists(f"{target}.manifest.json")
+
+
+def test_install_resumes_partial_copy(gtex_db, tmp_path):
+    target = str(tmp_path / "GTEx_copy.db")
+    with open(gtex_db, "rb") as f:
+        data = f.read()
+    tag = provision.hashlib.sha1(gtex_db.encode()).hexdigest()[:8]
+    with open(f"{target}.{tag}.part", "wb") as f:
+        f.write(data[: len(data) // 3])
+
+    assert install_gtex_db(target, source=gtex_db, sha256=file_sha256(gtex_db)) == target
+    assert not os.path.exists(f"{target}.{tag}.part")
+
+
+def test_install_without_checksum_is_unverified(gtex_db, tmp_path, caplog):
+    target = str(tmp_path / "GTEx_copy.db")
+    assert install_gtex_db(target, source=gtex_db) == target
+
+    with open(f"{target}.manifest.json") as f:
+        manifest = json.load(f)
+    assert manifest["sha256"] == file_sha256(gtex_db)
+    assert not manifest["sha256_verified"]
+    assert "recorded unverified" in caplog.text
+
+
+def test_invalid_db_path_is_rejected(tmp_path, sumstats_file):
+    missing = tmp_path / "missing.db"
+    # No output is written.
+    with pytest.raises(FileNotFoundError):
+        run_mode(
+            mode_rsid,
+            ["rsid", "-rs", "ID"],
+            sumstats_file,
+            tmp_path / "out.txt",
+            "--db",
+            str(missing),
+        )
+    assert not missing.exists()
+
+
+def test_data_dir_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv(provision.DATA_DIR_VARIABLE, str(tmp_path / "data"))
+
+    assert utils.get_local_db_path() == str(tmp_path / "data" / "GTEx_v10.db")
+    assert utils.get_local_store_path() == str(tmp_path / "data" / "GTEx_v10_store")
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from RSIDBuildTranslator.server import LookupCache, LookupClient, create_server
+
+
+@pytest.fixture
+def client(gtex_db):
+    server = create_server(gtex_db, port=0, cache_size=100)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    with LookupClient(f"http://{host}:{port}") as client:
+        yield client
+    server.shutdown()
+    server.server_close()
+    server.service.close()
+
+
+def test_lookup_all_key_types(client):
+    assert client.lookup("rsid", ["rs116944008"]) == {
+        "rs116944008": [
+            {
+                "rsid_dbSNP155": "rs116944008",
+                "chrpos37": "7_127381902",
+                "chrpos38": "7_127741848",
+                "ref": "C",
+                "alt": "T",
+            }
+        ]
+    }
+    results = client.lookup("chrpos38", ["1_817341", "X_2782116", "7_1", "not an id"])
+    assert [record["alt"] for record in results["1_817341"]] == ["C", "G"]
+    assert results["X_2782116"][0]["rsid_dbSNP155"] == "rs5939319"
+    assert results["7_1"] == [] and results["not an id"] == []
+    assert client.lookup("chrpos37", ["7_127382155"])["7_127382155"][0]["chrpos38"] == "7_127742101"
+
+
+def test_lookup_cache(client):
+    ids = ["rs3131972", "rs17151229", "rs000000001"]
+    first = client.lookup("rsid", ids)
+    second = client.lookup("rsid", ids)
+
+    assert first == second
+    assert client.health()["cache"] == {"size": 3, "max_size": 100, "hits": 3, "misses": 3}
+
+
+def test_concurrent_lookups_use_own_connections(gtex_db):
+    server = create_server(gtex_db, port=0, cache_size=100)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    results = []
+
+    def lookup():
+        with LookupClient(f"http://{host}:{port}") as client:
+            results.append(client.lookup("chrpos38", ["1_817341", "7_127741848"]))
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    server.server_close()
+
+    assert len(results) == 4 and all(result == results[0] for result in results)
+    assert len(results[0]["1_817341"]) == 2
+    assert 1 <= len(server.service.connections) <= 4
+    server.service.close()
+    assert server.service.connections == []
+
+
+def test_lookup_invalid_request(client):
+    with pytest.raises(RuntimeError, match="400"):
+        client.lookup("chrpos19", ["1_1"])
+    # The connection is still usable after an error.
+    assert client.lookup("rsid", ["rs1"]) == {"rs1": []}
+
+
+def test_lookup_cache_evicts_least_recently_used():
+    cache = LookupCache(2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a")
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+# Importing the command line entry point must not load these, nor take longer than the budget.
+HEAVY_MODULES = ["pandas", "numpy", "gdown", "pyarrow"]
+IMPORT_BUDGET_SECONDS = 0.2
+
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+
+
+def run_python(*args, cwd=None):
+    env = dict(os.environ, PYTHONPATH=SRC_PATH)
+    return subprocess.run(
+        [sys.executable, *args], env=env, cwd=cwd, capture_output=True, text=True, check=True
+    )
+
+
+def test_help_does_not_import_heavy_modules(tmp_path):
+    code = (
+        "import sys\n"
+        "from RSIDBuildTranslator.main import main\n"
+        "sys.argv = ['RSIDBuildTranslator', '-h']\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY_MODULES!r}))\n"
+    )
+    output = run_python("-c", code, cwd=tmp_path).stdout
+
+    assert output.splitlines()[-1] == "[]"
+    # The log file is only created once a mode runs.
+    assert not (tmp_path / "RSIDBuildTranslator.log").exists()
+
+
+def test_import_time_budget():
+    stderr = run_python("-X", "importtime", "-c", "import RSIDBuildTranslator.main").stderr
+    # Lines look like "import time:  self [us] | cumulative | imported package".
+    cumulative = {
+        line.split("|")[2].strip(): int(line.split("|")[1])
+        for line in stderr.splitlines()
+        if line.startswith("import time:") and line.count("|") == 2 and "[us]" not in line
+    }
+
+    assert cumulative["RSIDBuildTranslator.main"] / 1e6 < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,112 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from RSIDBuildTranslator.utils import (
+    cleanup_query_df,
+    create_ids_to_search,
+    normalize_ids,
+    parse_chrpos,
+    read_input_file,
+)
+
+
+def test_create_ids_to_search_canonical_chrpos():
+    df = pd.DataFrame(
+        {
+            "chr": ["chr7", "x", "7", "7", "abc"],
+            "pos": [127741848.0, " 2782116", "127741848", "12a", "1"],
+        }
+    )
+    _, ids_to_search = create_ids_to_search(df, ["chr", "pos"])
+
+    assert ids_to_search[:3] == ["7_127741848", "X_2782116", "7_127741848"]
+    assert pd.isna(ids_to_search[3]) and pd.isna(ids_to_search[4])
+
+
+def test_normalize_ids():
+    ids_to_search = ["rs1", "rs2", "rs1", None, np.nan, "xyz", " rs3", "rs2"]
+
+    assert normalize_ids(ids_to_search, "rsid_dbSNP155") == ["rs1", "rs2"]
+    assert normalize_ids(["7_1", "7_1", "23_5", "X_2", np.nan], "chrpos37") == ["7_1", "X_2"]
+    with pytest.raises(KeyError):
+        normalize_ids(["rs1"], "ref")
+
+
+def test_parse_chrpos_reasons():
+    df = pd.DataFrame(
+        {
+            "chr": ["chr7", " 2", "23", None, "x", "7", "7"],
+            "pos": ["1", "2", "3", "4", "5.0", None, "12a"],
+        }
+    )
+    ids, reasons = parse_chrpos(df, "chr", "pos")
+
+    assert [id if pd.notna(id) else None for id in ids] == [
+        "7_1",
+        "2_2",
+        None,
+        None,
+        "X_5",
+        None,
+        None,
+    ]
+    assert reasons.tolist() == [
+        None,
+        None,
+        "invalid chromosome",
+        "missing chromosome",
+        None,
+        "missing position",
+        "invalid position",
+    ]
+
+
+def test_cleanup_query_df_matches_left_merge():
+    input_data = pd.DataFrame({"ID": ["rs2", "rs9", "rs1", None, "rs2"], "ref": list("abcde")})
+    results_df = pd.DataFrame(
+        {
+            "rsid_dbSNP155": ["rs1", "rs2", "rs2"],
+            "chrpos37": ["1_10", "X_20", "X_20"],
+            "chrpos38": ["1_11", "X_21", "X_21"],
+            "ref": ["A", "C", "C"],
+            "alt": ["G", "T", "A"],
+        }
+    )
+    final_df = cleanup_query_df(results_df, input_data, "ID", "rsid_dbSNP155")
+
+    assert final_df.columns.tolist() == [
+        "ID",
+        "ref_x",
+        "chr37",
+        "pos37",
+        "chr38",
+        "pos38",
+        "ref_y",
+        "alt",
+    ]
+    assert final_df["ID"].tolist()[:4] == ["rs2", "rs2", "rs9", "rs1"]
+    assert final_df["alt"].tolist()[:2] == ["T", "A"] and pd.isna(final_df.loc[2, "alt"])
+    assert final_df["pos38"].dtype == "Int64"
+    assert final_df["pos38"].tolist() == [21, 21, pd.NA, 11, pd.NA, 21, 21]
+    assert input_data.columns.tolist() == ["ID", "ref"]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("sep", ["\t", ",", " "])
+def test_read_input_file_sniffs_delimiter_and_compression(tmp_path, compress, sep):
+    text = "".join(f"{sep.join(row)}\n" for row in [["ID", "P"], ["rs1", "0.5"], ["rs2", "NA"]])
+    path = tmp_path / "input.txt"
+    if compress:
+        path.write_bytes(gzip.compress(text.encode()))
+    else:
+        path.write_text(text)
+
+    df = read_input_file(str(path))
+    assert df.columns.tolist() == ["ID", "P"]
+    assert df["ID"].tolist() == ["rs1", "rs2"]
+
+    df = read_input_file(str(path), passthrough=True)
+    assert df["P"].tolist() == ["0.5", "NA"]
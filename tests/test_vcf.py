@@ -0,0 +1,100 @@
+import gzip
+
+from RSIDBuildTranslator.bgzf import EOF_BLOCK
+from RSIDBuildTranslator.cli import create_parser
+from RSIDBuildTranslator.main import main
+from RSIDBuildTranslator.modes import mode_chrpos38, mode_rsid
+
+from .test_modes import run_mode
+
+VCF = """##fileformat=VCFv4.2
+##INFO=<ID=AF,Number=A,Type=Float,Description="Allele frequency">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS-1
+7\t127741848\t.\tC\tT\t50\tPASS\tAF=0.1\tGT\t0/1
+7\t1\t.\tA\tG\t.\t.\t.\tGT\t0/0
+1\t817341\t.\tA\tG,C\t.\tPASS\tAF=0.2,0.1\tGT\t1/2
+X\t2782116\trs0\tG\tA\t.\tPASS\t.\tGT\t0/1
+"""
+
+CHRPOS38_ARGS = ["chrpos38", "-chr38", "CHROM", "-pos38", "POS"]
+
+
+def write_vcf(tmp_path, text=VCF):
+    path = tmp_path / "input.vcf.gz"
+    path.write_bytes(gzip.compress(text.encode()))
+    return str(path)
+
+
+def test_vcf_is_annotated_in_place(gtex_db, tmp_path):
+    input_path = write_vcf(tmp_path)
+    output = run_mode(mode_chrpos38, CHRPOS38_ARGS, input_path, tmp_path / "out.vcf.gz")
+    chunked = run_mode(
+        mode_chrpos38, CHRPOS38_ARGS, input_path, tmp_path / "chunked.vcf.gz", "--chunksize", "1"
+    )
+
+    assert output.endswith(EOF_BLOCK)
+    assert chunked == output
+    lines = gzip.decompress(output).decode().splitlines()
+    assert lines[:3] == VCF.splitlines()[:2] + [
+        '##INFO=<ID=CHR37,Number=.,Type=String,Description="Chromosome in GRCh37 (hg19)">'
+    ]
+    assert lines[-5:] == [
+        VCF.splitlines()[2],
+        "7\t127741848\trs116944008\tC\tT\t50\tPASS\t"
+        "AF=0.1;CHR37=7;POS37=127381902;GTEX_REF=C;GTEX_ALT=T\tGT\t0/1",
+        "7\t1\t.\tA\tG\t.\t.\t.\tGT\t0/0",
+        # Both records at the position are merged into the one input record.
+        "1\t817341\trs3131972\tA\tG,C\t.\tPASS\t"
+        "AF=0.2,0.1;CHR37=1;POS37=752721;GTEX_REF=A;GTEX_ALT=C,G\tGT\t1/2",
+        "X\t2782116\trs5939319\tG\tA\t.\tPASS\t"
+        "CHR37=X;POS37=2700157;GTEX_REF=G;GTEX_ALT=A\tGT\t0/1",
+    ]
+
+
+def test_vcf_keeps_adjacent_records_with_same_fixed_columns(gtex_db, tmp_path, monkeypatch):
+    records = [f"1\t817341\t.\tA\tG\t.\tPASS\tAF={af}\tGT\t0/1" for af in (0.1, 0.2)]
+    input_path = write_vcf(tmp_path, "\n".join(VCF.splitlines()[:3] + records) + "\n")
+    monkeypatch.setattr("sys.argv", ["RSIDBuildTranslator", "db", "build-partitions"])
+    main()
+
+    output = run_mode(mode_chrpos38, CHRPOS38_ARGS, input_path, tmp_path / "out.vcf")
+    for extra_args in (["--chunksize", "1"], ["--partitioned"]):
+        other = run_mode(
+            mode_chrpos38, CHRPOS38_ARGS, input_path, tmp_path / "other.vcf", *extra_args
+        )
+        assert other == output
+
+    assert output.decode().splitlines()[-2:] == [
+        f"1\t817341\trs3131972\tA\tG\t.\tPASS\tAF={af};"
+        "CHR37=1;POS37=752721;GTEX_REF=A;GTEX_ALT=C,G\tGT\t0/1"
+        for af in (0.1, 0.2)
+    ]
+
+
+def test_vcf_rsid_with_allele_matching(gtex_db, tmp_path):
+    input_path = write_vcf(tmp_path, VCF.replace("\t.\tA\tG,C", "\trs3131972\tA\tG"))
+    output = run_mode(
+        mode_rsid,
+        ["rsid", "-rs", "ID"],
+        input_path,
+        tmp_path / "out.vcf",
+        "--ref-col",
+        "REF",
+        "--alt-col",
+        "ALT",
+        "--exclude-ref-alt",
+    )
+
+    assert output.decode().splitlines()[-2] == (
+        "1\t817341\trs3131972\tA\tG\t.\tPASS\t"
+        "AF=0.2,0.1;CHR37=1;POS37=752721;CHR38=1;POS38=817341;ALLELE_MATCH=exact\tGT\t1/2"
+    )
+
+
+def test_vcf_output_needs_vcf_input(gtex_db, sumstats_file, tmp_path):
+    args = create_parser().parse_args(
+        ["rsid", "-rs", "ID", "-i", sumstats_file, "-o", str(tmp_path / "out.vcf.gz")]
+    )
+    mode_rsid.run(args)
+
+    assert not (tmp_path / "out.vcf.gz").exists()